@@ -0,0 +1,504 @@
+import os
+import time
+import itertools
+import threading
+from array import array
+from collections import Counter
+
+# Constantes Win32 que usa utils (para no depender de win32con fuera de Windows)
+GWL_STYLE   = -16
+GWL_EXSTYLE = -20
+WS_POPUP    = 0x80000000
+WS_VISIBLE  = 0x10000000
+WS_OVERLAPPEDWINDOW = 0x00CF0000
+WS_CAPTION    = 0x00C00000
+WS_THICKFRAME = 0x00040000
+WS_MINIMIZE   = 0x20000000
+WS_EX_DLGMODALFRAME = 0x00000001
+WS_EX_WINDOWEDGE    = 0x00000100
+WS_EX_CLIENTEDGE    = 0x00000200
+WS_EX_STATICEDGE    = 0x00020000
+SWP_NOZORDER     = 0x0004
+SWP_FRAMECHANGED = 0x0020
+SWP_ASYNCWINDOWPOS = 0x4000
+WM_GETTEXT = 0x000D
+SMTO_BLOCK         = 0x0001
+SMTO_ABORTIFHUNG   = 0x0002
+MONITORINFOF_PRIMARY = 0x1
+SM_XVIRTUALSCREEN  = 76
+SM_YVIRTUALSCREEN  = 77
+SM_CXVIRTUALSCREEN = 78
+SM_CYVIRTUALSCREEN = 79
+SM_CMONITORS       = 80
+
+
+class WindowEnumerator:
+    """EnumWindows por ctypes con el mínimo de objetos por ventana.
+
+    El callback se crea una sola vez y los filtros (visibilidad, clase, pid
+    y exclusiones) se evalúan dentro de él con buffers reutilizados; solo
+    los hwnds que pasan se guardan, como enteros, en un array('Q').
+    """
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        self._EnumWindows = user32.EnumWindows
+        self._IsWindowVisible = user32.IsWindowVisible
+        self._GetClassNameW = user32.GetClassNameW
+        self._GetWindowThreadProcessId = user32.GetWindowThreadProcessId
+        self._class_buf = ctypes.create_unicode_buffer(256)
+        self._pid = wintypes.DWORD()
+        self._pid_ref = ctypes.byref(self._pid)
+        proto = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        self._proc = proto(self._callback)
+        self._lock = threading.Lock()
+        self._out = None
+        self._visible = True
+        self._exclude = ()
+        self._cls = None
+        self._pids = None
+
+    def _callback(self, hwnd, _):
+        if self._visible and not self._IsWindowVisible(hwnd):
+            return True
+        if hwnd in self._exclude:
+            return True
+        if self._pids is not None:
+            self._GetWindowThreadProcessId(hwnd, self._pid_ref)
+            if self._pid.value not in self._pids:
+                return True
+        if self._cls is not None:
+            self._GetClassNameW(hwnd, self._class_buf, len(self._class_buf))
+            if self._class_buf.value != self._cls:
+                return True
+        self._out.append(hwnd)
+        return True
+
+    def run(self, visible=True, exclude=(), cls=None, pids=None):
+        with self._lock:
+            self._out = array("Q")
+            self._visible = visible
+            self._exclude = exclude or ()
+            self._cls = cls
+            self._pids = pids
+            try:
+                self._EnumWindows(self._proc, 0)
+                return self._out
+            finally:
+                self._out = None
+
+
+class Win32Backend:
+    """Primitivas de ventana reales (pywin32 + ctypes)."""
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    SYNCHRONIZE = 0x00100000
+    DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        import win32api
+        import win32gui
+        import win32process
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._win32api = win32api
+        self._win32gui = win32gui
+        self._win32process = win32process
+        # Buffer de get_text_timeout, uno por hilo y reutilizado entre llamadas
+        self._local = threading.local()
+        self._own_pid = os.getpid()
+        self._enumerator = None
+
+    def enum_windows(self, visible=False, exclude=(), cls=None, pids=None):
+        """hwnds de nivel superior (array('Q')) que pasan los filtros:
+        visibles, fuera de exclude, de la clase cls y de alguno de pids."""
+        if self._enumerator is None:
+            self._enumerator = WindowEnumerator()
+        return self._enumerator.run(visible, exclude, cls, pids)
+
+    def is_window(self, hwnd):
+        return bool(self._win32gui.IsWindow(hwnd))
+
+    def is_visible(self, hwnd):
+        return bool(self._win32gui.IsWindowVisible(hwnd))
+
+    def get_text(self, hwnd):
+        return self._win32gui.GetWindowText(hwnd)
+
+    def get_text_timeout(self, hwnd, timeout_ms):
+        """Título de hwnd. El de una ventana de otro proceso se lee con
+        InternalGetWindowText (el texto guardado, sin enviar ningún mensaje,
+        así que nunca se cuelga); solo las del propio proceso usan WM_GETTEXT
+        limitado a timeout_ms. None si la ventana está colgada o no responde
+        a tiempo."""
+        ctypes, wintypes = self._ctypes, self._wintypes
+        user32 = ctypes.windll.user32
+        buf = getattr(self._local, "text", None)
+        if buf is None:
+            buf = self._local.text = ctypes.create_unicode_buffer(512)
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(wintypes.HWND(hwnd), ctypes.byref(pid))
+        if pid.value != self._own_pid:
+            user32.InternalGetWindowText(wintypes.HWND(hwnd), buf, len(buf))
+            return buf.value
+        if user32.IsHungAppWindow(hwnd):
+            return None
+        copied = ctypes.c_size_t()
+        if not user32.SendMessageTimeoutW(wintypes.HWND(hwnd), WM_GETTEXT, len(buf), buf,
+                                          SMTO_ABORTIFHUNG | SMTO_BLOCK, timeout_ms,
+                                          ctypes.byref(copied)):
+            return None
+        return buf.value
+
+    def get_class(self, hwnd):
+        return self._win32gui.GetClassName(hwnd)
+
+    def get_pid(self, hwnd):
+        return self._win32process.GetWindowThreadProcessId(hwnd)[1]
+
+    def get_long(self, hwnd, index):
+        return self._win32gui.GetWindowLong(hwnd, index)
+
+    def set_long(self, hwnd, index, value):
+        self._win32gui.SetWindowLong(hwnd, index, value)
+
+    def get_rect(self, hwnd):
+        return self._win32gui.GetWindowRect(hwnd)
+
+    def set_pos(self, hwnd, x, y, w, h, flags):
+        self._win32gui.SetWindowPos(hwnd, None, x, y, w, h, flags)
+
+    def set_pos_batch(self, moves):
+        """Posiciona varias ventanas [(hwnd, x, y, w, h, flags)].
+
+        Las ventanas de un mismo hilo se mueven en una sola transacción
+        DeferWindowPos (un único repintado); las sueltas, con SetWindowPos
+        asíncrono para no esperar a un hilo ajeno que no responde.
+        """
+        win32gui = self._win32gui
+        by_thread = {}
+        for move in moves:
+            try:
+                tid = self._win32process.GetWindowThreadProcessId(move[0])[0]
+            except win32gui.error:
+                continue  # la ventana ya no existe
+            by_thread.setdefault(tid, []).append(move)
+        for group in by_thread.values():
+            if len(group) > 1:
+                try:
+                    hdwp = win32gui.BeginDeferWindowPos(len(group))
+                    for hwnd, x, y, w, h, flags in group:
+                        hdwp = win32gui.DeferWindowPos(hdwp, hwnd, None, x, y, w, h, flags)
+                    win32gui.EndDeferWindowPos(hdwp)
+                    continue
+                except win32gui.error:
+                    pass  # alguna ventana ha desaparecido: se mueven una a una
+            for hwnd, x, y, w, h, flags in group:
+                try:
+                    win32gui.SetWindowPos(hwnd, None, x, y, w, h, flags | SWP_ASYNCWINDOWPOS)
+                except win32gui.error:
+                    pass
+
+    def screen_size(self):
+        return self._win32api.GetSystemMetrics(0), self._win32api.GetSystemMetrics(1)
+
+    def display_signature(self):
+        """Valores baratos que cambian al cambiar la configuración de pantalla."""
+        gsm = self._win32api.GetSystemMetrics
+        return (gsm(SM_CMONITORS), gsm(SM_XVIRTUALSCREEN), gsm(SM_YVIRTUALSCREEN),
+                gsm(SM_CXVIRTUALSCREEN), gsm(SM_CYVIRTUALSCREEN)) + self.screen_size()
+
+    def monitors(self):
+        """[(rect, work, dpi, principal)] de cada monitor."""
+        result = []
+        for hmon, _, _ in self._win32api.EnumDisplayMonitors(None, None):
+            info = self._win32api.GetMonitorInfo(hmon)
+            result.append((tuple(info["Monitor"]), tuple(info["Work"]),
+                           self._monitor_dpi(hmon),
+                           bool(info["Flags"] & MONITORINFOF_PRIMARY)))
+        return result
+
+    def _monitor_dpi(self, hmon):
+        ctypes = self._ctypes
+        try:
+            dpi_x, dpi_y = ctypes.c_uint(), ctypes.c_uint()
+            # MDT_EFFECTIVE_DPI = 0; disponible desde Windows 8.1
+            if ctypes.windll.shcore.GetDpiForMonitor(
+                    ctypes.c_void_p(int(hmon)), 0,
+                    ctypes.byref(dpi_x), ctypes.byref(dpi_y)) == 0:
+                return dpi_x.value
+        except (AttributeError, OSError):
+            pass
+        return 96
+
+    def clear_dwm_frame(self, hwnd):
+        ctypes, wintypes = self._ctypes, self._wintypes
+        try:
+            val = ctypes.c_int(0)
+            ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                wintypes.HWND(hwnd),
+                ctypes.c_uint(self.DWMWA_EXTENDED_FRAME_BOUNDS),
+                ctypes.byref(val),
+                ctypes.sizeof(val)
+            )
+        except Exception:
+            pass
+
+    def open_process(self, pid):
+        """Abre el proceso y devuelve (handle, ruta del ejecutable), o None si
+        no se puede. El handle sigue abierto hasta close_process: mientras
+        tanto el pid no se reutiliza."""
+        ctypes, wintypes = self._ctypes, self._wintypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        handle = kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION | self.SYNCHRONIZE,
+                                      False, pid)
+        if not handle:
+            return None
+        buf = ctypes.create_unicode_buffer(1024)
+        size = wintypes.DWORD(len(buf))
+        if not kernel32.QueryFullProcessImageNameW(wintypes.HANDLE(handle), 0, buf,
+                                                   ctypes.byref(size)):
+            kernel32.CloseHandle(wintypes.HANDLE(handle))
+            return None
+        return handle, buf.value
+
+    def process_exited(self, handle):
+        """True si el proceso ya ha terminado (espera de 0 ms, sin abrir nada)."""
+        ctypes, wintypes = self._ctypes, self._wintypes
+        return ctypes.windll.kernel32.WaitForSingleObject(wintypes.HANDLE(handle), 0) == 0
+
+    def close_process(self, handle):
+        ctypes, wintypes = self._ctypes, self._wintypes
+        ctypes.windll.kernel32.CloseHandle(wintypes.HANDLE(handle))
+
+
+class SimWindow:
+    __slots__ = ("title", "cls", "pid", "style", "exstyle", "rect", "visible")
+
+    def __init__(self, title, cls, pid, style, exstyle, rect, visible):
+        self.title = title
+        self.cls = cls
+        self.pid = pid
+        self.style = style
+        self.exstyle = exstyle
+        self.rect = rect
+        self.visible = visible
+
+
+class SimulatedBackend:
+    """Escritorio en memoria con las mismas primitivas que Win32Backend.
+
+    Cuenta cada llamada en `calls` (nombre de primitiva -> veces) para poder
+    medir cuántas llamadas Win32 haría cada operación.
+    """
+
+    def __init__(self, screen=(1920, 1080), own_pid=1):
+        self.screen = screen
+        # pid de la propia aplicación: solo sus ventanas se leen con WM_GETTEXT
+        self.own_pid = own_pid
+        # [(rect, work, dpi, principal)]; por defecto un único monitor
+        self.displays = [((0, 0) + tuple(screen), (0, 0, screen[0], screen[1] - 40), 96, True)]
+        self.windows = {}
+        self.processes = {}
+        # pid -> hora de creación (un pid reutilizado tiene otra)
+        self.started = {}
+        self._clock = itertools.count(1)
+        self.calls = Counter()
+        # hwnd -> segundos que tarda en responder (ventanas colgadas)
+        self.hung = {}
+        self._next_hwnd = itertools.count(0x10000, 4)
+
+    # -- Manipulación del escritorio simulado --------------------------------
+
+    def add_window(self, title, cls="SimWindow", pid=1000, exe="sim.exe",
+                   rect=(100, 100, 900, 700), visible=True, hwnd=None):
+        """Abre una ventana; con hwnd se reutiliza ese handle (hwnd reciclado).
+        Con exe=None su proceso no se puede abrir (como uno elevado)."""
+        if hwnd is None:
+            hwnd = next(self._next_hwnd)
+        self.windows[hwnd] = SimWindow(title, cls, pid, WS_OVERLAPPEDWINDOW | WS_VISIBLE,
+                                       WS_EX_WINDOWEDGE, tuple(rect), visible)
+        if pid not in self.processes:
+            self.processes[pid] = None if exe is None else "C:\\Juegos\\" + exe
+            self.started[pid] = next(self._clock)
+        return hwnd
+
+    def close_window(self, hwnd):
+        self.windows.pop(hwnd, None)
+
+    def set_owner(self, hwnd, pid, exe="sim.exe", cls=None):
+        """Cambia el proceso (y la clase) de una ventana abierta."""
+        w = self.windows[hwnd]
+        w.pid = pid
+        if cls is not None:
+            w.cls = cls
+        if pid not in self.processes:
+            self.processes[pid] = "C:\\Juegos\\" + exe
+            self.started[pid] = next(self._clock)
+
+    def end_process(self, pid):
+        """Termina el proceso: cierra sus ventanas y libera el pid."""
+        for hwnd in [h for h, w in self.windows.items() if w.pid == pid]:
+            del self.windows[hwnd]
+        self.processes.pop(pid, None)
+        self.started.pop(pid, None)
+
+    def set_title(self, hwnd, title):
+        self.windows[hwnd].title = title
+
+    def add_monitor(self, rect, work=None, dpi=96):
+        """Añade un monitor secundario; devuelve su índice."""
+        self.displays.append((tuple(rect), tuple(work or rect), dpi, False))
+        return len(self.displays) - 1
+
+    def hang(self, hwnd, seconds):
+        """Hace que la ventana tarde `seconds` en responder a SetWindowLong."""
+        self.hung[hwnd] = seconds
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    # -- Primitivas ------------------------------------------------------------
+
+    def enum_windows(self, visible=False, exclude=(), cls=None, pids=None):
+        self.calls["EnumWindows"] += 1
+        out = array("Q")
+        for hwnd, w in self.windows.items():
+            if visible:
+                self.calls["IsWindowVisible"] += 1
+                if not w.visible:
+                    continue
+            if hwnd in exclude:
+                continue
+            if pids is not None:
+                self.calls["GetWindowThreadProcessId"] += 1
+                if w.pid not in pids:
+                    continue
+            if cls is not None:
+                self.calls["GetClassName"] += 1
+                if w.cls != cls:
+                    continue
+            out.append(hwnd)
+        return out
+
+    def is_window(self, hwnd):
+        self.calls["IsWindow"] += 1
+        return hwnd in self.windows
+
+    def is_visible(self, hwnd):
+        self.calls["IsWindowVisible"] += 1
+        w = self.windows.get(hwnd)
+        return bool(w and w.visible)
+
+    def get_text(self, hwnd):
+        self.calls["GetWindowText"] += 1
+        w = self.windows.get(hwnd)
+        return w.title if w else ""
+
+    def get_text_timeout(self, hwnd, timeout_ms):
+        w = self.windows.get(hwnd)
+        if w is not None and w.pid != self.own_pid:
+            self.calls["GetWindowThreadProcessId"] += 1
+            self.calls["InternalGetWindowText"] += 1
+            return w.title
+        self.calls["SendMessageTimeout"] += 1
+        if hwnd in self.hung:
+            time.sleep(min(self.hung[hwnd], timeout_ms / 1000.0))
+            return None
+        w = self.windows.get(hwnd)
+        return w.title if w else ""
+
+    def get_class(self, hwnd):
+        self.calls["GetClassName"] += 1
+        w = self.windows.get(hwnd)
+        return w.cls if w else ""
+
+    def get_pid(self, hwnd):
+        self.calls["GetWindowThreadProcessId"] += 1
+        w = self.windows.get(hwnd)
+        return w.pid if w else 0
+
+    def get_long(self, hwnd, index):
+        self.calls["GetWindowLong"] += 1
+        w = self._window(hwnd)
+        return w.style if index == GWL_STYLE else w.exstyle
+
+    def set_long(self, hwnd, index, value):
+        self.calls["SetWindowLong"] += 1
+        if hwnd in self.hung:
+            time.sleep(self.hung[hwnd])
+        w = self._window(hwnd)
+        if index == GWL_STYLE:
+            w.style = value
+        else:
+            w.exstyle = value
+
+    def get_rect(self, hwnd):
+        self.calls["GetWindowRect"] += 1
+        return self._window(hwnd).rect
+
+    def set_pos(self, hwnd, x, y, w, h, flags):
+        self.calls["SetWindowPos"] += 1
+        self._window(hwnd).rect = (x, y, x + w, y + h)
+
+    def set_pos_batch(self, moves):
+        # Mismo reparto que Win32Backend, con el pid en lugar del hilo dueño
+        by_owner = {}
+        for move in moves:
+            self.calls["GetWindowThreadProcessId"] += 1
+            w = self.windows.get(move[0])
+            if w is not None:
+                by_owner.setdefault(w.pid, []).append(move)
+        for group in by_owner.values():
+            if len(group) > 1:
+                self.calls["BeginDeferWindowPos"] += 1
+                self.calls["DeferWindowPos"] += len(group)
+                self.calls["EndDeferWindowPos"] += 1
+            else:
+                self.calls["SetWindowPos"] += 1
+            for hwnd, x, y, w, h, flags in group:
+                self.windows[hwnd].rect = (x, y, x + w, y + h)
+
+    def screen_size(self):
+        self.calls["GetSystemMetrics"] += 2
+        return self.screen
+
+    def display_signature(self):
+        self.calls["GetSystemMetrics"] += 7
+        return tuple(self.displays)
+
+    def monitors(self):
+        self.calls["EnumDisplayMonitors"] += 1
+        self.calls["GetMonitorInfo"] += len(self.displays)
+        return list(self.displays)
+
+    def clear_dwm_frame(self, hwnd):
+        self.calls["DwmSetWindowAttribute"] += 1
+
+    def open_process(self, pid):
+        self.calls["OpenProcess"] += 1
+        image = self.processes.get(pid)
+        if image is None:
+            return None
+        # El handle recuerda el inicio para que process_exited detecte el pid reutilizado
+        return (pid, self.started[pid]), image
+
+    def process_exited(self, handle):
+        self.calls["WaitForSingleObject"] += 1
+        pid, created = handle
+        return self.started.get(pid) != created
+
+    def close_process(self, handle):
+        self.calls["CloseHandle"] += 1
+
+    def _window(self, hwnd):
+        w = self.windows.get(hwnd)
+        if w is None:
+            raise OSError(1400, "Invalid window handle")
+        return w
+
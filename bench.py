@@ -0,0 +1,1351 @@
+"""Benchmarks del pipeline de sincronización (ejecutables fuera de Windows).
+
+Todos los escenarios corren sobre backends.SimulatedBackend, que cuenta las
+llamadas Win32 que haría cada operación.
+
+Uso:
+    python bench.py                        # todos los escenarios
+    python bench.py pipeline --sizes 10 1000
+    python bench.py --json bench.json      # guarda los resultados
+    python bench.py --json new.json --baseline bench.json   # compara tiempos
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import utils
+from backends import SimulatedBackend, WS_POPUP, WS_OVERLAPPEDWINDOW, WS_VISIBLE
+from borderless_sync import BorderlessSync
+from journal import StateJournal
+from rules import RuleEngine, RulesCache
+from scheduler import AdaptiveScheduler
+from shutdown import revert_with_deadline
+from stats import STATS
+from constants import SYNC_MIN_INTERVAL, SYNC_MAX_INTERVAL, SAFETY_POLL_INTERVAL, EVENT_COALESCE
+from widgets import TitleIndex, VirtualList
+from window_events import (EventCollector, FakeEventSource,
+                           EVENT_CREATE, EVENT_DESTROY, EVENT_NAMECHANGE)
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+REGRESSION_RATIO = 1.25
+SCENARIOS = {}
+
+
+def scenario(fn):
+    SCENARIOS[fn.__name__[len("bench_"):]] = fn
+    return fn
+
+
+def simulated_desktop(n):
+    """Instala en utils un escritorio simulado con n ventanas "Ventana i"."""
+    backend = SimulatedBackend()
+    for i in range(n):
+        backend.add_window(f"Ventana {i}", pid=1000 + i % 200, exe=f"app{i % 50}.exe")
+    utils.set_backend(backend)
+    return backend
+
+
+class FakeListbox:
+    """Sustituto de tk.Listbox que solo cuenta las operaciones."""
+
+    def __init__(self):
+        self.items = []
+        self.ops = 0
+
+    def delete(self, first, last=None):
+        self.ops += 1
+        if last == "end":
+            del self.items[first:]
+        else:
+            del self.items[first:(first if last is None else last) + 1]
+
+    def insert(self, idx, *items):
+        self.ops += 1
+        if idx == "end":
+            self.items.extend(items)
+        else:
+            self.items[idx:idx] = items
+
+    def selection_clear(self, first, last=None):
+        self.selected = None
+
+    def selection_set(self, idx):
+        self.selected = idx
+
+
+def _timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+@scenario
+def bench_events(sizes, repeat=5):
+    """Pasada completa (sondeo) frente a pasada incremental por eventos."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(n)
+        rules = {f"Ventana {i}" for i in range(0, n, 10)} | {"Juego"}
+        compiled = RuleEngine(rules)
+        engine = BorderlessSync(load_engine=lambda: compiled)
+        collector = EventCollector()
+        source = FakeEventSource()
+
+        def on_event(event):
+            utils.invalidate_title(event.hwnd)
+            collector.push(event)
+        source.start(on_event)
+
+        engine.sync()
+        backend.reset_calls()
+        poll_ms = _timeit(engine.sync, repeat)
+        poll_calls = sum(backend.calls.values()) // repeat
+
+        # Un juego se abre, cambia de título y se cierra
+        def one_event_tick():
+            hwnd = backend.add_window("Juego")
+            source.emit(EVENT_CREATE, hwnd)
+            source.emit(EVENT_NAMECHANGE, hwnd)
+            engine.sync(*collector.drain())
+            assert utils.is_borderless(hwnd)
+            utils.revert_borderless(hwnd)
+            backend.close_window(hwnd)
+            source.emit(EVENT_DESTROY, hwnd)
+            engine.sync(*collector.drain())
+        backend.reset_calls()
+        event_ms = _timeit(one_event_tick, repeat)
+        event_calls = sum(backend.calls.values()) // repeat
+        results.append({
+            "windows": n,
+            "poll_ms": round(poll_ms, 4),
+            "poll_calls": poll_calls,
+            "event_ms": round(event_ms, 4),
+            "event_calls": event_calls,
+        })
+    return results
+
+
+def synthetic_rules(n, titles, seed=0):
+    """Mezcla de reglas: 70 % exactas, 15 % glob, 10 % regex y 5 % ejecutable."""
+    rnd = random.Random(seed)
+    rules = set()
+    for i in range(n):
+        kind = rnd.random()
+        if kind < 0.70:
+            rules.add(rnd.choice(titles) if titles else f"Ventana {i}")
+        elif kind < 0.85:
+            rules.add(f"glob:Juego {i} - *")
+        elif kind < 0.95:
+            rules.add(f"re:^Herramienta {i} \\(v\\d+\\)$")
+        else:
+            rules.add(f"exe:app{i}.exe")
+    return rules
+
+
+# Regex cuyos grupos cambiarían de número al unirlas en un solo patrón
+GROUPED_RULES = {"re:(c)x", r"re:(a)(b)\2", r"re:^(?P<n>J)uego (\d+) \2$", "re:^Juego 7",
+                 "re:(?i)herramienta", "re:^Ventana [0-9]+$"}
+GROUPED_TITLES = ["abb", "cx", "abc", "Juego 4 4", "Juego 4 5", "Juego 7", "HERRAMIENTA",
+                  "Ventana 12", "nada"]
+
+
+@scenario
+def bench_rules(sizes, repeat=5):
+    """Clasificación de n ventanas con n reglas: bucle anidado original frente
+    a RuleEngine. Las regex con grupos y referencias (GROUPED_RULES) deben
+    casar igual que probadas una a una."""
+    grouped = RuleEngine(GROUPED_RULES)
+    for title in GROUPED_TITLES:
+        expected = [rule for rule in GROUPED_RULES if re.search(rule[len("re:"):], title)]
+        rule = grouped.match(title)
+        assert (rule in expected) if expected else rule is None, (title, rule, expected)
+    # RulesCache: una compilación por versión de las reglas, contada en STATS
+    versions = [{"Juego": None}]
+    cache = RulesCache(lambda: versions[-1])
+    STATS.enabled = True
+    STATS.reset()
+    try:
+        for _ in range(3):
+            cache.engine()
+        versions.append({"Juego": None, "Lanzador": None})
+        cache.engine()
+        cache_counts = (STATS.counters["rules_cache_hits"], STATS.counters["rules_cache_misses"])
+    finally:
+        STATS.enabled = False
+    assert cache_counts == (2, 2), cache_counts
+    results = []
+    for n in sizes:
+        windows = [(0x1000 + i, f"Ventana {i}") for i in range(n)]
+        titles = [t for _, t in windows]
+        rules = synthetic_rules(n, titles)
+        exact = {r for r in rules if ":" not in r}
+
+        def nested():
+            # Algoritmo anterior: O(reglas x ventanas), solo títulos exactos
+            open_titles = set(t for _, t in windows)
+            found = []
+            for title in exact:
+                if title in open_titles:
+                    for hwnd, t in windows:
+                        if t == title:
+                            found.append(hwnd)
+            return found
+
+        t0 = time.perf_counter()
+        engine = RuleEngine(rules)
+        compile_ms = (time.perf_counter() - t0) * 1000.0
+
+        def indexed():
+            match = engine.match
+            return [hwnd for hwnd, t in windows if match(t) is not None]
+
+        assert sorted(nested()) == sorted(indexed())
+        results.append({
+            "windows": n,
+            "rules": len(engine),
+            "nested_ms": round(_timeit(nested, repeat if n <= 1000 else 1), 4),
+            "engine_ms": round(_timeit(indexed, repeat), 4),
+            "compile_ms": round(compile_ms, 4),
+        })
+    return results
+
+
+@scenario
+def bench_stress(sizes, duration=1.0):
+    """Carreras entre aplicar, sincronizar, revertir y leer el estado.
+
+    Comprueba que ningún estado original guardado es ya borderless, que las
+    vistas del estado se pueden recorrer mientras otros hilos escriben y que,
+    al terminar, registro y estilos coinciden.
+    """
+    results = []
+    for n in sizes:
+        n = min(n, 1000)
+        backend = simulated_desktop(n)
+        hwnds = list(backend.windows)
+        originals = {h: backend.windows[h].style for h in hwnds}
+        rules = {f"Ventana {i}" for i in range(0, n, 2)}
+        compiled = RuleEngine(rules)
+        engine = BorderlessSync(load_engine=lambda: compiled)
+        stop = threading.Event()
+        errors = []
+        ops = [0]
+
+        def worker(action, seed):
+            rnd = random.Random(seed)
+            try:
+                while not stop.is_set():
+                    action(rnd)
+                    ops[0] += 1
+            except Exception as e:
+                errors.append(repr(e))
+                stop.set()
+
+        def apply(rnd):
+            utils.make_borderless(rnd.choice(hwnds))
+
+        def revert(rnd):
+            utils.revert_borderless(rnd.choice(hwnds))
+
+        def sync(rnd):
+            engine.sync()
+
+        def read(rnd):
+            for hwnd, (style, _, _) in utils.get_original_states().items():
+                if style & WS_POPUP:
+                    raise AssertionError(f"estado original corrupto en {hwnd:#x}")
+            len(engine.active_titles)
+
+        actions = [apply, apply, revert, revert, sync, read, read]
+        threads = [threading.Thread(target=worker, args=(a, i)) for i, a in enumerate(actions)]
+        # Cambios de contexto frecuentes para provocar intercalados
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            for t in threads:
+                t.start()
+            stop.wait(duration)
+            stop.set()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        tracked = utils.get_original_states()
+        mismatched = [h for h in hwnds
+                      if (h in tracked) != bool(backend.windows[h].style & WS_POPUP)]
+        utils.revert_all()
+        leftover = [h for h in hwnds if backend.windows[h].style != originals[h]]
+        if errors or mismatched or leftover:
+            raise AssertionError(f"errores={errors[:3]} desajustes={len(mismatched)} "
+                                 f"sin restaurar={len(leftover)}")
+        results.append({"windows": n, "threads": len(threads), "ops": ops[0],
+                        "ops_per_s": round(ops[0] / duration)})
+    return results
+
+
+def _profile(backend, fn, reset=None, repeat=3):
+    """Mide fn: mejor tiempo de repeat ejecuciones, llamadas Win32 por
+    ejecución y pico de memoria asignada (en una ejecución aparte)."""
+    best = float("inf")
+    calls = 0
+    for _ in range(repeat):
+        if reset:
+            reset()
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+        calls = sum(backend.calls.values())
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": round(best * 1000.0, 4), "calls": calls, "alloc_kb": round(peak / 1024, 1)}
+
+
+@scenario
+def bench_pipeline(sizes):
+    """Coste por tick de _sync_borderless_state, _load_active_windows y
+    apply_selected con n ventanas y n reglas."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(n)
+        titles = [w.title for w in backend.windows.values()]
+        compiled = RuleEngine(synthetic_rules(n, titles[::10]))
+        engine = BorderlessSync(load_engine=lambda: compiled)
+
+        def reset_sync():
+            utils.revert_all()
+            engine.reset()
+
+        def sync_tick():
+            engine.sync()
+            return engine.active_windows()
+
+        row = {"windows": n, "rules": len(compiled)}
+        first = _profile(backend, sync_tick, reset=reset_sync)
+        sync_tick()
+        steady = _profile(backend, sync_tick)
+
+        listbox = FakeListbox()
+        rows = VirtualList(listbox)
+        rows.update(utils.WindowSnapshot(engine.active_windows()))
+        listbox.ops = 0
+
+        def load_active():
+            rows.update(utils.WindowSnapshot(engine.active_windows()))
+        active = _profile(backend, load_active)
+
+        target = next(t for t in titles if compiled.match(t) is None)
+        hwnd = next(h for h, w in backend.windows.items() if w.title == target)
+        apply = _profile(backend, lambda: engine.apply_title(target, 1280, 720, "C"),
+                         reset=lambda: utils.revert_borderless(hwnd))
+
+        for name, prof in (("sync_first", first), ("sync_tick", steady),
+                           ("load_active", active), ("apply", apply)):
+            for key, value in prof.items():
+                row[f"{name}_{key}"] = value
+        row["listbox_ops"] = listbox.ops
+        results.append(row)
+    utils.revert_all()
+    return results
+
+
+@scenario
+def bench_monitors(sizes):
+    """Borderless automático de n ventanas repartidas en tres monitores:
+    comprueba que cada una queda en el suyo y cuenta las consultas de
+    métricas que hace el lote (deben ser las de una única comprobación)."""
+    metrics = ("GetSystemMetrics", "EnumDisplayMonitors", "GetMonitorInfo")
+    results = []
+    for n in sizes:
+        backend = SimulatedBackend()
+        backend.add_monitor((1920, 0, 4480, 1440), dpi=120)
+        backend.add_monitor((-1280, 0, 0, 1024))
+        hosts = []
+        for i in range(n):
+            left = (0, 2000, -1200)[i % 3]
+            backend.add_window(f"Juego {i}", rect=(left + 10, 10, left + 650, 490))
+            hosts.append(i % 3)
+        utils.set_backend(backend)
+        compiled = RuleEngine({w.title for w in backend.windows.values()})
+        engine = BorderlessSync(load_engine=lambda: compiled)
+        utils.check_display()
+
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        applied = engine.sync()
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        assert applied == n
+        for (hwnd, w), host in zip(backend.windows.items(), hosts):
+            assert w.rect == backend.displays[host][0], (hwnd, w.rect)
+        results.append({"windows": n, "monitors": len(backend.displays),
+                         "apply_ms": round(elapsed, 3),
+                         "metric_calls": sum(backend.calls[k] for k in metrics)})
+    utils.revert_all()
+    return results
+
+
+@scenario
+def bench_batch(sizes, processes=4):
+    """Aplicar borderless a n ventanas con el mismo título (repartidas entre
+    unos pocos procesos) y revertirlas todas al salir: cuántos posicionados
+    se confirman frente a un SetWindowPos por ventana."""
+    results = []
+    for n in sizes:
+        backend = SimulatedBackend()
+        for i in range(n):
+            backend.add_window("Lanzador", pid=2000 + i % processes)
+        utils.set_backend(backend)
+        engine = BorderlessSync(load_engine=lambda: None)
+
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        applied, errors = engine.apply_title("Lanzador", 1280, 720)
+        apply_ms = (time.perf_counter() - t0) * 1000.0
+        assert applied == n and not errors
+        apply_commits = backend.calls["SetWindowPos"] + backend.calls["EndDeferWindowPos"]
+
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        utils.revert_all()
+        revert_ms = (time.perf_counter() - t0) * 1000.0
+        assert not utils.get_original_states()
+        revert_commits = backend.calls["SetWindowPos"] + backend.calls["EndDeferWindowPos"]
+        results.append({"windows": n, "processes": processes,
+                        "apply_ms": round(apply_ms, 3), "apply_commits": apply_commits,
+                        "revert_all_ms": round(revert_ms, 3), "revert_commits": revert_commits,
+                        "per_window_commits": n})
+    return results
+
+
+@scenario
+def bench_shutdown(sizes, hung=3, per_window=0.3, total=1.0):
+    """Cierre con n ventanas en borderless, `hung` de ellas colgadas: el
+    cierre no debe pasar de `total` segundos y las colgadas quedan marcadas
+    en el journal para el siguiente arranque."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(n)
+        hwnds = list(backend.windows)
+        utils.make_borderless_many([(h, None, None, "C", None) for h in hwnds])
+        stuck = set(hwnds[:min(hung, n)])
+        for hwnd in stuck:
+            backend.hang(hwnd, 30)
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = StateJournal(os.path.join(tmp, "journal.jsonl"))
+            for hwnd in hwnds:
+                journal.record_add(hwnd, 0, "SimWindow", 0, 0, (0, 0, 1, 1))
+            journal.start()
+            report = revert_with_deadline(per_window=per_window, total=total, journal=journal)
+            journal.close()
+            retry = {h for h, rec in StateJournal(journal.path).replay().items() if rec.get("retry")}
+        assert report.elapsed_ms < (total + 0.5) * 1000.0, report
+        assert set(report.missed) == stuck == retry, report
+        results.append({"windows": n, "hung": len(stuck),
+                        "shutdown_ms": round(report.elapsed_ms, 1),
+                        "reverted": len(report.reverted), "missed": len(report.missed),
+                        "failed": len(report.failed)})
+        backend.hung.clear()
+    return results
+
+
+@scenario
+def bench_titles(sizes, hung=3):
+    """Dos refrescos seguidos de list_windows con `hung` ventanas colgadas
+    del propio proceso y otras tantas de otros procesos. Las de otros
+    procesos se leen sin enviar mensajes (nunca bloquean); las propias se
+    omiten sin bloquear más que el límite por ventana, y el segundo
+    refresco sale de la caché de títulos."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(n)
+        hwnds = list(backend.windows)
+        stuck = hwnds[:min(hung, n)]
+        for hwnd in stuck:
+            backend.windows[hwnd].pid = backend.own_pid
+            backend.hang(hwnd, 30)
+        for hwnd in hwnds[len(stuck):2 * len(stuck)]:
+            backend.hang(hwnd, 30)
+        row = {"windows": n, "hung": len(stuck)}
+        for name in ("first", "second"):
+            backend.reset_calls()
+            t0 = time.perf_counter()
+            windows = utils.list_windows()
+            row[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            row[f"{name}_sent_messages"] = backend.calls["SendMessageTimeout"]
+            row[f"{name}_text_calls"] = (backend.calls["SendMessageTimeout"]
+                                         + backend.calls["InternalGetWindowText"])
+            assert len(windows) == n - len(stuck)
+        assert row["first_sent_messages"] == len(stuck)
+        backend.hung.clear()
+
+        # Invalidaciones desde otro hilo (el hook de eventos) durante los
+        # refrescos del worker: la caché no debe romperse
+        stop = threading.Event()
+        hwnds = list(backend.windows)
+        def invalidate():
+            while not stop.is_set():
+                for hwnd in hwnds:
+                    utils.invalidate_title(hwnd)
+        thread = threading.Thread(target=invalidate)
+        thread.start()
+        try:
+            for i in range(200):
+                backend.windows[hwnds[i % n]].visible = bool(i % 2)
+                utils.list_windows()
+        finally:
+            stop.set()
+            thread.join()
+        results.append(row)
+    return results
+
+
+def legacy_list_windows(backend, exclude_hwnds=None):
+    """list_windows tal como era antes del enumerador con filtros (referencia)."""
+    hwnds = []
+    for h in backend.enum_windows():
+        hwnds.append(h)  # callback de Python por ventana
+    windows = []
+    exclude = set(exclude_hwnds or [])
+    for h in hwnds:
+        if h in exclude:
+            continue
+        if backend.is_visible(h):
+            t = backend.get_text(h).strip()
+            if t:
+                windows.append((h, t))
+    return windows
+
+
+@scenario
+def bench_enumerate(sizes):
+    """list_windows actual (filtros en la enumeración, array('Q')) frente a
+    la implementación anterior, con la mitad de las ventanas ocultas como en
+    un escritorio real. Las dos se miden con la caché de títulos vacía en
+    cada repetición (la anterior no la usaba); current_warm es la actual con
+    la caché ya llena, como en las pasadas seguidas del sondeo. En Windows
+    se compara además el WindowEnumerator de ctypes con win32gui.EnumWindows
+    sobre el escritorio real (fila "win32")."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(0)
+        for i in range(n):
+            backend.add_window(f"Ventana {i}", visible=i % 2 == 0)
+        exclude = [next(iter(backend.windows))]
+        assert utils.list_windows(exclude) == legacy_list_windows(backend, exclude)
+        row = {"windows": n}
+        for name, fn, reset in (
+                ("legacy", lambda: legacy_list_windows(backend, exclude), None),
+                ("current", lambda: utils.list_windows(exclude), utils.invalidate_title),
+                ("current_warm", lambda: utils.list_windows(exclude), None)):
+            for key, value in _profile(backend, fn, reset=reset).items():
+                row[f"{name}_{key}"] = value
+        results.append(row)
+    if sys.platform == "win32":
+        results.append(_win32_enumerate())
+    return results
+
+
+def _win32_enumerate(attempts=3):
+    """WindowEnumerator frente a win32gui.EnumWindows + IsWindowVisible en el
+    escritorio real: mismas ventanas (se reintenta si alguna se abre o se
+    cierra entre las dos enumeraciones) y tiempo de cada una."""
+    import win32gui
+    from backends import WindowEnumerator
+
+    def reference(exclude):
+        found = []
+        win32gui.EnumWindows(lambda h, _: found.append(h), None)
+        return [h for h in found if win32gui.IsWindowVisible(h) and h not in exclude]
+
+    enumerator = WindowEnumerator()
+    exclude = {win32gui.GetDesktopWindow(), win32gui.GetForegroundWindow()}
+    for _ in range(attempts):
+        current = list(enumerator.run(visible=True, exclude=exclude))
+        if current == reference(exclude):
+            break
+    else:
+        raise AssertionError("WindowEnumerator no coincide con win32gui.EnumWindows")
+    row = {"windows": "win32", "visible": len(current)}
+    for name, fn in (("pywin32", lambda: reference(exclude)),
+                     ("ctypes", lambda: enumerator.run(visible=True, exclude=exclude))):
+        row[f"{name}_ms"] = round(_timeit(fn, 5), 4)
+    return row
+
+
+@scenario
+def bench_identity(sizes):
+    """n ventanas con el mismo título y una regla que las cubre: se aplican
+    todas, y al cambiarles el título siguen activas sin revertirse ni
+    volver a aplicarse. Una ventana sin regla se reevalúa al renombrarse."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(0)
+        same = [backend.add_window("Juego") for _ in range(n)]
+        other = backend.add_window("Lanzador")
+        engine = BorderlessSync(load_engine=lambda: RuleEngine({"Juego", "Juego v2"}))
+        row = {"windows": n}
+        for name in ("first", "retitled", "renamed_other"):
+            if name == "retitled":
+                for hwnd in same:
+                    backend.set_title(hwnd, f"Juego - nivel {hwnd}")
+            elif name == "renamed_other":
+                backend.set_title(other, "Juego v2")
+            utils.invalidate_title()
+            backend.reset_calls()
+            t0 = time.perf_counter()
+            applied = engine.sync()
+            row[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            row[f"{name}_applied"] = applied
+        assert row["first_applied"] == n and row["retitled_applied"] == 0
+        assert row["renamed_other_applied"] == 1
+        assert len(engine.active_titles) == n + 1
+        assert all(utils.is_borderless(hwnd) for hwnd in same)
+        results.append(row)
+        utils.revert_all()
+    return results
+
+
+@scenario
+def bench_processes(sizes, processes=20):
+    """Reglas por ejecutable con n ventanas de `processes` procesos: cada
+    proceso se abre una sola vez, las pasadas siguientes no abren ninguno,
+    un proceso que no se puede abrir solo se reintenta pasado FAILED_TTL y
+    un pid reutilizado por otro programa no hereda el ejecutable anterior."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(0)
+        for i in range(n):
+            pid = 4000 + i % processes
+            backend.add_window(f"Ventana {i}", pid=pid, exe=f"app{pid}.exe")
+        engine = BorderlessSync(load_engine=lambda: RuleEngine({"exe:nuevo.exe"}))
+        row = {"windows": n, "processes": processes}
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        listed = utils.with_exe(utils.list_windows())
+        engine.sync()
+        row["first_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        row["first_opens"] = backend.calls["OpenProcess"]
+        assert row["first_opens"] == min(n, processes)
+        assert all(exe == f"app{backend.windows[h].pid}.exe" for h, _, exe in listed)
+
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        utils.with_exe(utils.list_windows())
+        engine.sync()
+        row["steady_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        row["steady_opens"] = backend.calls["OpenProcess"]
+        assert row["steady_opens"] == 0
+
+        # Un proceso elevado: open_process falla y no se reintenta hasta que
+        # caduca el fallo
+        cache = utils._processes
+        now = [0.0]
+        cache.clock = lambda: now[0]
+        try:
+            for _ in range(3):
+                backend.add_window("Administrador", pid=9000, exe=None)
+            opens = []
+            for now[0] in (0.0, cache.FAILED_TTL / 2, cache.FAILED_TTL * 2):
+                backend.reset_calls()
+                utils.with_exe(utils.list_windows())
+                opens.append(backend.calls["OpenProcess"])
+            row["failed_opens"] = opens
+            assert opens == [1, 0, 1], opens
+        finally:
+            cache.clock = time.monotonic
+        backend.end_process(9000)
+
+        # El proceso termina y su pid lo reutiliza otro ejecutable
+        backend.end_process(4000)
+        assert utils._processes.prune(backend, force=True) == 1
+        hwnd = backend.add_window("Nuevo", pid=4000, exe="nuevo.exe")
+        assert engine.sync() == 1 and utils.window_exe(hwnd) == "nuevo.exe"
+        row["cached"] = len(utils._processes)
+        results.append(row)
+        utils.revert_all()
+    return results
+
+
+@scenario
+def bench_uptime(sizes, cycles=500):
+    """Muchas sesiones de juego seguidas sobre n ventanas de fondo: cada
+    juego se abre, se aplica y se cierra sin revertir (por evento o visto
+    en una pasada completa). El estado seguido, las cachés y el coste por
+    pasada no deben crecer; un hwnd reciclado por otro programa no cuenta
+    como borderless."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(n)
+        engine = BorderlessSync(load_engine=lambda: RuleEngine({"Juego"}))
+        engine.sync()
+        STATS.enabled = True
+        STATS.reset()
+        row = {"windows": n, "cycles": cycles}
+        for cycle in range(cycles):
+            hwnd = backend.add_window("Juego", cls="GameWindow", pid=9000 + cycle % 7)
+            assert engine.sync([hwnd]) == 1
+            backend.close_window(hwnd)
+            if cycle % 2:
+                engine.sync([], [hwnd])
+            else:
+                engine.sync()
+            if cycle == 0:
+                backend.reset_calls()
+                engine.sync()
+                row["first_tick_calls"] = sum(backend.calls.values())
+        backend.reset_calls()
+        engine.sync()
+        row["last_tick_calls"] = sum(backend.calls.values())
+        assert row["last_tick_calls"] == row["first_tick_calls"]
+
+        # hwnd reciclado sin evento de destrucción
+        hwnd = backend.add_window("Juego", cls="GameWindow", pid=9100)
+        engine.sync([hwnd])
+        del backend.windows[hwnd]
+        backend.add_window("Navegador", pid=9200, hwnd=hwnd)
+        engine.sync()
+        assert not utils.is_borderless(hwnd)
+
+        row["evicted"] = STATS.counters["dead_windows_evicted"]
+        row["recycled"] = STATS.counters["recycled_hwnds_evicted"]
+        row["tracked"] = len(utils.get_original_states())
+        row["known"] = len(engine._identity) + len(engine._decided)
+        row["titles_cached"] = len(utils._titles)
+        assert row["tracked"] == 0 and row["evicted"] == cycles and row["recycled"] == 1
+        assert row["known"] <= 2 * (n + 1)
+        STATS.enabled = False
+        results.append(row)
+    return results
+
+
+class FakeRoot:
+    """Sustituto de tk.Tk que solo guarda y ejecuta las llamadas a after()."""
+
+    def __init__(self):
+        self.scheduled = []
+        self.wakeups = 0
+
+    def after(self, ms, fn, *args):
+        self.scheduled.append((fn, args))
+
+    def run(self):
+        while self.scheduled:
+            fn, args = self.scheduled.pop(0)
+            self.wakeups += 1
+            fn(*args)
+
+
+@scenario
+def bench_drift(sizes, ticks=200):
+    """n juegos en borderless; uno recupera el marco una vez y otro lo hace
+    tras cada reaplicación. El primero se repara en la pasada siguiente y
+    el segundo se deja tras DriftMonitor.MAX_RETRIES intentos espaciados,
+    sin convertirse en un bucle de SetWindowLong."""
+    results = []
+    for n in sizes:
+        backend = simulated_desktop(0)
+        games = [backend.add_window(f"Juego {i}") for i in range(n)]
+        engine = BorderlessSync(load_engine=lambda: RuleEngine({"glob:Juego *"}))
+        now = [0.0]
+        engine.drift.clock = lambda: now[0]
+        assert engine.sync() == n
+        once, fighter = games[0], games[-1]
+        framed = WS_OVERLAPPEDWINDOW | WS_VISIBLE
+
+        backend.windows[once].style = framed
+        backend.reset_calls()
+        t0 = time.perf_counter()
+        engine.sync()
+        row = {"windows": n, "verify_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+               "verify_calls": sum(backend.calls.values())}
+        assert backend.windows[once].style & WS_POPUP
+
+        backend.reset_calls()
+        for _ in range(ticks):
+            now[0] += 2.0
+            backend.windows[fighter].style = framed
+            engine.sync()
+        row["fighter_set_long"] = backend.calls["SetWindowLong"]
+        assert row["fighter_set_long"] == 2 * engine.drift.MAX_RETRIES
+        assert engine.drift.given_up() == [fighter]
+        results.append(row)
+        utils.revert_all()
+    return results
+
+
+@scenario
+def bench_settings(sizes, delay=0.05):
+    """n ediciones seguidas de reglas y configuración: se publican al
+    momento, se escriben una sola vez por fichero y get() no toca el disco.
+    Una edición externa del fichero se detecta y avisa a los suscriptores."""
+    from settings_store import ConfigStore, RulesStore
+    from rules import RulesCache, NO_PROFILE
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            config = ConfigStore(os.path.join(tmp, f"config{n}.json"), delay=delay)
+            rules = RulesStore(os.path.join(tmp, f"rules{n}.json"), delay=delay)
+            cache = RulesCache(rules.get)
+            seen = []
+            rules.subscribe(seen.append)
+            STATS.enabled = True
+            STATS.reset()
+            t0 = time.perf_counter()
+            for i in range(n):
+                progs = dict(rules.get())
+                progs[f"Juego {i}"] = NO_PROFILE
+                rules.set(progs)
+                config.update(resolution=f"{1280 + i}x720")
+            edit_ms = (time.perf_counter() - t0) * 1000.0
+            engine = cache.engine()
+            assert len(engine) == n and cache.engine() is engine
+            time.sleep(delay * 4)
+            row = {"edits": n, "edit_ms": round(edit_ms, 3),
+                   "writes": STATS.counters["settings_writes"],
+                   "reads": STATS.counters["settings_reads"]}
+            assert row["writes"] == 2 and len(seen) == n
+
+            t0 = time.perf_counter()
+            for _ in range(1000):
+                cache.engine()
+            row["engine_get_us"] = round((time.perf_counter() - t0) * 1000.0, 3)
+
+            # Edición a mano del fichero de reglas
+            with open(rules.path, "w", encoding="utf-8") as f:
+                json.dump(["Otro juego"], f)
+            assert cache.engine().match("Otro juego") == "Otro juego" and len(seen) == n + 1
+            assert not os.path.exists(rules.path + ".tmp")
+            STATS.enabled = False
+            results.append(row)
+    return results
+
+
+@scenario
+def bench_ipc(sizes, rounds=20):
+    """Control por el canal local (cli.py) con n ventanas: un lote con
+    apply + list + add-rule + stats en una sola conexión. Mide la ida y
+    vuelta del lote y de un comando suelto; el socket es un Unix socket
+    temporal (una tubería con nombre en Windows)."""
+    import ipc
+    from settings_store import RulesStore
+    if sys.platform == "win32":
+        address_of = lambda n: r"\\.\pipe\borderless-bench-%d-%d" % (os.getpid(), n)
+    else:
+        address_of = None
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            backend = simulated_desktop(n)
+            game = backend.add_window("Juego", exe="juego.exe")
+            rules = RulesStore(os.path.join(tmp, f"rules{n}.json"), delay=0.05)
+            engine = BorderlessSync(load_engine=lambda: RuleEngine(set(rules.get())))
+            address = address_of(n) if address_of else os.path.join(tmp, f"ipc{n}.sock")
+            server = ipc.ControlServer(ipc.sync_handlers(engine, rules=rules), address)
+            server.start()
+            try:
+                batch = [{"cmd": "apply", "title": "Juego", "resolution": "1280x720"},
+                         {"cmd": "list", "active": True},
+                         {"cmd": "add-rule", "rule": "exe:app1.exe"},
+                         {"cmd": "apply", "title": "Juego", "alignment": "X"},
+                         {"cmd": "stats"}]
+                t0 = time.perf_counter()
+                responses = ipc.send(batch, address)
+                row = {"windows": n, "batch_ms": round((time.perf_counter() - t0) * 1000.0, 3)}
+                assert responses[0] == {"ok": True, "result": {"applied": 1, "errors": []}}
+                assert responses[1]["result"] == [[game, "Juego"]]
+                assert responses[2]["ok"] and "exe:app1.exe" in rules.get()
+                assert not responses[3]["ok"] and "Alineación" in responses[3]["error"]
+                x, y, right, bottom = backend.windows[game].rect
+                assert (right - x, bottom - y) == (1280, 720)
+
+                t0 = time.perf_counter()
+                for _ in range(rounds):
+                    ipc.send([{"cmd": "sync"}], address)
+                row["command_ms"] = round((time.perf_counter() - t0) * 1000.0 / rounds, 3)
+                reverted = ipc.send([{"cmd": "revert", "title": "Juego"}], address)
+                assert reverted == [{"ok": True, "result": 1}]
+                # Un lote que no es lista ni objeto recibe respuesta igualmente
+                from multiprocessing.connection import Client
+                for payload in (5, None, "sync"):
+                    with Client(address) as conn:
+                        conn.send_bytes(json.dumps(payload).encode("utf-8"))
+                        assert conn.poll(1), payload
+                        assert json.loads(conn.recv_bytes()) == [{"ok": False, "error": "Lote inválido."}]
+            finally:
+                server.stop()
+            try:
+                ipc.send([{"cmd": "stats"}], address, timeout=1)
+                raise AssertionError("el servidor sigue respondiendo")
+            except ConnectionError:
+                pass
+            results.append(row)
+            utils.revert_all()
+    return results
+
+
+# Consulta tecleada letra a letra en bench_lists
+TYPED_QUERY = "ventana 4 app4"
+
+
+@scenario
+def bench_lists(sizes, churn=0.01):
+    """Lista virtual con n ventanas: carga inicial, una actualización con un
+    1 % de ventanas nuevas/cerradas/renombradas, la búsqueda tecleada letra
+    a letra (TYPED_QUERY) y un desplazamiento hasta el final. El Listbox
+    solo guarda las filas visibles. Falla si una tecla examina más filas que
+    el resultado de la anterior (solo la primera recorre el índice entero) o
+    si toca el Listbox más de dos veces; los *_ms son solo datos."""
+    results = []
+    for n in sizes:
+        windows = {1000 + i: f"Ventana {i}  (app{i % 50}.exe)" for i in range(n)}
+        listbox = FakeListbox()
+        view = VirtualList(listbox, rows=20)
+        t0 = time.perf_counter()
+        view.update(utils.WindowSnapshot(windows))
+        row = {"windows": n, "load_ms": round((time.perf_counter() - t0) * 1000.0, 3)}
+        assert len(listbox.items) <= view.rows + 1
+        view.selected = 1001 + n // 2
+
+        # Cambios entre dos enumeraciones
+        step = max(1, int(1 / churn))
+        for i, hwnd in enumerate(list(windows)[::step]):
+            if i % 2:
+                del windows[hwnd]
+            else:
+                windows[hwnd] += " *"
+        for i in range(n // step):
+            windows[10 ** 7 + i] = f"Nueva {i}  (nueva.exe)"
+        listbox.ops = 0
+        t0 = time.perf_counter()
+        view.update(utils.WindowSnapshot(windows))
+        row["update_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        row["update_listbox_ops"] = listbox.ops
+
+        keys, scanned, previous = [], 0, len(view.index)
+        listbox.ops = 0
+        for end in range(1, len(TYPED_QUERY) + 1):
+            ops = listbox.ops
+            t0 = time.perf_counter()
+            view.filter(TYPED_QUERY[:end])
+            keys.append((time.perf_counter() - t0) * 1000.0)
+            assert view.index.scanned <= previous, (TYPED_QUERY[:end], view.index.scanned, previous)
+            assert listbox.ops - ops <= 2, listbox.ops - ops
+            scanned += view.index.scanned
+            previous = len(view.items)
+        row["keystroke_ms"] = round(max(keys), 3)
+        row["typed_scanned"] = scanned
+        row["typed_listbox_ops"] = listbox.ops
+        words = TYPED_QUERY.split()
+        expected = [h for h, t in windows.items() if all(w in t.casefold() for w in words)]
+        assert view.items == expected, (len(view.items), len(expected))
+
+        # Un índice sin la búsqueda anterior (sin acotar) como referencia
+        index = TitleIndex()
+        index.update(utils.WindowSnapshot(windows))
+        t0 = time.perf_counter()
+        index.search(TYPED_QUERY)
+        row["full_search_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+
+        view.filter("")
+        t0 = time.perf_counter()
+        view.yview("moveto", "1.0")
+        row["scroll_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        assert listbox.items[-1] == windows[view.items[-1]]
+        assert view.selection() == (1001 + n // 2, windows[1001 + n // 2])
+        results.append(row)
+    return results
+
+
+# Trazas grabadas con main.py --trace que bench_replay reproduce además
+# de la sesión sintética
+TRACES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")
+
+
+def record_synthetic_session(path, n, ticks=300):
+    """Graba en path una sesión de juego sobre un escritorio simulado con n
+    ventanas: un launcher que abre y cierra n/20 ventanas por tick, alt-tab
+    que oculta y muestra ventanas, un contador de FPS en el título del
+    juego, el juego recuperando el marco cada 40 ticks y, a mitad, el
+    juego reiniciado con su hwnd reciclado. Los eventos se procesan como
+    en main.py (pasadas incrementales) con una pasada completa cada 50."""
+    from traces import TraceRecorder
+    from rules import RulesCache, NO_PROFILE
+    backend = simulated_desktop(n)
+    rules = {"exe:juego.exe": NO_PROFILE, "glob:Launcher *": NO_PROFILE}
+    now = [0.0]
+    recorder = TraceRecorder(path, get_rules=lambda: rules, clock=lambda: now[0])
+    cache = RulesCache(lambda: rules)
+    engine = recorder.attach(BorderlessSync(backend=recorder.backend, load_engine=cache.engine))
+    engine.drift.clock = lambda: now[0]
+    rng = random.Random(n)
+    engine.sync()
+    game = backend.add_window("Juego - 60 FPS", pid=7000, exe="juego.exe")
+    launchers = []
+    for tick in range(ticks):
+        now[0] += 0.25
+        changed, destroyed = {game}, set()
+        if 10 <= tick < 30:
+            for _ in range(max(1, n // 20)):
+                launchers.append(backend.add_window(f"Launcher {len(launchers)}",
+                                                    pid=8000, exe="launcher.exe"))
+                changed.add(launchers[-1])
+        elif tick == 30:
+            for hwnd in launchers:
+                backend.close_window(hwnd)
+            destroyed.update(launchers)
+        for hwnd in rng.sample(sorted(backend.windows), min(3, len(backend.windows))):
+            backend.windows[hwnd].visible = not backend.windows[hwnd].visible
+            changed.add(hwnd)
+        if tick == ticks // 2:
+            backend.end_process(7000)
+            backend.add_window("Juego - 60 FPS", pid=7001, exe="juego.exe", hwnd=game)
+        else:
+            backend.set_title(game, f"Juego - {rng.randint(30, 144)} FPS")
+        if tick % 40 == 39:
+            backend.windows[game].style = WS_OVERLAPPEDWINDOW | WS_VISIBLE
+        for hwnd in changed:
+            utils.invalidate_title(hwnd)
+        if tick % 50 == 49:
+            engine.sync()
+        else:
+            engine.sync(changed - destroyed, destroyed)
+    recorder.close()
+    utils.revert_all()
+
+
+@scenario
+def bench_replay(sizes, ticks=300):
+    """Graba la sesión sintética (record_synthetic_session) con n ventanas y
+    la reproduce sobre un escritorio nuevo: duración de cada operación
+    reproducida y tamaño de la traza. Falla si la reproducción no hace lo
+    mismo que la grabación. Las trazas de TRACES_DIR se reproducen también
+    (una fila por traza)."""
+    from traces import replay
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"sesion{n}.trace.gz")
+            record_synthetic_session(path, n, ticks)
+            report = replay(path)
+            row = {"windows": n, **report.summary(), "trace_kb": round(os.path.getsize(path) / 1024, 1)}
+            assert not report.mismatches, report.mismatches[:5]
+            assert report.summary()["ops"] == ticks + 1
+            results.append(row)
+            utils.revert_all()
+    if os.path.isdir(TRACES_DIR):
+        for name in sorted(os.listdir(TRACES_DIR)):
+            if name.endswith((".trace", ".trace.gz")):
+                report = replay(os.path.join(TRACES_DIR, name))
+                results.append({"windows": name, **report.summary()})
+                utils.revert_all()
+    return results
+
+
+@scenario
+def bench_journal(sizes):
+    """Escritura en lote del journal, compactación y replay de n ventanas.
+    Si no se puede escribir, el hilo se detiene avisando y no se encola más."""
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "journal.jsonl")
+            journal = StateJournal(path)
+            journal.replay()
+            journal.start()
+            t0 = time.perf_counter()
+            for i in range(n):
+                journal.record_add(0x1000 + i, 100 + i, "GameWindow", 0x14CF0000, 0x100, (0, 0, 800, 600))
+            for i in range(0, n, 2):
+                journal.record_del(0x1000 + i)
+            enqueue_ms = (time.perf_counter() - t0) * 1000.0
+            journal.close()
+            write_ms = (time.perf_counter() - t0) * 1000.0
+            with open(path, "rb") as f:
+                lines = sum(1 for _ in f)
+
+            t0 = time.perf_counter()
+            live = StateJournal(path).replay()
+            replay_ms = (time.perf_counter() - t0) * 1000.0
+            assert sorted(live) == [0x1000 + i for i in range(1, n, 2)]
+
+            # Disco que falla: la carpeta del journal es un fichero
+            blocker = os.path.join(tmp, "bloqueo")
+            open(blocker, "w").close()
+            errors = []
+            journal = StateJournal(os.path.join(blocker, "journal.jsonl"))
+            journal.on_error = errors.append
+            journal.start()
+            journal._thread.join(5)
+            for i in range(n):
+                journal.record_add(0x1000 + i, 100 + i, "GameWindow", 0x14CF0000, 0x100, (0, 0, 800, 600))
+            assert isinstance(journal.failed, OSError) and errors == [journal.failed]
+            assert journal._queue.qsize() == 0
+            journal.close(timeout=1)
+        results.append({"windows": n, "enqueue_ms": round(enqueue_ms, 3),
+                         "write_ms": round(write_ms, 3), "file_lines": lines,
+                         "replay_ms": round(replay_ms, 3)})
+    return results
+
+
+@scenario
+def bench_scheduler(sizes, hours=8):
+    """Despertares del sondeo en `hours` horas simuladas de escritorio en
+    reposo con ráfagas de actividad, intervalo fijo frente a adaptativo.
+    Sobre el escritorio de n ventanas se mide además cuánto cuesta el sondeo.
+    Con un título que cambia sin parar (contador de FPS) las pasadas
+    completas siguen llegando como mucho cada max_interval."""
+    results = []
+    rng = random.Random(0)
+    horizon = hours * 3600.0
+    # Ráfagas de actividad (lanzadores abriendo ventanas): inicio, duración
+    bursts = sorted((rng.uniform(0, horizon), rng.uniform(5, 60)) for _ in range(hours * 2))
+
+    def busy(t):
+        return any(start <= t < start + length for start, length in bursts)
+
+    fixed = int(horizon / SYNC_MIN_INTERVAL)
+    scheduler = AdaptiveScheduler(SYNC_MIN_INTERVAL, SYNC_MAX_INTERVAL)
+    ticks, t = [], 0.0
+    while t < horizon:
+        ticks.append(t)
+        t += scheduler.tick(busy(t))
+    # Retraso hasta el primer tick que ve cada ráfaga
+    delays = [next((tick - start for tick in ticks if tick >= start), 0.0)
+              for start, _ in bursts]
+
+    # Un evento NAMECHANGE cada medio segundo durante una hora, con el bucle
+    # de main.py: toda espera acaba con un evento y sin full_due() no
+    # volvería a haber pasada completa
+    fps = AdaptiveScheduler(SYNC_MIN_INTERVAL, SAFETY_POLL_INTERVAL)
+    fulls, t, full = [], 0.0, True
+    while t < 3600.0:
+        if full:
+            fps.full_done(t)
+            fulls.append(t)
+        fps.tick(False)
+        t += 0.5 + EVENT_COALESCE
+        full = fps.full_due(t)
+    full_gap = max(b - a for a, b in zip(fulls, fulls[1:]))
+    assert full_gap < fps.max_interval + 1.0, full_gap
+
+    # El worker solo despierta a Tk mientras hay resultados pendientes: en
+    # reposo (y en modo --tray) no añade despertares a los del sondeo
+    from worker import Win32Worker
+    root = FakeRoot()
+    worker = Win32Worker()
+    worker.attach(root)
+    idle_polls = len(root.scheduled)
+    done = []
+    for _ in range(5):
+        worker.submit(lambda: None, on_done=done.append).result()
+    root.run()
+    assert len(done) == 5 and not root.scheduled
+    five_task_wakeups = root.wakeups
+    # Un callback que falla no deja sin entregar los resultados siguientes
+    def broken(_):
+        raise RuntimeError("callback roto")
+    stderr, sys.stderr = sys.stderr, open(os.devnull, "w")
+    try:
+        worker.submit(lambda: None, on_done=broken).result()
+        worker.submit(lambda: None, on_done=done.append).result()
+        root.run()
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+    assert len(done) == 6 and not root.scheduled and not worker._pending
+    worker.stop()
+
+    for n in sizes:
+        backend = simulated_desktop(n)
+        engine = BorderlessSync(load_engine=lambda: None)
+        engine.sync()
+        tick = _profile(backend, engine.sync)
+        results.append({"windows": n, "hours": hours, "fixed_wakeups": fixed,
+                        "adaptive_wakeups": len(ticks), "worker_idle_wakeups": idle_polls,
+                        "worker_wakeups_5_tasks": five_task_wakeups,
+                        "max_detect_delay_s": round(max(delays, default=0.0), 1),
+                        "fps_title_max_full_gap_s": round(full_gap, 1),
+                        "fixed_cpu_ms": round(fixed * tick["ms"], 1),
+                        "adaptive_cpu_ms": round(len(ticks) * tick["ms"], 1)})
+    return results
+
+
+# Módulos que el arranque en segundo plano (main --tray) no debe cargar
+# hasta abrir su ventana. tkinter no está: el tray corre en el mainloop de Tk.
+DEFERRED_MODULES = ("widgets", "config_window", "borderless_programs_window")
+# Llamadas al sistema de la primera sincronización: por ventana (visible,
+# pid y título) más las fijas (métricas, monitores y la ventana que casa).
+STARTUP_CALLS_PER_WINDOW = 3
+STARTUP_FIXED_CALLS = 30
+
+
+def import_closure(module, here):
+    """Módulos que carga `import module`: sus imports de nivel de módulo (no
+    los que hay dentro de funciones o de un if), seguidos recursivamente por
+    los módulos del repositorio. Se calcula sobre el código, sin importarlo
+    (main.py crea el mutex al importarse y necesita pywin32)."""
+    import ast
+    order, seen, stack = [], set(), [module]
+    while stack:
+        name = stack.pop(0)
+        if name in seen:
+            continue
+        seen.add(name)
+        order.append(name)
+        path = os.path.join(here, name + ".py")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        statements = list(tree.body)
+        for node in statements:
+            if isinstance(node, ast.Try):
+                statements.extend(node.body)
+            elif isinstance(node, ast.Import):
+                stack.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                stack.append(node.module)
+    return order
+
+
+_STARTUP_CHILD = """
+import sys, time, json
+missing = []
+before = len(sys.modules)
+t0 = time.perf_counter()
+for name in {modules!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        missing.append(name)
+t1 = time.perf_counter()
+loaded_modules = len(sys.modules) - before
+import utils
+from backends import SimulatedBackend
+from borderless_sync import BorderlessSync
+from rules import RuleEngine
+backend = SimulatedBackend()
+for i in range({n}):
+    backend.add_window("Ventana %d" % i)
+utils.set_backend(backend)
+backend.reset_calls()
+t2 = time.perf_counter()
+BorderlessSync(load_engine=lambda: RuleEngine({{"Ventana 0"}})).sync()
+t3 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000.0, "first_sync_ms": (t3 - t2) * 1000.0,
+                  "loaded": sorted(m for m in {deferred!r} if m in sys.modules),
+                  "missing": missing, "loaded_modules": loaded_modules,
+                  "first_sync_calls": sum(backend.calls.values())}}))
+"""
+
+
+@scenario
+def bench_startup(sizes, repeat=3):
+    """Arranque en frío en un intérprete nuevo: importación de lo que importa
+    main.py (import_closure) y primera sincronización con n ventanas. Falla
+    si main.py arrastra la interfaz (DEFERRED_MODULES), tanto en sus imports
+    como en lo que queda cargado tras importarlos, o si la primera
+    sincronización hace más llamadas al sistema de las que permiten
+    STARTUP_CALLS_PER_WINDOW y STARTUP_FIXED_CALLS. Los *_ms son solo datos
+    (dependen de la máquina) y se comparan con --baseline. Los
+    módulos que no están instalados (pywin32 fuera de Windows) se cuentan
+    en "missing" y no se miden."""
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    closure = import_closure("main", here)
+    eager = sorted(set(closure) & set(DEFERRED_MODULES))
+    assert not eager, f"main.py importa al arrancar {eager}"
+    modules = [name for name in closure if name != "main"]
+    results = []
+    for n in sizes:
+        code = _STARTUP_CHILD.format(modules=modules, deferred=DEFERRED_MODULES, n=n)
+        runs = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                                 capture_output=True, text=True).stdout
+            wall = (time.perf_counter() - t0) * 1000.0
+            runs.append(dict(json.loads(out), wall_ms=wall))
+        best = {key: min(r[key] for r in runs) for key in ("import_ms", "first_sync_ms", "wall_ms")}
+        assert not runs[0]["loaded"], f"el arranque carga {runs[0]['loaded']}"
+        calls = runs[0]["first_sync_calls"]
+        assert calls <= STARTUP_CALLS_PER_WINDOW * n + STARTUP_FIXED_CALLS, calls
+        results.append({"windows": n, **{k: round(v, 2) for k, v in best.items()},
+                        "first_sync_calls": calls, "modules": len(modules),
+                        "loaded_modules": runs[0]["loaded_modules"],
+                        "missing": len(runs[0]["missing"])})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*",
+                        help="escenarios a ejecutar (por defecto, todos): "
+                             + ", ".join(sorted(SCENARIOS)))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--json", help="fichero donde guardar los resultados")
+    parser.add_argument("--baseline", help="resultados previos (--json) con los que comparar")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("escenario desconocido: " + ", ".join(sorted(unknown)))
+
+    report = {}
+    for name in args.scenarios or sorted(SCENARIOS):
+        report[name] = SCENARIOS[name](args.sizes)
+        print(f"== {name}")
+        for row in report[name]:
+            print("  " + "  ".join(f"{k}={v}" for k, v in row.items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            return 1 if compare(json.load(f), report) else 0
+    return 0
+
+
+def compare(baseline, report):
+    """Muestra los tiempos (*_ms) que empeoran más de REGRESSION_RATIO.
+    Devuelve la lista de regresiones."""
+    regressions = []
+    for name, rows in report.items():
+        old_rows = {row.get("windows"): row for row in baseline.get(name, [])}
+        for row in rows:
+            old = old_rows.get(row.get("windows"))
+            if not old:
+                continue
+            for key, value in row.items():
+                before = old.get(key)
+                if not key.endswith("_ms") or not before:
+                    continue
+                ratio = value / before
+                if ratio > REGRESSION_RATIO:
+                    regressions.append((name, row["windows"], key, before, value))
+                    print(f"REGRESIÓN {name} n={row['windows']} {key}: "
+                          f"{before} -> {value} ms (x{ratio:.2f})")
+    if not regressions:
+        print("Sin regresiones respecto a la línea base.")
+    return regressions
+
+
+if __name__ == "__main__":
+    sys.exit(main())
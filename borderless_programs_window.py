@@ -1,29 +1,41 @@
 import os
 import sys
-import json
+import re
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 import utils
-from constants import BORDERLESS_PROGRAMS_PATH
+from monitors import ALIGN_FACTORS, monitor_choices
+from rules import make_profile, parse_resolution, NO_PROFILE, RULE_GLOB, RULE_REGEX, RULE_EXE
+from settings_store import RULES
+from constants import WORKER_TIMEOUT
+from widgets import searchable_list
+
+# Opción de los desplegables del perfil que hereda la configuración global
+GLOBAL_LABEL = "(global)"
+# Opción mostrada mientras se leen los monitores en el worker
+LOADING_LABEL = "Cargando..."
 
 def load_borderless_programs():
-    try:
-        with open(BORDERLESS_PROGRAMS_PATH, "r", encoding="utf-8") as f:
-            return set(json.load(f))
-    except Exception:
-        return set()
-
-def save_borderless_programs(programs):
-    try:
-        with open(BORDERLESS_PROGRAMS_PATH, "w", encoding="utf-8") as f:
-            json.dump(sorted(list(programs)), f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        messagebox.showerror("Error al guardar programas borderless", str(e))
-
-def open_borderless_programs_window(parent):
+    """Copia de { regla: Profile } para editarla y pasarla a RULES.set()."""
+    return dict(RULES.get())
+
+def describe_profile(profile):
+    """Resumen corto de un perfil para la lista ("" si no tiene)."""
+    parts = [profile.resolution, profile.alignment or ""]
+    if isinstance(profile.monitor, int):
+        parts.append(f"monitor {profile.monitor + 1}")
+    elif profile.monitor is not None:
+        parts.append("principal")
+    return " ".join(p for p in parts if p)
+
+def open_borderless_programs_window(parent, worker):
+    """Abre el editor de reglas. Los cambios se publican en settings_store.RULES
+    (sus suscriptores se enteran al momento; el fichero se escribe después).
+    Las ventanas abiertas y los monitores se leen en `worker` (el Win32Worker
+    de la aplicación), nunca en el hilo de Tk."""
     win = tk.Toplevel(parent)
     win.title("Borderless automático")
-    win.geometry("400x400")
+    win.geometry("480x400")
     win.transient(parent)
     win.grab_set()
 
@@ -31,67 +43,190 @@ def open_borderless_programs_window(parent):
     lst = tk.Listbox(win, width=50, height=15)
     lst.pack(fill=tk.BOTH, expand=True, padx=10)
 
+    shown = []  # regla de cada fila de lst
+
     def refresh():
         lst.delete(0, tk.END)
-        for title in sorted(load_borderless_programs()):
-            lst.insert(tk.END, title)
+        shown.clear()
+        progs = load_borderless_programs()
+        for rule in sorted(progs):
+            summary = describe_profile(progs[rule])
+            lst.insert(tk.END, f"{rule}   [{summary}]" if summary else rule)
+            shown.append(rule)
     refresh()
 
+    def save_and_notify(progs):
+        RULES.set(progs)
+        refresh()
+
     def add_title():
         # Ventana para seleccionar entre ventanas abiertas
         sel_win = tk.Toplevel(win)
         sel_win.title("Seleccionar ventana abierta")
-        sel_win.geometry("350x350")
+        sel_win.geometry("350x380")
         sel_win.transient(win)
         sel_win.grab_set()
 
         tk.Label(sel_win, text="Selecciona un título de ventana:").pack(pady=5)
-        avail_lst = tk.Listbox(sel_win, width=45, height=12)
-        avail_lst.pack(fill=tk.BOTH, expand=True, padx=10)
+        avail_lst = searchable_list(sel_win, width=45, height=12)
+        avail_lst.frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        avail = {}  # hwnd -> (título, ejecutable); una ventana por título
+        status = tk.StringVar(value="")
+        tk.Label(sel_win, textvariable=status).pack()
 
         def load_avail():
-            avail_lst.delete(0, tk.END)
+            status.set("Refrescando...")
+            worker.submit(lambda: utils.with_exe(utils.list_windows()),
+                          on_done=on_loaded, on_error=on_error, timeout=WORKER_TIMEOUT)
+
+        def on_loaded(windows):
+            if not sel_win.winfo_exists():
+                return
+            avail.clear()
             # Excluir títulos ya en la lista de borderless
             current = load_borderless_programs()
-            # Obtener títulos únicos de ventanas abiertas
-            titles = []
-            for hwnd, title in utils.list_windows():
+            # Títulos únicos de ventanas abiertas (se buscan también por ejecutable)
+            rows = []
+            titles = set()
+            for hwnd, title, exe in windows:
                 if title and title not in current and title not in titles:
-                    avail_lst.insert(tk.END, title)
-                    titles.append(title)
+                    titles.add(title)
+                    avail[hwnd] = (title, exe)
+                    rows.append((hwnd, f"{title}  ({exe})" if exe else title))
+            avail_lst.update(utils.WindowSnapshot(rows))
+            status.set("")
+
+        def on_error(error):
+            if sel_win.winfo_exists():
+                status.set("")
+                messagebox.showerror("Borderless Manager", str(error), parent=sel_win)
 
         load_avail()
 
-        def on_select():
-            sel = avail_lst.curselection()
+        def on_select(by_exe=False):
+            sel = avail_lst.selection()
             if not sel:
                 return
-            title = avail_lst.get(sel[0])
+            hwnd, _ = sel
+            title, exe = avail[hwnd]
+            if by_exe:
+                if not exe:
+                    messagebox.showwarning("Error", "No se pudo leer el ejecutable de la ventana.")
+                    return
+                title = RULE_EXE + exe
             progs = load_borderless_programs()
-            progs.add(title)
-            save_borderless_programs(progs)
-            refresh()
+            progs.setdefault(title, NO_PROFILE)
+            save_and_notify(progs)
             sel_win.destroy()
 
         btn_frame = tk.Frame(sel_win)
         btn_frame.pack(pady=8)
         tk.Button(btn_frame, text="🔄 Refrescar", command=load_avail).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Agregar", command=on_select).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Por ejecutable",
+                  command=lambda: on_select(by_exe=True)).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Cancelar", command=sel_win.destroy).pack(side=tk.LEFT, padx=5)
 
+    def add_pattern():
+        rule = simpledialog.askstring(
+            "Agregar patrón",
+            f"Regla con prefijo:\n"
+            f"  {RULE_GLOB}Juego*   (comodines)\n"
+            f"  {RULE_REGEX}^Juego .*   (expresión regular)\n"
+            f"  {RULE_EXE}juego.exe   (ejecutable)",
+            parent=win
+        )
+        if not rule or not rule.strip():
+            return
+        rule = rule.strip()
+        if rule.startswith(RULE_REGEX):
+            try:
+                re.compile(rule[len(RULE_REGEX):])
+            except re.error as e:
+                messagebox.showerror("Expresión regular inválida", str(e))
+                return
+        progs = load_borderless_programs()
+        progs.setdefault(rule, NO_PROFILE)
+        save_and_notify(progs)
+
     def remove_selected():
         sel = lst.curselection()
         if not sel:
             return
-        title = lst.get(sel[0])
+        title = shown[sel[0]]
         progs = load_borderless_programs()
         if title in progs:
-            progs.remove(title)
-            save_borderless_programs(progs)
-            refresh()
+            del progs[title]
+            save_and_notify(progs)
+
+    def edit_profile():
+        sel = lst.curselection()
+        if not sel:
+            messagebox.showwarning("Error", "Selecciona una regla.")
+            return
+        rule = shown[sel[0]]
+        profile = load_borderless_programs().get(rule, NO_PROFILE)
+
+        dlg = tk.Toplevel(win)
+        dlg.title("Perfil de la regla")
+        dlg.transient(win)
+        dlg.grab_set()
+        tk.Label(dlg, text=rule, wraplength=300).pack(pady=5)
+
+        # Vacío = resolución de la configuración global
+        tk.Label(dlg, text="Resolución (p. ej. 1280x720; vacío = global)").pack(pady=(5, 0))
+        resolution = tk.StringVar(value=profile.resolution)
+        tk.Entry(dlg, textvariable=resolution).pack()
+
+        tk.Label(dlg, text="Posición en pantalla").pack(pady=(5, 0))
+        alignment = tk.StringVar(value=profile.alignment or GLOBAL_LABEL)
+        tk.OptionMenu(dlg, alignment, GLOBAL_LABEL, *ALIGN_FACTORS).pack()
+
+        tk.Label(dlg, text="Monitor").pack(pady=(5, 0))
+        # Mientras el worker lee los monitores, la opción mostrada conserva
+        # el valor actual del perfil
+        monitors = {LOADING_LABEL: "" if profile.monitor is None else str(profile.monitor)}
+        monitor = tk.StringVar(value=LOADING_LABEL)
+        monitor_menu = tk.OptionMenu(dlg, monitor, LOADING_LABEL)
+        monitor_menu.pack()
+
+        def on_monitors(choices):
+            if not dlg.winfo_exists():
+                return
+            monitors.clear()
+            monitors[GLOBAL_LABEL] = ""
+            monitors.update((label, value) for label, value in choices if value)
+            menu = monitor_menu["menu"]
+            menu.delete(0, "end")
+            for label in monitors:
+                menu.add_command(label=label, command=lambda v=label: monitor.set(v))
+            monitor.set(next((label for label, value in monitors.items()
+                              if value and value == str(profile.monitor)), GLOBAL_LABEL))
+
+        worker.submit(lambda: monitor_choices(utils.get_topology()),
+                      on_done=on_monitors, timeout=WORKER_TIMEOUT)
+
+        def accept():
+            text = resolution.get().strip()
+            if text and parse_resolution(text) == (None, None):
+                messagebox.showerror("Resolución inválida", "Usa el formato ANCHOxALTO.", parent=dlg)
+                return
+            progs = load_borderless_programs()
+            progs[rule] = make_profile(text,
+                                       None if alignment.get() == GLOBAL_LABEL else alignment.get(),
+                                       monitors[monitor.get()])
+            save_and_notify(progs)
+            dlg.destroy()
+
+        row = tk.Frame(dlg)
+        row.pack(pady=8)
+        tk.Button(row, text="✅ Guardar", command=accept).pack(side=tk.LEFT, padx=5)
+        tk.Button(row, text="❌ Cancelar", command=dlg.destroy).pack(side=tk.LEFT, padx=5)
 
     btns = tk.Frame(win)
     btns.pack(pady=10)
     tk.Button(btns, text="➕ Agregar", command=add_title).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="✳️ Patrón...", command=add_pattern).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="🎯 Perfil...", command=edit_profile).pack(side=tk.LEFT, padx=5)
     tk.Button(btns, text="➖ Quitar", command=remove_selected).pack(side=tk.LEFT, padx=5)
     tk.Button(btns, text="Cerrar", command=win.destroy).pack(side=tk.LEFT, padx=5)
@@ -0,0 +1,226 @@
+import itertools
+from state_store import StateStore
+from stats import STATS
+from rules import Profile
+from drift import DriftMonitor
+
+
+class BorderlessSync:
+    """Motor de borderless automático, independiente de Tk.
+
+    `backend` debe ofrecer list_windows, describe_windows, window_title,
+    identify, get_original_states, is_borderless, forget_dead,
+    find_drifted, reapply_many, check_display, make_borderless_many y
+    revert_borderless (por defecto, el módulo utils).
+    `load_engine` devuelve el RuleEngine vigente y `get_defaults` el Profile
+    global (resolución, alineación y monitor de la configuración) que
+    completa los perfiles de cada regla.
+
+    Las ventanas se siguen por su identidad (utils.WindowIdentity), no por
+    el título: cada ventana se evalúa una vez por vida. Solo se vuelve a
+    evaluar una ventana que no casó si cambia su título o las reglas; una
+    ventana aplicada (o revertida a mano) no se vuelve a tocar aunque su
+    título cambie. Las que pierden el borderless por su cuenta se
+    reaplican con espera exponencial (ver drift.DriftMonitor).
+    """
+
+    DEFAULT_PROFILE = Profile(None, None, "C", None)
+
+    def __init__(self, backend=None, load_engine=None, get_defaults=None):
+        if backend is None:
+            import utils as backend
+        if load_engine is None:
+            from rules import RulesCache
+            load_engine = RulesCache().engine
+        self.backend = backend
+        self.load_engine = load_engine
+        self.get_defaults = get_defaults or (lambda: self.DEFAULT_PROFILE)
+        self.drift = DriftMonitor(backend.find_drifted, backend.reapply_many)
+
+        # Ventanas con borderless activo: { WindowIdentity: título }
+        self.active = StateStore()
+        # Ventanas abiertas conocidas: { hwnd: título }
+        self._open = {}
+        # Identidad de cada ventana conocida (se calcula una vez por ventana)
+        self._identity = {}
+        # Ventanas ya evaluadas: { hwnd: título evaluado sin casar, o None si
+        # ya está decidida para toda su vida }
+        self._decided = {}
+        self._engine = None
+        # Si la última pasada vio ventanas nuevas, cerradas o renombradas
+        self.last_changed = False
+
+    @property
+    def active_titles(self):
+        """Títulos de las ventanas con borderless activo (uno por ventana)."""
+        return list(self.active.snapshot().values())
+
+    def reset(self):
+        """Olvida lo decidido: la próxima pasada vuelve a evaluar todas las ventanas."""
+        self.active.replace({})
+        self._decided.clear()
+
+    def sync(self, changed=None, destroyed=()):
+        """Aplica borderless a las ventanas abiertas que estén en las reglas.
+
+        Con changed=None hace una pasada completa; si no, solo examina los
+        hwnds de changed y olvida los de destroyed. Devuelve cuántas ventanas
+        se han modificado.
+        """
+        with STATS.timer("sync"):
+            return self._sync(changed, destroyed)
+
+    def _sync(self, changed, destroyed):
+        engine = self.load_engine()
+        if engine is not self._engine:
+            # Reglas nuevas: las ventanas que no casaban se vuelven a evaluar
+            self._engine = engine
+            self._decided = {hwnd: title for hwnd, title in self._decided.items()
+                             if title is None}
+        self.backend.check_display()
+        # Ventanas en borderless destruidas o con el hwnd reciclado: una
+        # comprobación por lote en cada pasada completa, o solo las destruidas
+        if changed is None or destroyed:
+            self._forget(self.backend.forget_dead(None if changed is None else destroyed))
+        if changed is None:
+            windows = self.backend.list_windows()
+            previous = self._open
+            self._open = dict(windows)
+            self.last_changed = self._open != previous
+            gone = [hwnd for hwnd in previous if hwnd not in self._open]
+        else:
+            self.last_changed = bool(changed or destroyed)
+            for hwnd in itertools.chain(destroyed, changed):
+                self._open.pop(hwnd, None)
+            windows = self.backend.describe_windows(changed)
+            self._open.update(windows)
+            gone = destroyed
+
+        # 1. Aplica borderless a las ventanas nuevas que casan con alguna regla
+        pending = self._classify(engine, windows) if engine else {}
+        applied = 0
+        if pending:
+            targets = [(hwnd, p.width, p.height, p.alignment or "C", p.monitor)
+                       for hwnd, p in pending.items()]
+            done, failed = self.backend.make_borderless_many(targets)
+            self._mark_active_many((hwnd, self._open[hwnd]) for hwnd in done)
+            for hwnd, _ in failed:
+                # No se reintenta hasta que cambie el título
+                self._decided[hwnd] = self._open.get(hwnd)
+            applied = len(done)
+
+        # 2. Reaplica las ventanas que han perdido el borderless (todas en una
+        #    pasada completa; en una incremental, solo las que han cambiado)
+        if self.drift.check(None if changed is None else changed):
+            self.last_changed = True
+
+        # 3. Olvida las ventanas que ya no existen
+        self._forget(gone)
+        return applied
+
+    def apply_title(self, title, width=None, height=None, alignment="C", monitor=None,
+                    progress=None):
+        """Aplica borderless a todas las ventanas abiertas con ese título.
+
+        Devuelve (aplicadas, errores). progress((hechas, total)) informa del avance.
+        """
+        backend = self.backend
+        backend.check_display()
+        targets = [(hwnd, width, height, alignment, monitor)
+                   for hwnd, t in backend.list_windows()
+                   if t == title and not backend.is_borderless(hwnd)]
+        done, failed = backend.make_borderless_many(targets, progress)
+        self._mark_active_many((hwnd, title) for hwnd in done)
+        return len(done), [str(e) for hwnd, e in failed]
+
+    def revert(self, hwnd, title):
+        """Revierte una ventana. Devuelve False si no estaba en borderless.
+        El motor automático no la vuelve a aplicar mientras siga abierta."""
+        if not self.backend.is_borderless(hwnd):
+            return False
+        self.backend.revert_borderless(hwnd)
+        self.active.release(self._identify(hwnd))
+        self._decided[hwnd] = None
+        self.drift.forget((hwnd,))
+        return True
+
+    def available_windows(self, exclude_hwnds=None, skip_title=None):
+        """Ventanas visibles sin borderless (para la lista de disponibles)."""
+        is_borderless = self.backend.is_borderless
+        return [(hwnd, title)
+                for hwnd, title in self.backend.list_windows(exclude_hwnds=exclude_hwnds)
+                if not is_borderless(hwnd) and title != skip_title]
+
+    def active_windows(self):
+        """(hwnd, título) de las ventanas con borderless activo."""
+        window_title = self.backend.window_title
+        active = []
+        for hwnd in self.backend.get_original_states():
+            title = window_title(hwnd)
+            if title:
+                active.append((hwnd, title))
+        return active
+
+    def _classify(self, engine, windows):
+        """{ hwnd: Profile } de las ventanas sin decidir que casan con alguna
+        regla; cada perfil ya viene completado con el global."""
+        decided = self._decided
+        is_borderless = self.backend.is_borderless
+        match = engine.match
+        defaults = self.get_defaults()
+        resolved = {}
+        pending = {}
+        for hwnd, title in windows:
+            seen = decided.get(hwnd, False)
+            if seen is None or seen == title:
+                continue
+            if seen is not False:
+                # Cambio de título: el hwnd puede ser de otra ventana
+                self._refresh_identity(hwnd)
+            if is_borderless(hwnd):
+                self._mark_active(hwnd, title)
+                continue
+            rule = match(title)
+            if rule is None and engine.needs_exe:
+                rule = engine.match_exe(self._identify(hwnd).exe)
+            if rule is None:
+                decided[hwnd] = title
+                continue
+            profile = resolved.get(rule)
+            if profile is None:
+                profile = resolved[rule] = engine.profile(rule).merged(defaults)
+            pending[hwnd] = profile
+        return pending
+
+    def _identify(self, hwnd):
+        identity = self._identity.get(hwnd)
+        if identity is None:
+            identity = self._identity[hwnd] = self.backend.identify(hwnd)
+        return identity
+
+    def _refresh_identity(self, hwnd):
+        old = self._identity.pop(hwnd, None)
+        if old is not None and self._identify(hwnd) != old:
+            self.active.release(old)
+
+    def _mark_active(self, hwnd, title):
+        self.active.put(self._identify(hwnd), title)
+        self._decided[hwnd] = None
+
+    def _mark_active_many(self, windows):
+        # Un lote de (hwnd, título): una sola copia del estado compartido
+        active = {}
+        for hwnd, title in windows:
+            active[self._identify(hwnd)] = title
+            self._decided[hwnd] = None
+        self.active.update(active)
+
+    def _forget(self, hwnds):
+        self.drift.forget(hwnds)
+        gone = []
+        for hwnd in hwnds:
+            self._decided.pop(hwnd, None)
+            identity = self._identity.pop(hwnd, None)
+            if identity is not None:
+                gone.append(identity)
+        self.active.discard_many(gone)
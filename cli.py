@@ -0,0 +1,100 @@
+"""Control de Borderless Manager en marcha desde la línea de comandos.
+
+Uso:
+    python cli.py list [--active]
+    python cli.py apply "Título" [--resolution 1280x720] [--alignment C] [--monitor 1]
+    python cli.py revert "Título"
+    python cli.py add-rule "exe:juego.exe" [--resolution ...] [--alignment ...] [--monitor ...]
+    python cli.py remove-rule "exe:juego.exe"
+    python cli.py sync
+    python cli.py stats
+    python cli.py apply "Juego A" + apply "Juego B"    # varios comandos en un solo lote
+    python cli.py batch < comandos.json                # lote JSON [{"cmd": ...}, ...]
+
+Sale con 0 si todo ha ido bien, 1 si algún comando ha fallado y 2 si no hay
+ninguna instancia en marcha.
+"""
+import sys
+import json
+import argparse
+import ipc
+
+SEPARATOR = "+"
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("list", help="ventanas disponibles (o activas con --active)")
+    p.add_argument("--active", action="store_true")
+    for name, help_text in (("apply", "aplica borderless a las ventanas con ese título"),
+                            ("add-rule", "añade una regla de borderless automático")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("rule" if name == "add-rule" else "title")
+        p.add_argument("--resolution")
+        p.add_argument("--alignment")
+        p.add_argument("--monitor")
+    sub.add_parser("revert", help="revierte las ventanas con ese título").add_argument("title")
+    sub.add_parser("remove-rule", help="quita una regla").add_argument("rule")
+    sub.add_parser("sync", help="sincroniza ya el borderless automático")
+    sub.add_parser("stats", help="estadísticas internas")
+    sub.add_parser("batch", help="lee un lote JSON de la entrada estándar")
+    return parser
+
+
+def parse_commands(argv):
+    """Convierte los argumentos (comandos separados por "+") en un lote."""
+    parser = _parser()
+    commands, current = [], []
+    for arg in list(argv) + [SEPARATOR]:
+        if arg != SEPARATOR:
+            current.append(arg)
+            continue
+        if not current:
+            continue
+        args = vars(parser.parse_args(current))
+        current = []
+        if args["cmd"] == "batch":
+            commands.extend(json.load(sys.stdin))
+            continue
+        commands.append({key: value for key, value in args.items()
+                         if value is not None and value is not False})
+    if not commands:
+        parser.error("falta el comando")
+    return commands
+
+
+def _show(command, response):
+    if not response.get("ok"):
+        print(f"{command.get('cmd')}: error: {response.get('error')}", file=sys.stderr)
+        return
+    result = response.get("result")
+    if command.get("cmd") == "list":
+        for hwnd, title in result:
+            print(f"{hwnd:#x}\t{title}")
+    elif isinstance(result, (dict, list)):
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif result is not None:
+        print(result)
+
+
+def show(commands, responses):
+    """Muestra las respuestas de un lote; devuelve 0 si todas han ido bien y
+    1 si no."""
+    for command, response in zip(commands, responses):
+        _show(command, response)
+    return 0 if all(r.get("ok") for r in responses) else 1
+
+
+def main(argv=None):
+    commands = parse_commands(sys.argv[1:] if argv is None else argv)
+    try:
+        responses = ipc.send(commands)
+    except (ConnectionError, TimeoutError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    return show(commands, responses)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
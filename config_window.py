@@ -1,10 +1,16 @@
 import tkinter as tk
-import win32api
-import json
-from constants import BASE_PATH, CONFIG_PATH
+from tkinter import messagebox
+import utils
+from constants import BASE_PATH, WORKER_TIMEOUT
+from monitors import monitor_choices
+from settings_store import CONFIG
 
 class ConfigWindow:
-    def __init__(self, parent, selected_ratio, selected_resolution, selected_alignment):
+    def __init__(self, parent, worker, selected_ratio, selected_resolution, selected_alignment,
+                 selected_monitor=None):
+        # Monitores y resolución de pantalla se leen en worker (el Win32Worker
+        # de la aplicación), nunca en el hilo de Tk
+        self.worker = worker
         self.config = tk.Toplevel(parent)
         self.config.update_idletasks()
         
@@ -12,9 +18,10 @@ class ConfigWindow:
         self.selected_ratio = selected_ratio
         self.selected_resolution = selected_resolution
         self.selected_alignment = selected_alignment
+        self.selected_monitor = selected_monitor or tk.StringVar(value="")
 
         # Configuración de la ventana
-        win_w, win_h = 350, 400
+        win_w, win_h = 350, 460
         root_x = parent.winfo_rootx()
         root_y = parent.winfo_rooty()
         root_w = parent.winfo_width()
@@ -55,6 +62,10 @@ class ConfigWindow:
         tk.Label(self.config, text="Posición en pantalla").pack(pady=5)
         self._setup_position_grid()
 
+        # Monitor
+        tk.Label(self.config, text="Monitor").pack(pady=5)
+        self._setup_monitor_menu()
+
         # Botones
         tk.Button(self.config, text="📏 Detectar resolución actual", 
                  command=self.detect_resolution).pack(pady=10)
@@ -82,6 +93,30 @@ class ConfigWindow:
             )
             rb.grid(column=x, row=y, padx=5, pady=5)
 
+    def _setup_monitor_menu(self):
+        # Hasta que llegan los monitores, selected_monitor conserva su valor
+        self.monitor_label = tk.StringVar(value="Cargando...")
+        self.monitor_menu = tk.OptionMenu(self.config, self.monitor_label, "")
+        self.monitor_menu.pack()
+        self.worker.submit(lambda: monitor_choices(utils.get_topology()),
+                           on_done=self._on_monitors, on_error=self._on_worker_error,
+                           timeout=WORKER_TIMEOUT)
+
+    def _on_monitors(self, choices):
+        if not self.config.winfo_exists():
+            return
+        menu = self.monitor_menu["menu"]
+        menu.delete(0, "end")
+        for label, value in choices:
+            menu.add_command(label=label,
+                             command=lambda l=label, v=value: self._select_monitor(l, v))
+        self.monitor_label.set(next((label for label, value in choices
+                                     if value == self.selected_monitor.get()), choices[0][0]))
+
+    def _select_monitor(self, label, value):
+        self.monitor_label.set(label)
+        self.selected_monitor.set(value)
+
     def update_resolutions(self):
         menu = self.res_menu["menu"]
         menu.delete(0, "end")
@@ -92,8 +127,18 @@ class ConfigWindow:
         self.selected_resolution.set(f"{w0}x{h0}")
 
     def detect_resolution(self):
-        sw = win32api.GetSystemMetrics(0)
-        sh = win32api.GetSystemMetrics(1)
+        self.worker.submit(lambda: utils.get_backend().screen_size(),
+                           on_done=self._on_screen_size, on_error=self._on_worker_error,
+                           timeout=WORKER_TIMEOUT)
+
+    def _on_worker_error(self, error):
+        if self.config.winfo_exists():
+            messagebox.showerror("Borderless Manager", str(error), parent=self.config)
+
+    def _on_screen_size(self, size):
+        if not self.config.winfo_exists():
+            return
+        sw, sh = size
         target = sw / sh
         ratios = {k: eval(k.replace(":", "/")) for k in self.aspect_ratios.keys()}
         best = min(ratios, key=lambda k: abs(ratios[k] - target))
@@ -110,23 +155,17 @@ class ConfigWindow:
         self.config.destroy()
 
     def save_config(self):
-        cfg = {
-            "ratio": self.selected_ratio.get(),
-            "resolution": self.selected_resolution.get(),
-            "alignment": self.selected_alignment.get()
-        }
-        try:
-            with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-                json.dump(cfg, f, indent=2)
-        except Exception as e:
-            tk.messagebox.showerror("Error al guardar configuración", str(e))
+        # Se escribe en disco de forma diferida y atómica (settings_store)
+        CONFIG.update(
+            ratio=self.selected_ratio.get(),
+            resolution=self.selected_resolution.get(),
+            alignment=self.selected_alignment.get(),
+            monitor=self.selected_monitor.get()
+        )
 
     def load_config(self):
-        try:
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-            self.selected_ratio.set(cfg.get("ratio", self.selected_ratio.get()))
-            self.selected_resolution.set(cfg.get("resolution", self.selected_resolution.get()))
-            self.selected_alignment.set(cfg.get("alignment", self.selected_alignment.get()))
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
+        cfg = CONFIG.get()
+        self.selected_ratio.set(cfg.get("ratio", self.selected_ratio.get()))
+        self.selected_resolution.set(cfg.get("resolution", self.selected_resolution.get()))
+        self.selected_alignment.set(cfg.get("alignment", self.selected_alignment.get()))
+        self.selected_monitor.set(str(cfg.get("monitor", self.selected_monitor.get())))
@@ -5,3 +5,35 @@ BASE_PATH = getattr(sys, '_MEIPASS', os.path.abspath("."))
 CONFIG_PATH = os.path.join(BASE_PATH, "config.json")
 ICON_PATH = os.path.join(BASE_PATH, "resources", "icon.ico")
 BORDERLESS_PROGRAMS_PATH = os.path.join(BASE_PATH, "borderless_programs.json")
+# Datos del usuario que se escriben sin parar: fuera de la carpeta del programa,
+# que puede no ser escribible (Program Files)
+USER_DATA_PATH = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"),
+                              "BorderlessManager")
+JOURNAL_PATH = os.path.join(USER_DATA_PATH, "borderless_journal.jsonl")
+STATS_EXPORT_PATH = os.path.join(USER_DATA_PATH, "stats.json")
+
+# Sincronización de borderless automático (segundos)
+SYNC_MIN_INTERVAL = 2       # sondeo tras un cambio (config: sync_min_interval)
+SYNC_MAX_INTERVAL = 60      # sondeo con el escritorio en reposo (config: sync_max_interval)
+SAFETY_POLL_INTERVAL = 30   # pasada completa de seguridad mínima con eventos activos
+EVENT_COALESCE = 0.05       # espera para agrupar ráfagas de eventos
+WORKER_TIMEOUT = 5          # límite para aplicar/revertir/refrescar desde la GUI
+
+# Títulos de ventana
+TITLE_TIMEOUT_MS = 100      # espera máxima a una ventana para leer su título
+TITLE_TTL = 1.0             # reutilización de un título sin eventos de cambio de nombre
+TITLE_TTL_EVENTS = 30.0     # ídem con eventos (EVENT_NAMECHANGE invalida la caché)
+PROCESS_CACHE_SIZE = 256    # procesos cuyo ejecutable se recuerda (LRU)
+
+# Estadísticas: intervalo de volcado a disco (segundos)
+STATS_EXPORT_INTERVAL = 60
+
+# Cierre: límite por ventana y total para revertir, y hilos en paralelo
+SHUTDOWN_WINDOW_DEADLINE = 1.5
+SHUTDOWN_DEADLINE = 4
+SHUTDOWN_THREADS = 8
+
+# Canal de control local (ipc.py): tubería con nombre en Windows y socket
+# Unix en el resto (pruebas); ver ipc.default_address()
+IPC_PIPE_NAME = "BorderlessManager"
+IPC_TIMEOUT = 10            # espera máxima del cliente a la respuesta de un lote
@@ -0,0 +1,82 @@
+import time
+from stats import STATS
+
+
+class _Retry:
+    __slots__ = ("attempts", "next_try", "last_drift")
+
+    def __init__(self, now):
+        self.attempts = 0
+        self.next_try = now
+        self.last_drift = now
+
+
+class DriftMonitor:
+    """Detecta ventanas que han perdido el borderless y las reaplica con espera
+    exponencial.
+
+    `find_drifted(hwnds)` devuelve las ventanas cuyo estilo o posición ya no
+    son los aplicados y `reapply(hwnds)` las vuelve a poner en borderless
+    devolviendo (reaplicadas, errores) (por defecto, utils). Tras cada
+    reintento la ventana espera BASE_DELAY * 2^(intentos - 1) segundos (hasta
+    MAX_DELAY) antes del siguiente; pasados MAX_RETRIES se deja como está,
+    para no pelear con un juego que recupera su marco en bucle. Una ventana
+    que pasa FORGET_AFTER segundos sin desviarse vuelve a empezar la cuenta.
+    """
+
+    BASE_DELAY = 2.0
+    MAX_DELAY = 120.0
+    MAX_RETRIES = 5
+    FORGET_AFTER = 300.0
+
+    def __init__(self, find_drifted=None, reapply=None, clock=time.monotonic):
+        if find_drifted is None or reapply is None:
+            import utils
+            find_drifted = find_drifted or utils.find_drifted
+            reapply = reapply or utils.reapply_many
+        self.find_drifted = find_drifted
+        self.reapply = reapply
+        self.clock = clock
+        self._retries = {}  # hwnd -> _Retry
+
+    def check(self, hwnds=None):
+        """Comprueba las ventanas (todas las seguidas con hwnds=None) y reaplica
+        las desviadas a las que ya les toca. Devuelve cuántas se han reaplicado."""
+        drifted = self.find_drifted(hwnds)
+        if not drifted:
+            return 0
+        STATS.incr("drift_detected", len(drifted))
+        now = self.clock()
+        due = []
+        for hwnd in drifted:
+            retry = self._retries.get(hwnd)
+            if retry is None or now - retry.last_drift > self.FORGET_AFTER:
+                retry = self._retries[hwnd] = _Retry(now)
+            retry.last_drift = now
+            if retry.attempts >= self.MAX_RETRIES:
+                continue
+            if now >= retry.next_try:
+                due.append(hwnd)
+        if not due:
+            return 0
+        done, _ = self.reapply(due)
+        for hwnd in due:
+            retry = self._retries[hwnd]
+            retry.attempts += 1
+            retry.next_try = now + min(self.MAX_DELAY,
+                                       self.BASE_DELAY * 2 ** (retry.attempts - 1))
+            if retry.attempts == self.MAX_RETRIES:
+                STATS.incr("drift_given_up")
+        STATS.incr("drift_reapplied", len(done))
+        return len(done)
+
+    def given_up(self):
+        """hwnds que han agotado los reintentos."""
+        return [hwnd for hwnd, r in self._retries.items() if r.attempts >= self.MAX_RETRIES]
+
+    def forget(self, hwnds):
+        for hwnd in hwnds:
+            self._retries.pop(hwnd, None)
+
+    def __len__(self):
+        return len(self._retries)
@@ -0,0 +1,188 @@
+import os
+import re
+import sys
+import json
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+from constants import IPC_PIPE_NAME, IPC_TIMEOUT
+from stats import STATS
+from monitors import ALIGN_FACTORS
+from rules import make_profile, parse_resolution, RULE_REGEX
+
+# Tamaño máximo de un lote (bytes de JSON)
+MAX_MESSAGE = 1 << 20
+
+
+def default_address():
+    """Tubería con nombre por usuario en Windows; socket Unix en el resto."""
+    if sys.platform == "win32":
+        return r"\\.\pipe\%s-%s" % (IPC_PIPE_NAME, os.environ.get("USERNAME", ""))
+    return os.path.join(tempfile.gettempdir(), f"{IPC_PIPE_NAME.lower()}-{os.getuid()}.sock")
+
+
+class ControlServer:
+    """Canal de control local de la instancia en marcha.
+
+    Cada conexión envía un lote JSON [{"cmd": nombre, ...argumentos}] y
+    recibe, en el mismo orden, [{"ok": true, "result": ...}] o
+    [{"ok": false, "error": "..."}]. `handlers` es { nombre: función }; cada
+    función recibe los argumentos del comando como keywords y se ejecuta en
+    el hilo de la conexión. Los mensajes son bytes JSON (nunca pickle).
+    """
+
+    def __init__(self, handlers, address=None):
+        self.handlers = handlers
+        self.address = address or default_address()
+        self._listener = None
+        self._closed = threading.Event()
+
+    def start(self):
+        if not self.address.startswith("\\\\") and os.path.exists(self.address):
+            # Socket de una ejecución anterior que terminó sin borrarlo
+            os.unlink(self.address)
+        self._listener = Listener(self.address)
+        if not self.address.startswith("\\\\"):
+            os.chmod(self.address, 0o600)
+        self._closed.clear()
+        threading.Thread(target=self._serve, name="ipc", daemon=True).start()
+
+    def stop(self):
+        if self._listener is None:
+            return
+        self._closed.set()
+        try:
+            # accept() no se despierta al cerrar una tubería: se le conecta
+            # un cliente vacío para que vea el cierre
+            Client(self.address).close()
+        except OSError:
+            pass
+        self._listener.close()
+        self._listener = None
+
+    def _serve(self):
+        listener = self._listener
+        while not self._closed.is_set():
+            try:
+                conn = listener.accept()
+            except OSError:
+                break
+            if self._closed.is_set():
+                conn.close()
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                batch = json.loads(conn.recv_bytes(MAX_MESSAGE))
+            except (EOFError, OSError, ValueError):
+                return
+            if isinstance(batch, dict):
+                batch = [batch]
+            if isinstance(batch, list):
+                STATS.incr("ipc_batches")
+                results = [self.execute(command) for command in batch]
+            else:
+                results = [{"ok": False, "error": "Lote inválido."}]
+            try:
+                conn.send_bytes(json.dumps(results, ensure_ascii=False).encode("utf-8"))
+            except OSError:
+                pass
+
+    def execute(self, command):
+        """Ejecuta un comando {"cmd": nombre, ...} y devuelve su respuesta."""
+        if not isinstance(command, dict):
+            return {"ok": False, "error": "Comando inválido."}
+        args = dict(command)
+        name = args.pop("cmd", None)
+        handler = self.handlers.get(name)
+        if handler is None:
+            return {"ok": False, "error": f"Comando desconocido: {name}"}
+        STATS.incr("ipc_commands")
+        try:
+            return {"ok": True, "result": handler(**args)}
+        except Exception as e:
+            return {"ok": False, "error": str(e) or type(e).__name__}
+
+
+def sync_handlers(sync, call=None, get_defaults=None, rules=None):
+    """Comandos de control sobre un BorderlessSync: list, apply, revert,
+    add-rule, remove-rule, sync y stats.
+
+    `call(fn, *args)` ejecuta fn donde deben ir las llamadas a ventanas (el
+    worker de la aplicación; por defecto, en el mismo hilo), `get_defaults`
+    devuelve el Profile global y `rules` es el almacén de reglas (por
+    defecto, settings_store.RULES).
+    """
+    call = call or (lambda fn, *args: fn(*args))
+    get_defaults = get_defaults or (lambda: sync.DEFAULT_PROFILE)
+    if rules is None:
+        from settings_store import RULES as rules
+
+    def profile_of(resolution, alignment, monitor):
+        if resolution and parse_resolution(resolution) == (None, None):
+            raise ValueError(f"Resolución inválida: {resolution} (usa ANCHOxALTO).")
+        if alignment and alignment not in ALIGN_FACTORS:
+            raise ValueError(f"Alineación inválida: {alignment} ({', '.join(ALIGN_FACTORS)}).")
+        return make_profile(resolution, alignment, monitor)
+
+    def list_windows(active=False):
+        windows = call(sync.active_windows) if active else call(sync.available_windows)
+        return [[hwnd, title] for hwnd, title in windows]
+
+    def apply(title, resolution=None, alignment=None, monitor=None):
+        p = profile_of(resolution, alignment, monitor).merged(get_defaults())
+        applied, errors = call(sync.apply_title, title, p.width, p.height,
+                               p.alignment or "C", p.monitor)
+        if not applied and errors:
+            raise RuntimeError("; ".join(errors))
+        return {"applied": applied, "errors": errors}
+
+    def revert(title):
+        targets = [hwnd for hwnd, t in call(sync.active_windows) if t == title]
+        return sum(1 for hwnd in targets if call(sync.revert, hwnd, title))
+
+    def add_rule(rule, resolution=None, alignment=None, monitor=None):
+        rule = rule.strip()
+        if not rule:
+            raise ValueError("Regla vacía.")
+        if rule.startswith(RULE_REGEX):
+            re.compile(rule[len(RULE_REGEX):])
+        progs = dict(rules.get())
+        progs[rule] = profile_of(resolution, alignment, monitor)
+        rules.set(progs)
+        # Aplicarla ya a las ventanas abiertas
+        return {"rules": len(progs), "applied": call(sync.sync)}
+
+    def remove_rule(rule):
+        progs = dict(rules.get())
+        if progs.pop(rule, None) is None:
+            raise ValueError(f"No existe la regla: {rule}")
+        rules.set(progs)
+        return len(progs)
+
+    return {
+        "list": list_windows,
+        "apply": apply,
+        "revert": revert,
+        "add-rule": add_rule,
+        "remove-rule": remove_rule,
+        "sync": lambda: call(sync.sync),
+        "stats": STATS.snapshot,
+    }
+
+
+def send(commands, address=None, timeout=IPC_TIMEOUT):
+    """Envía un lote de comandos a la instancia en marcha y devuelve sus
+    respuestas. Lanza ConnectionError si no hay ninguna instancia y
+    TimeoutError si no responde en `timeout` segundos."""
+    try:
+        conn = Client(address or default_address())
+    except OSError as e:
+        raise ConnectionError("Borderless Manager no está en marcha.") from e
+    with conn:
+        conn.send_bytes(json.dumps(list(commands), ensure_ascii=False).encode("utf-8"))
+        if not conn.poll(timeout):
+            raise TimeoutError("Borderless Manager no responde.")
+        return json.loads(conn.recv_bytes(MAX_MESSAGE))
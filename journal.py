@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import queue
+import threading
+from constants import JOURNAL_PATH
+from stats import STATS
+
+
+class StateJournal:
+    """Registro en disco de los estados originales de las ventanas en borderless.
+
+    Cada línea es un JSON:
+        {"op": "add", "hwnd", "pid", "cls", "style", "exstyle", "rect"}
+        {"op": "del", "hwnd"}
+        {"op": "retry", "hwnd"}   (no se pudo revertir al salir; reintentar)
+
+    Solo se añaden líneas. record_add/record_del se limitan a encolar; un hilo
+    propio escribe los registros en lotes con un único fsync por lote y
+    compacta el fichero (reescribe solo las ventanas vivas) cuando crece
+    demasiado. Así, si el proceso muere, replay() sabe qué ventanas restaurar.
+
+    Si el disco falla (OSError), el hilo se detiene, el error queda en failed
+    y se avisa a on_error; desde entonces no se encola nada más.
+    """
+
+    FLUSH_INTERVAL = 0.5   # segundos que se agrupan escrituras antes del fsync
+    COMPACT_MIN = 256      # líneas mínimas antes de plantear una compactación
+    COMPACT_RATIO = 4      # compactar si hay más de N líneas por ventana viva
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._live = {}
+        self._lines = 0
+        self._thread = None
+        self.failed = None     # OSError que detuvo la escritura
+        self.on_error = None   # on_error(excepción), desde el hilo de escritura
+
+    def replay(self):
+        """Lee el journal y devuelve { hwnd: registro } de las ventanas que
+        seguían en borderless cuando se escribió por última vez."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = f.read().splitlines()
+        except FileNotFoundError:
+            raw = []
+        try:
+            # Un único parseo para todo el fichero; si hay una línea rota
+            # (cierre brusco a mitad de escritura) se parsea línea a línea
+            records = json.loads("[" + ",".join(line for line in raw if line) + "]")
+        except ValueError:
+            records = []
+            for line in raw:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        live = {}
+        for rec in records:
+            try:
+                hwnd = rec["hwnd"]
+                op = rec["op"]
+            except (KeyError, TypeError):
+                continue
+            if op == "add":
+                live[hwnd] = rec
+            elif op == "retry":
+                if hwnd in live:
+                    live[hwnd] = dict(live[hwnd], retry=True)
+            else:
+                live.pop(hwnd, None)
+        self._live = dict(live)
+        self._lines = len(raw)
+        return live
+
+    def record_add(self, hwnd, pid, cls, style, exstyle, rect):
+        self._put({"op": "add", "hwnd": hwnd, "pid": pid, "cls": cls,
+                   "style": style, "exstyle": exstyle, "rect": list(rect)})
+
+    def record_del(self, hwnd):
+        self._put({"op": "del", "hwnd": hwnd})
+
+    def record_retry(self, hwnd):
+        """Marca una ventana que no se pudo revertir a tiempo al salir."""
+        self._put({"op": "retry", "hwnd": hwnd})
+
+    def _put(self, rec):
+        # Sin hilo de escritura la cola solo crecería
+        if self.failed is None:
+            self._queue.put(rec)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=None):
+        """Vuelca lo pendiente y detiene el hilo de escritura."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except OSError as e:
+            self.failed = e
+            STATS.incr("journal_failures")
+            # Vaciar lo encolado antes de que _put dejara de aceptar registros
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if self.on_error:
+                self.on_error(e)
+
+    def _write_loop(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if self._lines > len(self._live):
+            self._compact()
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.FLUSH_INTERVAL
+                while batch[-1] is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    running = False
+                    batch.pop()
+                if not batch:
+                    continue
+
+                f.write("".join(json.dumps(rec, separators=(",", ":")) + "\n" for rec in batch))
+                f.flush()
+                os.fsync(f.fileno())
+                self._lines += len(batch)
+                for rec in batch:
+                    hwnd = rec["hwnd"]
+                    if rec["op"] == "add":
+                        self._live[hwnd] = rec
+                    elif rec["op"] == "retry":
+                        if hwnd in self._live:
+                            self._live[hwnd] = dict(self._live[hwnd], retry=True)
+                    else:
+                        self._live.pop(hwnd, None)
+
+                if (self._lines >= self.COMPACT_MIN and
+                        self._lines > self.COMPACT_RATIO * len(self._live)):
+                    f.close()
+                    self._compact()
+                    f = open(self.path, "a", encoding="utf-8")
+        finally:
+            f.close()
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rec in self._live.values():
+                f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._lines = len(self._live)
@@ -1,10 +1,26 @@
 import sys
 import os
+import time
 import threading
-import json
 import tkinter as tk
 from tkinter import messagebox
 
+def startup_options(argv):
+    """Separa las opciones de arranque (--tray, --trace FICHERO) de los
+    comandos para una instancia ya en marcha."""
+    options, commands = {"tray": False, "trace": None}, []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--tray":
+            options["tray"] = True
+        elif arg == "--trace":
+            options["trace"] = next(args, None)
+        else:
+            commands.append(arg)
+    return options, commands
+
+OPTIONS, COMMANDS = startup_options(sys.argv[1:])
+
 # Mutex para evitar instancias múltiples en Windows
 import win32event
 import win32api
@@ -12,41 +28,153 @@ import winerror
 
 mutex = win32event.CreateMutex(None, False, "BorderlessManagerMutex")
 if win32api.GetLastError() == winerror.ERROR_ALREADY_EXISTS:
+    # Ya hay una instancia: los comandos (main.py apply "Título" ...) se le
+    # envían por el canal de control
+    if COMMANDS:
+        import cli
+        sys.exit(cli.main(COMMANDS))
     sys.exit(0)
 
+# Sin instancia en marcha, los comandos se ejecutan en esta en cuanto arranca;
+# se validan ya para no abrir la aplicación con una orden mal escrita
+if COMMANDS:
+    import cli
+    STARTUP_BATCH = cli.parse_commands(COMMANDS)
+else:
+    STARTUP_BATCH = []
+
 from infi.systray import SysTrayIcon
 import utils
-import win32gui
-from borderless_programs_window import open_borderless_programs_window, BORDERLESS_PROGRAMS_PATH
-from config_window import ConfigWindow
-from constants import ICON_PATH, CONFIG_PATH
-
-def load_borderless_programs():
-    try:
-        with open(BORDERLESS_PROGRAMS_PATH, "r", encoding="utf-8") as f:
-            return set(json.load(f))
-    except Exception:
-        return set()
-
-def save_borderless_programs(programs):
-    try:
-        with open(BORDERLESS_PROGRAMS_PATH, "w", encoding="utf-8") as f:
-            json.dump(sorted(list(programs)), f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        messagebox.showerror("Error al guardar programas borderless", str(e))
+# widgets, config_window y borderless_programs_window se importan al abrir su ventana
+import settings_store
+from settings_store import CONFIG, RULES
+from constants import (ICON_PATH, SYNC_MIN_INTERVAL, SYNC_MAX_INTERVAL,
+                       SAFETY_POLL_INTERVAL, EVENT_COALESCE, WORKER_TIMEOUT, STATS_EXPORT_PATH,
+                       STATS_EXPORT_INTERVAL, TITLE_TTL_EVENTS)
+from borderless_sync import BorderlessSync
+from rules import RulesCache, make_profile
+from worker import Win32Worker
+from journal import StateJournal
+from window_events import EventCollector, create_event_source
+from stats import STATS, StatsExporter
+from scheduler import AdaptiveScheduler, intervals_from_config
+from shutdown import revert_with_deadline
+from ipc import ControlServer, sync_handlers
 
 class BorderlessApp:
-    def __init__(self, root):
+    def __init__(self, root, start_hidden=False, trace_path=None, commands=()):
+        """Con start_hidden (arranque con --tray) solo se levantan el tray y la
+        sincronización; la ventana se construye al abrirla por primera vez.
+        Con trace_path (--trace) la sesión se graba para traces.replay().
+        commands es un lote de cli.parse_commands que se ejecuta al arrancar,
+        como si llegara por el canal de control."""
         self.root = root
         self.app_title = "Borderless Manager"
+        self._window_built = False
 
         # Variables de configuración
         self.selected_ratio      = tk.StringVar(value="16:9")
         self.selected_resolution = tk.StringVar(value="")
         self.selected_alignment  = tk.StringVar(value="C")
+        self.selected_monitor    = tk.StringVar(value="")
 
         # Intentar cargar config previa
-        ConfigWindow.load_config(self)
+        cfg = CONFIG.get()
+        self.selected_ratio.set(cfg.get("ratio", self.selected_ratio.get()))
+        self.selected_resolution.set(cfg.get("resolution", self.selected_resolution.get()))
+        self.selected_alignment.set(cfg.get("alignment", self.selected_alignment.get()))
+        self.selected_monitor.set(str(cfg.get("monitor", self.selected_monitor.get())))
+
+        # Estadísticas internas (desactivadas por defecto: casi sin coste)
+        self.stats_exporter = StatsExporter(cfg.get("stats_export", STATS_EXPORT_PATH),
+                                            interval=STATS_EXPORT_INTERVAL)
+        if cfg.get("stats_enabled"):
+            self._enable_stats()
+
+        # Todas las llamadas que tocan ventanas pasan por el worker
+        self.worker = Win32Worker()
+        self.worker.attach(root)
+
+        # Recuperar ventanas que quedaron en borderless si la última ejecución
+        # terminó de forma inesperada, y seguir registrando en el journal
+        self.journal = StateJournal()
+        self.journal.on_error = self._on_journal_error
+        retry = self.worker.call(utils.restore_from_journal, self.journal)
+        utils.set_journal(self.journal)
+        self.journal.start()
+        if retry:
+            # Ventanas que el cierre anterior no pudo revertir a tiempo
+            threading.Thread(target=revert_with_deadline, args=(retry,),
+                             kwargs={"journal": self.journal}, daemon=True).start()
+
+        # Motor de borderless automático (mantiene los títulos activos);
+        # las reglas se leen de disco solo cuando cambia el fichero
+        self.rules_cache = RulesCache(RULES.get)
+        # Perfil global (el de la configuración); se recalcula solo cuando cambia
+        self._update_default_profile()
+        for var in (self.selected_resolution, self.selected_alignment, self.selected_monitor):
+            var.trace_add("write", self._update_default_profile)
+        self.trace = None
+        if trace_path:
+            from traces import TraceRecorder
+            try:
+                self.trace = TraceRecorder(trace_path, get_rules=RULES.get)
+            except OSError as e:
+                messagebox.showerror("Borderless Manager", f"No se puede grabar la traza: {e}")
+        self.sync = BorderlessSync(backend=self.trace.backend if self.trace else None,
+                                   load_engine=self.rules_cache.engine,
+                                   get_defaults=lambda: self.default_profile)
+        if self.trace:
+            self.sync = self.trace.attach(self.sync)
+
+        # El tray primero; la ventana (y su primera enumeración) después
+        self._setup_tray()
+        if not start_hidden:
+            self._build_window()
+
+        # Eventos de ventana (si la plataforma los ofrece) y hilo de sincronización
+        self._stop_check = threading.Event()
+        self._check_done = threading.Event()   # _periodic_check ha salido del bucle
+        self.sync_failures = 0
+        self._events = EventCollector()
+        RULES.subscribe(self._on_rules_changed)
+        for store in (CONFIG, RULES):
+            store.on_error = self._on_settings_error
+
+        # Canal de control local (cli.py); las llamadas pasan por el worker
+        control = ControlServer(self._control_handlers())
+        try:
+            control.start()
+            self.ipc = control
+        except OSError:
+            self.ipc = None
+        self._event_source = create_event_source()
+        if self._event_source:
+            self._event_source.start(self._on_window_event)
+            if not getattr(self._event_source, "ok", True):
+                # Sin hooks: volver al sondeo periódico
+                self._event_source.stop()
+                self._event_source = None
+            else:
+                # Los cambios de nombre llegan como eventos: los títulos
+                # en caché pueden vivir más
+                utils.set_title_ttl(TITLE_TTL_EVENTS)
+        low, high = intervals_from_config(cfg, SYNC_MIN_INTERVAL, SYNC_MAX_INTERVAL)
+        if self._event_source:
+            # Los eventos ya avisan de los cambios: el sondeo es solo una red de seguridad
+            low = max(low, SAFETY_POLL_INTERVAL)
+            high = max(high, low)
+        self.scheduler = AdaptiveScheduler(low, high)
+        threading.Thread(target=self._periodic_check, daemon=True).start()
+        if commands:
+            threading.Thread(target=self._run_startup_commands, args=(control, commands),
+                             name="startup-commands", daemon=True).start()
+
+    def _build_window(self):
+        """Construye la ventana principal y carga sus listas (una sola vez)."""
+        from widgets import searchable_list
+        root = self.root
+        self._window_built = True
 
         # Título e icono de ventana
         root.title(self.app_title)
@@ -63,33 +191,37 @@ class BorderlessApp:
 
         # Lista de ventanas disponibles
         tk.Label(left, text="Ventanas disponibles").pack()
-        self.lst_avail = tk.Listbox(left, width=50, height=20)
-        self.lst_avail.pack(fill=tk.BOTH, expand=True)
+        # Listas virtuales con búsqueda: solo se pintan las filas visibles
+        self.lst_avail = searchable_list(left, width=50, height=20)
+        self.lst_avail.frame.pack(fill=tk.BOTH, expand=True)
 
         # Lista de ventanas borderless activas
         tk.Label(right, text="Borderless activas").pack()
-        self.lst_active = tk.Listbox(right, width=50, height=20)
-        self.lst_active.pack(fill=tk.BOTH, expand=True)
+        self.lst_active = searchable_list(right, width=50, height=20)
+        self.lst_active.frame.pack(fill=tk.BOTH, expand=True)
 
         # Botones de acción
-        tk.Button(mid, text="→ Aplicar",   command=self.apply_selected).pack(pady=10)
-        tk.Button(mid, text="← Revertir",  command=self.revert_selected).pack(pady=10)
+        self.btn_apply = tk.Button(mid, text="→ Aplicar", command=self.apply_selected)
+        self.btn_apply.pack(pady=10)
+        self.btn_revert = tk.Button(mid, text="← Revertir", command=self.revert_selected)
+        self.btn_revert.pack(pady=10)
         tk.Button(mid, text="🔄 Refrescar", command=self.refresh_lists).pack(pady=10)
         tk.Button(mid, text="⚙️ Configurar", command=self.open_config_window).pack(pady=10)
         tk.Button(mid, text="📝 Borderless auto...", command=self.open_borderless_programs).pack(pady=10)
-
-        # Carga inicial de listas y setup del tray
-        self._manual_refresh = False
-
-        # Lista en memoria de títulos con borderless activo
-        self.active_borderless_titles = set()
+        self.status_var = tk.StringVar(value="")
+        tk.Label(mid, textvariable=self.status_var, wraplength=150).pack(pady=10)
 
         self.refresh_lists()
-        self._setup_tray()
+        root.deiconify()
 
-        # Hilo de comprobación periódica
-        self._stop_check = threading.Event()
-        threading.Thread(target=self._periodic_check, daemon=True).start()
+    @property
+    def active_borderless_titles(self):
+        return self.sync.active_titles
+
+    def _update_default_profile(self, *_):
+        self.default_profile = make_profile(self.selected_resolution.get(),
+                                            self.selected_alignment.get() or "C",
+                                            self.selected_monitor.get())
 
     def _set_icon(self):
         base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
@@ -99,193 +231,310 @@ class BorderlessApp:
         except Exception:
             pass
 
-    def load_config(self):
-        """Carga la configuración desde disk si existe."""
-        try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-            self.selected_ratio.set(cfg.get("ratio", self.selected_ratio.get()))
-            self.selected_resolution.set(cfg.get("resolution", self.selected_resolution.get()))
-            self.selected_alignment.set(cfg.get("alignment", self.selected_alignment.get()))
-        except (FileNotFoundError, json.JSONDecodeError):
-            # No existe o corrupto: usar valores por defecto
-            pass
-
-    def save_config(self):
-        """Guarda la configuración actual a disk."""
-        cfg = {
-            "ratio":      self.selected_ratio.get(),
-            "resolution": self.selected_resolution.get(),
-            "alignment":  self.selected_alignment.get()
-        }
-        try:
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                json.dump(cfg, f, indent=2)
-        except Exception as e:
-            messagebox.showerror("Error al guardar configuración", str(e))
-
     def refresh_lists(self):
-        self._manual_refresh = True
-        self._load_available_windows()
-        self._load_active_windows()
-        self._manual_refresh = False
+        exclude = [self.root.winfo_id()]
+        self.status_var.set("Refrescando...")
+        self.worker.submit(self._enumerate_lists, exclude,
+                           on_done=self._on_lists_loaded,
+                           on_error=self._on_worker_error,
+                           timeout=WORKER_TIMEOUT)
+
+    def _enumerate_lists(self, exclude):
+        # Se ejecuta en el worker; el ejecutable sale de la caché de procesos
+        avail = utils.with_exe(self.sync.available_windows(exclude, skip_title=self.app_title))
+        return avail, self.sync.active_windows()
+
+    def _on_lists_loaded(self, lists):
+        avail, active = lists
+        self._load_available_windows(avail)
+        self._load_active_windows(active)
+        self.status_var.set("")
 
     def _periodic_check(self):
-        import time
-        from borderless_programs_window import load_borderless_programs
-        while not getattr(self, "_stop_check", None) or not self._stop_check.is_set():
-            self._sync_borderless_state()
-            time.sleep(2)
-
-    def _sync_borderless_state(self):
-        from borderless_programs_window import load_borderless_programs
-        borderless_programs = load_borderless_programs()
-        all_windows = utils.list_windows()
-        open_titles = set(title for hwnd, title in all_windows)
-        # 1. Aplica borderless a los programas del JSON que estén abiertos y no estén activos
-        for title in borderless_programs:
-            if title in open_titles and title not in self.active_borderless_titles:
-                for hwnd, t in all_windows:
-                    if t == title and not utils.is_borderless(hwnd):
-                        try:
-                            utils.make_borderless(hwnd, alignment=self.selected_alignment.get())
-                            self.active_borderless_titles.add(title)
-                        except Exception:
-                            pass
-        # 2. Elimina de la lista en memoria los que ya no están abiertos
-        to_remove = set()
-        for title in self.active_borderless_titles:
-            if title not in open_titles:
-                to_remove.add(title)
-        if to_remove:
-            self.active_borderless_titles -= to_remove
-        # 3. Actualiza la lista de borderless activas en la GUI
-        self.root.after(0, self._load_active_windows)
-
-    def _load_available_windows(self):
-        if not self._manual_refresh and hasattr(self, "avail"):
-            return  # No refrescar automáticamente
-        self.lst_avail.delete(0, tk.END)
-        exclude = [self.root.winfo_id()]
-        all_windows = utils.list_windows(exclude_hwnds=exclude)
-        self.avail = [
-            (hwnd, title)
-            for hwnd, title in all_windows
-            if not utils.is_borderless(hwnd) and title != self.app_title
-        ]
-        # Mostrar solo nombres (sin IDs)
-        titles = []
-        for hwnd, title in self.avail:
-            if title not in titles:
-                self.lst_avail.insert(tk.END, title)
-                titles.append(title)
-
-    def _load_active_windows(self):
-        # Guardar selección actual antes de refrescar
-        sel = self.lst_active.curselection()
-        selected_title = self.lst_active.get(sel[0]) if sel else None
-
-        self.lst_active.delete(0, tk.END)
-        orig_states = utils.get_original_states()
-        # Agrupar por título (puede haber varias ventanas con el mismo título)
-        titles = set()
-        self.active = []
-        for hwnd in orig_states:
-            title = win32gui.GetWindowText(hwnd)
-            if title and title not in titles:
-                self.active.append((hwnd, title))
-                self.lst_active.insert(tk.END, title)
-                titles.add(title)
-        # Actualiza la lista en memoria de títulos activos
-        self.active_borderless_titles = titles
-
-        # Restaurar selección si sigue existiendo
-        if selected_title:
-            for idx, (hwnd, title) in enumerate(self.active):
-                if title == selected_title:
-                    self.lst_active.selection_set(idx)
-                    break
+        # Con eventos, solo se procesan las ventanas que cambian y el sondeo
+        # completo queda como red de seguridad; sin ellos, se sondea.
+        # El intervalo se alarga mientras no hay cambios y vuelve al mínimo
+        # en cuanto aparece uno. quit_app despierta la espera al instante.
+        # Una pasada que falla no detiene el bucle: se cuenta, se avisa una
+        # vez y la siguiente es completa (los eventos drenados se perdieron).
+        full = True
+        try:
+            while not self._stop_check.is_set():
+                activity = False
+                failed = False
+                try:
+                    if full:
+                        self.scheduler.full_done(time.monotonic())
+                        activity = self._sync_borderless_state()
+                    else:
+                        # Agrupar la ráfaga de eventos (create + show + namechange...)
+                        if self._stop_check.wait(EVENT_COALESCE):
+                            break
+                        changed, destroyed = self._events.drain()
+                        if changed or destroyed:
+                            activity = self._sync_borderless_state(changed, destroyed)
+                except Exception as e:
+                    failed = True
+                    self._on_sync_error(e)
+                interval = self.scheduler.tick(activity)
+                STATS.gauge("sync_interval_s", interval)
+                fired = self._events.wait(interval)
+                # Un goteo continuo de eventos no debe dejar sin pasada completa
+                # (ventanas muertas, deriva) a las ventanas que no los envían
+                full = (failed or not fired or self._events.take_full() or
+                        self.scheduler.full_due(time.monotonic()))
+        finally:
+            # quit_app espera a esto para no revertir con una pasada a medias
+            self._check_done.set()
+
+    def _on_sync_error(self, error):
+        # Hilo de sincronización
+        STATS.incr("sync_failures")
+        self.sync_failures += 1
+        if self.sync_failures == 1 and not self._stop_check.is_set():
+            self.root.after(0, lambda: messagebox.showerror(
+                "Borderless automático",
+                f"Ha fallado una sincronización: {error}\n"
+                "Se seguirá intentando; los siguientes fallos solo se cuentan en las estadísticas."))
+
+    def _on_window_event(self, event):
+        # Hilo de eventos: el título de esa ventana ya no es fiable
+        utils.invalidate_title(event.hwnd)
+        self._events.push(event)
+
+    def _sync_borderless_state(self, changed=None, destroyed=()):
+        """Sincroniza en el worker. Devuelve True si la pasada vio cambios."""
+        gui = self._window_built
+        def job():
+            self.sync.sync(changed, destroyed)
+            return self.sync.last_changed, self.sync.active_windows() if gui else None
+        activity, active = self.worker.call(job)
+        # Actualiza la lista de borderless activas en la GUI (si ya existe)
+        if gui:
+            self.root.after(0, self._load_active_windows, active)
+        return activity
+
+    def _load_available_windows(self, avail):
+        self.avail = {hwnd: title for hwnd, title, _ in avail}
+        # Título y ejecutable (sin IDs); se buscan por cualquiera de los dos
+        self.lst_avail.update(utils.WindowSnapshot(
+            (hwnd, f"{title}  ({exe})" if exe else title) for hwnd, title, exe in avail))
+
+    def _load_active_windows(self, active):
+        # Una fila por ventana; la selección sigue a su ventana (el estado
+        # activo lo lleva BorderlessSync por identidad)
+        self.lst_active.update(utils.WindowSnapshot(active))
 
     def apply_selected(self):
-        sel = self.lst_avail.curselection()
+        sel = self.lst_avail.selection()
         if not sel:
             messagebox.showwarning("Error", "Selecciona una ventana para aplicar.")
             return
-        selected_title = self.lst_avail.get(sel[0])
-        all_windows = utils.list_windows()
-        applied = False
-        for hwnd, title in all_windows:
-            if title == selected_title and not utils.is_borderless(hwnd):
-                try:
-                    if self.selected_resolution.get():
-                        w, h = map(int, self.selected_resolution.get().split("x"))
-                        align = self.selected_alignment.get()
-                        utils.make_borderless(hwnd, w, h, alignment=align)
-                    else:
-                        utils.make_borderless(hwnd, alignment=self.selected_alignment.get())
-                    applied = True
-                    self.active_borderless_titles.add(selected_title)
-                except Exception as e:
-                    messagebox.showerror("Error al aplicar borderless", str(e))
-        self._load_active_windows()
+        hwnd, _ = sel
+        selected_title = self.avail[hwnd]
+        profile = self.default_profile
+        self._set_busy(f"Aplicando «{selected_title}»...")
+        self.worker.submit(self.sync.apply_title, selected_title, profile.width, profile.height,
+                           profile.alignment, profile.monitor,
+                           on_done=self._on_applied,
+                           on_error=self._on_worker_error,
+                           on_progress=self._on_progress,
+                           timeout=WORKER_TIMEOUT)
+
+    def _on_applied(self, result):
+        applied, errors = result
+        for error in errors:
+            messagebox.showerror("Error al aplicar borderless", error)
+        self._refresh_active()
 
     def revert_selected(self):
-        sel = self.lst_active.curselection()
+        sel = self.lst_active.selection()
         if not sel:
             messagebox.showwarning("Error", "Selecciona una ventana para revertir.")
             return
-        # Usar self.active para obtener el hwnd correcto
-        selected_idx = sel[0]
-        if not hasattr(self, "active") or selected_idx >= len(self.active):
-            messagebox.showwarning("Error", "Selección inválida.")
-            return
-        hwnd, selected_title = self.active[selected_idx]
-        orig_states = utils.get_original_states()
-        reverted = False
-        # Buscar por hwnd directamente
-        if hwnd in orig_states:
-            try:
-                utils.revert_borderless(hwnd)
-                reverted = True
-            except Exception as e:
-                messagebox.showerror("Error al revertir borderless", str(e))
-        if reverted and selected_title in self.active_borderless_titles:
-            self.active_borderless_titles.remove(selected_title)
-        self._load_active_windows()
+        hwnd, selected_title = sel
+        self._set_busy(f"Revirtiendo «{selected_title}»...")
+        self.worker.submit(self.sync.revert, hwnd, selected_title,
+                           on_done=lambda reverted: self._refresh_active(),
+                           on_error=self._on_worker_error,
+                           timeout=WORKER_TIMEOUT)
+
+    def _refresh_active(self):
+        self.worker.submit(self.sync.active_windows,
+                           on_done=self._on_active_loaded,
+                           on_error=self._on_worker_error,
+                           timeout=WORKER_TIMEOUT)
+
+    def _on_active_loaded(self, active):
+        self._load_active_windows(active)
+        self._set_busy(None)
+
+    def _on_progress(self, progress):
+        done, total = progress
+        self.status_var.set(f"Aplicando {done}/{total}...")
+
+    def _on_worker_error(self, error):
+        self._set_busy(None)
+        if isinstance(error, TimeoutError):
+            messagebox.showerror("Borderless Manager", f"{error} La operación sigue pendiente.")
+        else:
+            messagebox.showerror("Borderless Manager", str(error))
+
+    def _set_busy(self, message):
+        # Bloquear aplicar/revertir mientras el worker tiene una operación en curso
+        state = tk.DISABLED if message else tk.NORMAL
+        self.btn_apply.config(state=state)
+        self.btn_revert.config(state=state)
+        self.status_var.set(message or "")
 
     def hide_window(self):
         self.root.withdraw()
 
     def show_window(self, systray=None):
-        self.root.after(0, self.root.deiconify)
+        self.root.after(0, self._show_window)
+
+    def _show_window(self):
+        if not self._window_built:
+            self._build_window()
+        self.root.deiconify()
 
     def quit_app(self, systray=None):
-        utils.revert_all()
+        # Parar primero la sincronización para que no vuelva a aplicar nada
         if hasattr(self, "_stop_check"):
             self._stop_check.set()
+            self._events.wake()
+            if self._event_source:
+                self._event_source.stop()
+            # Una pasada ya en marcha en el worker podría reclamar una ventana
+            # después de que revert_with_deadline recoja los estados
+            if not self._check_done.wait(WORKER_TIMEOUT):
+                STATS.incr("shutdown_sync_timeouts")
+        # Revertir en paralelo con límite de tiempo: una ventana colgada no
+        # bloquea la salida y queda marcada en el journal para reintentarla
+        if getattr(self, "ipc", None):
+            self.ipc.stop()
+        self.shutdown_report = revert_with_deadline(journal=self.journal)
+        self.worker.stop()
+        if self.trace:
+            self.trace.close()
+        self.journal.close(timeout=1)
+        # Escribir ya los ajustes que esperaban a agruparse
+        settings_store.flush_all()
+        self.stats_exporter.stop()
+        if STATS.enabled:
+            try:
+                self.stats_exporter.export()
+            except OSError:
+                pass
         self.root.after(0, self.root.destroy)
 
     def _setup_tray(self):
-        menu_options = (("Abrir Manager", None, self.show_window),)
+        stats_menu = (
+            ("Ver", None, self.show_stats),
+            ("Activar / desactivar", None, self.toggle_stats),
+            ("Exportar ahora", None, self.export_stats),
+        )
+        menu_options = (
+            ("Abrir Manager", None, self.show_window),
+            ("Estadísticas", None, stats_menu),
+        )
         base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
         icon_path = os.path.join(base_path, "resources", "icon.ico")
         self.tray = SysTrayIcon(icon_path, self.app_title, menu_options,
                                on_quit=self.quit_app, default_menu_index=0)
         threading.Thread(target=self.tray.start, daemon=True).start()
 
+    def _enable_stats(self):
+        STATS.enabled = True
+        self.stats_exporter.start()
+
+    def _disable_stats(self):
+        STATS.enabled = False
+        self.stats_exporter.stop()
+
+    def show_stats(self, systray=None):
+        self.root.after(0, lambda: messagebox.showinfo("Estadísticas", STATS.summary()))
+
+    def toggle_stats(self, systray=None):
+        if STATS.enabled:
+            self._disable_stats()
+        else:
+            STATS.reset()
+            self._enable_stats()
+        CONFIG.update(stats_enabled=STATS.enabled)
+
+    def export_stats(self, systray=None):
+        try:
+            self.stats_exporter.export()
+        except OSError as e:
+            self.root.after(0, lambda: messagebox.showerror("Error al exportar estadísticas", str(e)))
+
     def open_config_window(self):
+        from config_window import ConfigWindow
         ConfigWindow(
             self.root,
+            self.worker,
             self.selected_ratio,
             self.selected_resolution,
-            self.selected_alignment
+            self.selected_alignment,
+            self.selected_monitor
         )
 
     def open_borderless_programs(self):
-        open_borderless_programs_window(self.root)
+        from borderless_programs_window import open_borderless_programs_window
+        open_borderless_programs_window(self.root, self.worker)
+
+    def _on_rules_changed(self, rules):
+        # Reglas nuevas (desde el diálogo o editadas a mano): aplicarlas ya
+        # a las ventanas abiertas, sin esperar al siguiente sondeo
+        self._events.request_full()
+
+    def _control_handlers(self):
+        handlers = sync_handlers(self.sync, call=self.worker.call,
+                                 get_defaults=lambda: self.default_profile)
+        # Tras aplicar o revertir desde fuera, refrescar la GUI si ya existe
+        for name in ("apply", "revert"):
+            handlers[name] = self._refreshing(handlers[name])
+        return handlers
+
+    def _refreshing(self, fn):
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if self._window_built:
+                    self.root.after(0, self.refresh_lists)
+        return wrapper
+
+    def _run_startup_commands(self, control, commands):
+        # Hilo propio: los comandos esperan al worker como los del canal de control
+        import cli
+        responses = [control.execute(command) for command in commands]
+        cli.show(commands, responses)
+        errors = [f"{command.get('cmd')}: {response.get('error')}"
+                  for command, response in zip(commands, responses) if not response.get("ok")]
+        if errors:
+            # Lanzado sin consola (acceso directo, --tray) stderr no se ve
+            self.root.after(0, lambda: messagebox.showerror("Borderless Manager",
+                                                            "\n".join(errors)))
+
+    def _on_journal_error(self, error):
+        # Hilo del journal: se sigue funcionando, pero sin poder recuperar las
+        # ventanas si el proceso muere
+        self.root.after(0, lambda: messagebox.showerror(
+            "Borderless Manager",
+            f"No se puede escribir el journal ({self.journal.path}): {error}\n"
+            "Si el programa se cierra de forma inesperada, las ventanas en "
+            "borderless no se restaurarán al volver a abrirlo."))
+
+    def _on_settings_error(self, error):
+        self.root.after(0, lambda: messagebox.showerror("Error al guardar la configuración",
+                                                        str(error)))
 
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app  = BorderlessApp(root)
+    root.withdraw()
+    app  = BorderlessApp(root, start_hidden=OPTIONS["tray"], trace_path=OPTIONS["trace"],
+                         commands=STARTUP_BATCH)
     root.mainloop()
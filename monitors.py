@@ -0,0 +1,143 @@
+import threading
+from collections import namedtuple
+
+# Elección de monitor en make_borderless / perfiles
+MONITOR_HOST    = None        # el que contiene la ventana
+MONITOR_PRIMARY = "primary"   # el principal; un entero elige por índice
+
+# Alineación -> (factor x, factor y): 0 = inicio, 1 = centro, 2 = final
+ALIGN_FACTORS = {
+    "NW": (0, 0), "N": (1, 0), "NE": (2, 0),
+    "W":  (0, 1), "C": (1, 1), "E":  (2, 1),
+    "SW": (0, 2), "S": (1, 2), "SE": (2, 2),
+}
+
+
+class Monitor(namedtuple("Monitor", "index rect work dpi primary")):
+    """Un monitor: rect y work (área sin barra de tareas) son (l, t, r, b)."""
+    __slots__ = ()
+
+    @property
+    def width(self):
+        return self.rect[2] - self.rect[0]
+
+    @property
+    def height(self):
+        return self.rect[3] - self.rect[1]
+
+
+def _overlap(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+
+def _distance(rect, point):
+    x, y = point
+    dx = max(rect[0] - x, 0, x - rect[2])
+    dy = max(rect[1] - y, 0, y - rect[3])
+    return dx * dx + dy * dy
+
+
+class _Layout:
+    __slots__ = ("signature", "monitors", "primary", "tables")
+
+    def __init__(self, signature, monitors):
+        self.signature = signature
+        self.monitors = monitors
+        self.primary = next((m for m in monitors if m.primary), monitors[0])
+        # (índice de monitor, w, h) -> { alineación: (x, y) }
+        self.tables = {}
+
+
+class MonitorTopology:
+    """Modelo en caché de los monitores (áreas, DPI, principal).
+
+    Solo se vuelve a leer cuando cambia la firma de la configuración de
+    pantalla (check()) o tras invalidate(). Las posiciones de cada tamaño
+    se calculan una vez por monitor, así que colocar una ventana no hace
+    ninguna consulta de métricas.
+    """
+
+    def __init__(self, get_backend):
+        self._get_backend = get_backend
+        self._lock = threading.Lock()
+        self._layout = None
+
+    def invalidate(self):
+        self._layout = None
+
+    def check(self):
+        """Relee los monitores si ha cambiado la configuración de pantalla.
+        Pensado para llamarse una vez por pasada o por lote, no por ventana."""
+        signature = self._get_backend().display_signature()
+        layout = self._layout
+        if layout is None or layout.signature != signature:
+            self._load(signature)
+
+    def _load(self, signature=None):
+        backend = self._get_backend()
+        with self._lock:
+            if signature is None:
+                signature = backend.display_signature()
+            monitors = [Monitor(i, tuple(rect), tuple(work), dpi, primary)
+                        for i, (rect, work, dpi, primary) in enumerate(backend.monitors())]
+            if not monitors:
+                rect = (0, 0) + tuple(backend.screen_size())
+                monitors = [Monitor(0, rect, rect, 96, True)]
+            self._layout = _Layout(signature, monitors)
+            return self._layout
+
+    def _current(self):
+        return self._layout or self._load()
+
+    @property
+    def monitors(self):
+        return list(self._current().monitors)
+
+    @property
+    def primary(self):
+        return self._current().primary
+
+    def for_rect(self, rect):
+        """Monitor que contiene la mayor parte de rect (o el más cercano)."""
+        monitors = self._current().monitors
+        best = max(monitors, key=lambda m: _overlap(m.rect, rect))
+        if _overlap(best.rect, rect):
+            return best
+        center = ((rect[0] + rect[2]) // 2, (rect[1] + rect[3]) // 2)
+        return min(monitors, key=lambda m: _distance(m.rect, center))
+
+    def choose(self, rect, monitor=MONITOR_HOST):
+        """Monitor de destino: el que aloja rect, el principal o uno por índice."""
+        layout = self._current()
+        if monitor is MONITOR_HOST:
+            return self.for_rect(rect)
+        if monitor == MONITOR_PRIMARY:
+            return layout.primary
+        try:
+            return layout.monitors[int(monitor)]
+        except (ValueError, TypeError, IndexError):
+            return layout.primary
+
+    def place(self, monitor, width, height, alignment):
+        """Devuelve (x, y) de una ventana width x height alineada en monitor."""
+        tables = self._current().tables
+        key = (monitor.index, width, height)
+        table = tables.get(key)
+        if table is None:
+            left, top, right, bottom = monitor.rect
+            free_w, free_h = right - left - width, bottom - top - height
+            table = {name: (left + free_w * fx // 2, top + free_h * fy // 2)
+                     for name, (fx, fy) in ALIGN_FACTORS.items()}
+            tables[key] = table
+        return table.get(alignment, monitor.rect[:2])
+
+
+def monitor_choices(topology):
+    """[(texto, valor)] para elegir monitor en la interfaz; el valor se guarda
+    tal cual en config.json y en los perfiles ("" = el de la ventana)."""
+    choices = [("Donde esté la ventana", ""), ("Principal", MONITOR_PRIMARY)]
+    for m in topology.monitors:
+        choices.append((f"Monitor {m.index + 1} ({m.width}x{m.height})", str(m.index)))
+    return choices
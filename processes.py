@@ -0,0 +1,103 @@
+import time
+import ntpath
+import threading
+from collections import OrderedDict
+from stats import STATS
+
+
+class ProcessCache:
+    """Ejecutable de cada proceso, por pid, con LRU.
+
+    La primera consulta de un pid abre el proceso una vez (open_process del
+    backend) y se queda con el handle: mientras está abierto, Windows no
+    reutiliza ese pid, así que la entrada no puede quedar apuntando a otro
+    proceso y basta el pid como clave. prune() comprueba con una espera de
+    0 ms qué procesos han terminado y los olvida; al salir de la LRU también
+    se cierra el handle. Como un handle abierto ya impide la confusión de
+    pids, prune() solo libera recursos y basta con hacerlo cada
+    PRUNE_INTERVAL segundos.
+
+    Los pids que no se pueden abrir (procesos elevados o del sistema) se
+    recuerdan FAILED_TTL segundos para no reintentarlo en cada pasada; sin
+    handle su pid sí puede reutilizarse, de ahí que caduquen pronto.
+    """
+
+    PRUNE_INTERVAL = 10.0
+    FAILED_TTL = 2.0
+
+    def __init__(self, maxsize=256, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        # pid -> (handle, ruta del ejecutable)
+        self._entries = OrderedDict()
+        # pid -> hasta cuándo se da por hecho que no se puede abrir
+        self._failed = {}
+
+    def get(self, backend, pid):
+        """Ruta del ejecutable de pid ("" si no se puede leer)."""
+        if not pid:
+            return ""
+        with self._lock:
+            hit = self._entries.get(pid)
+            if hit is not None:
+                self._entries.move_to_end(pid)
+                STATS.incr("process_cache_hits")
+                return hit[1]
+            if self._failed.get(pid, 0.0) > self.clock():
+                STATS.incr("process_cache_hits")
+                return ""
+        info = backend.open_process(pid)
+        if info is None:
+            with self._lock:
+                self._failed[pid] = self.clock() + self.FAILED_TTL
+            STATS.incr("process_open_failures")
+            return ""
+        handle, image = info
+        evicted = []
+        with self._lock:
+            self._failed.pop(pid, None)
+            old = self._entries.pop(pid, None)
+            if old is not None:
+                evicted.append(old[0])
+            self._entries[pid] = (handle, image)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[1][0])
+        for h in evicted:
+            backend.close_process(h)
+        STATS.incr("process_opens")
+        return image
+
+    def exe(self, backend, pid):
+        """Nombre del ejecutable de pid (sin carpeta)."""
+        return ntpath.basename(self.get(backend, pid))
+
+    def prune(self, backend, force=False):
+        """Olvida los procesos que han terminado. Devuelve cuántos."""
+        now = self.clock()
+        if not force and now < self._next_prune:
+            return 0
+        self._next_prune = now + self.PRUNE_INTERVAL
+        with self._lock:
+            self._failed = {pid: until for pid, until in self._failed.items() if until > now}
+            dead = [pid for pid, (handle, _) in self._entries.items()
+                    if backend.process_exited(handle)]
+            handles = [self._entries.pop(pid)[0] for pid in dead]
+        for h in handles:
+            backend.close_process(h)
+        if dead:
+            STATS.incr("process_evictions", len(dead))
+        return len(dead)
+
+    def clear(self, backend=None):
+        with self._lock:
+            handles = [handle for handle, _ in self._entries.values()]
+            self._entries.clear()
+            self._failed.clear()
+        if backend is not None:
+            for h in handles:
+                backend.close_process(h)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,297 @@
+import re
+import fnmatch
+import threading
+from collections import namedtuple
+from stats import STATS
+
+# Prefijos de regla; sin prefijo la regla es un título exacto
+RULE_GLOB  = "glob:"
+RULE_REGEX = "re:"
+RULE_EXE   = "exe:"
+
+
+
+class Profile(namedtuple("Profile", "width height alignment monitor")):
+    """Geometría con la que se aplica una regla.
+
+    width/height en píxeles (None = tamaño del monitor), alignment ("C",
+    "NW"...) y monitor (None = el de la ventana, "primary" o un índice).
+    Un campo a None en el perfil de una regla toma el valor global.
+    """
+    __slots__ = ()
+
+    def merged(self, default):
+        if self == NO_PROFILE:
+            return default
+        return Profile._make(own if own is not None else base
+                             for own, base in zip(self, default))
+
+    @property
+    def resolution(self):
+        return f"{self.width}x{self.height}" if self.width and self.height else ""
+
+
+NO_PROFILE = Profile(None, None, None, None)
+
+
+def parse_resolution(text):
+    """ "1280x720" -> (1280, 720); vacío o inválido -> (None, None)."""
+    try:
+        w, h = (int(v) for v in str(text).lower().split("x"))
+    except (TypeError, ValueError):
+        return None, None
+    return (w, h) if w > 0 and h > 0 else (None, None)
+
+
+def parse_monitor(value):
+    """ "" / None -> None, "primary" -> "primary", "1" / 1 -> 1."""
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def make_profile(resolution=None, alignment=None, monitor=None):
+    width, height = parse_resolution(resolution) if resolution else (None, None)
+    return Profile(width, height, alignment or None, parse_monitor(monitor))
+
+
+def profiles_from_entries(entries):
+    """Convierte el contenido del fichero de reglas en { regla: Profile }.
+
+    Cada entrada es una regla (texto) o un objeto
+    {"rule", "resolution": "WxH", "alignment", "monitor"}. Las resoluciones
+    se convierten aquí, una vez por carga; lo que no se entiende se ignora.
+    """
+    profiles = {}
+    for entry in entries if isinstance(entries, list) else ():
+        if isinstance(entry, str):
+            profiles[entry] = NO_PROFILE
+        elif isinstance(entry, dict) and isinstance(entry.get("rule"), str):
+            profiles[entry["rule"]] = make_profile(entry.get("resolution"),
+                                                   entry.get("alignment"),
+                                                   entry.get("monitor"))
+    return profiles
+
+
+def profiles_to_entries(profiles):
+    """Inverso de profiles_from_entries; las reglas sin perfil quedan como texto."""
+    entries = []
+    for rule in sorted(profiles):
+        profile = profiles[rule] or NO_PROFILE
+        if profile == NO_PROFILE:
+            entries.append(rule)
+            continue
+        entry = {"rule": rule}
+        if profile.resolution:
+            entry["resolution"] = profile.resolution
+        if profile.alignment:
+            entry["alignment"] = profile.alignment
+        if profile.monitor is not None:
+            entry["monitor"] = profile.monitor
+        entries.append(entry)
+    return entries
+
+
+def as_profiles(rules):
+    """Acepta { regla: Profile } o un iterable de reglas sin perfil."""
+    if isinstance(rules, dict):
+        return {rule: profile or NO_PROFILE for rule, profile in rules.items()}
+    return dict.fromkeys(rules, NO_PROFILE)
+
+
+class RuleEngine:
+    """Reglas compiladas para clasificar cada ventana en una sola pasada.
+
+    - títulos exactos: diccionario título -> regla
+    - "glob:" y "re:" que empiezan por "^": indexados por su prefijo literal;
+      solo se prueban los patrones cuyo prefijo coincide con el del título
+    - resto de "re:": un único patrón combinado que busca en todo el título
+    - "exe:": diccionario nombre de ejecutable (sin distinguir mayúsculas) -> regla
+
+    `rules` puede ser un iterable de reglas o { regla: Profile }.
+    """
+
+    def __init__(self, rules=()):
+        self.profiles = as_profiles(rules)
+        self.exact = {}
+        self.exes = {}
+        anchored, floating = [], []
+        for rule in self.profiles:
+            if rule.startswith(RULE_EXE):
+                self.exes[rule[len(RULE_EXE):].strip().lower()] = rule
+            elif rule.startswith(RULE_GLOB):
+                glob = rule[len(RULE_GLOB):]
+                anchored.append((fnmatch.translate(glob), rule, _glob_prefix(glob)))
+            elif rule.startswith(RULE_REGEX):
+                expr = rule[len(RULE_REGEX):]
+                try:
+                    re.compile(expr)
+                except re.error:
+                    continue  # regla inválida: se ignora
+                if expr.startswith("^"):
+                    anchored.append((expr, rule, _regex_prefix(expr)))
+                else:
+                    floating.append((expr, rule))
+            else:
+                self.exact[rule] = rule
+        self._n_patterns = len(anchored) + len(floating)
+
+        # { longitud: { prefijo: matcher } }, probando primero los prefijos largos
+        by_prefix = {}
+        unprefixed = []
+        for expr, rule, prefix in anchored:
+            if prefix:
+                by_prefix.setdefault(len(prefix), {}).setdefault(prefix, []).append((expr, rule))
+            else:
+                unprefixed.append((expr, rule))
+        self._prefixed = [
+            (n, {prefix: _combine(group, anchored=True) for prefix, group in groups.items()})
+            for n, groups in sorted(by_prefix.items(), reverse=True)
+        ]
+        self._unprefixed = _combine(unprefixed, anchored=True)
+        self._floating = _combine(floating, anchored=False)
+
+    @property
+    def needs_exe(self):
+        return bool(self.exes)
+
+    def __len__(self):
+        return len(self.exact) + len(self.exes) + self._n_patterns
+
+    def match(self, title, exe=None):
+        """Devuelve la regla que casa con la ventana, o None."""
+        rule = self.exact.get(title)
+        if rule is not None:
+            return rule
+        for n, groups in self._prefixed:
+            matcher = groups.get(title[:n])
+            if matcher is not None:
+                rule = matcher(title)
+                if rule is not None:
+                    return rule
+        for matcher in (self._unprefixed, self._floating):
+            if matcher is not None:
+                rule = matcher(title)
+                if rule is not None:
+                    return rule
+        if exe:
+            return self.match_exe(exe)
+        return None
+
+    def match_exe(self, exe):
+        return self.exes.get(exe.lower()) if exe else None
+
+    def profile(self, rule):
+        return self.profiles.get(rule, NO_PROFILE)
+
+
+def _glob_prefix(glob):
+    """Parte literal inicial de un glob (hasta el primer comodín)."""
+    for i, ch in enumerate(glob):
+        if ch in "*?[":
+            return glob[:i]
+    return glob
+
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def _regex_prefix(expr):
+    """Parte literal inicial de una regex anclada con "^" (conservadora)."""
+    if "|" in expr:
+        return ""  # una alternativa de nivel superior anularía el prefijo
+    prefix = []
+    i = 1
+    while i < len(expr):
+        ch = expr[i]
+        if ch == "\\" and i + 1 < len(expr) and not expr[i + 1].isalnum():
+            ch = expr[i + 1]
+            i += 1
+        elif ch in _REGEX_META:
+            if ch in "*?{" and prefix:
+                prefix.pop()  # el último literal es opcional o repetible
+            break
+        prefix.append(ch)
+        i += 1
+    return "".join(prefix)
+
+
+def _combine(patterns, anchored):
+    """Une [(regex, regla)] en una sola alternativa con grupos con nombre.
+
+    Devuelve una función título -> regla | None, o None si no hay patrones.
+    Los patrones anclados usan match() y el resto search(). Solo se unen los
+    patrones sin grupos propios: al combinarlos cambia la numeración de los
+    grupos y una referencia como \\2 pasaría a apuntar al grupo de otra
+    regla. Los que tienen grupos (o no se pueden unir) se prueban aparte.
+    """
+    if not patterns:
+        return None
+    plain, separate = [], []
+    for expr, rule in patterns:
+        pattern = re.compile(expr)
+        if pattern.groups:
+            separate.append((pattern, rule))
+        else:
+            plain.append((expr, rule))
+    find = None
+    if plain:
+        try:
+            combined = re.compile("|".join(
+                f"(?P<_r{i}>{expr})" for i, (expr, _) in enumerate(plain)))
+            find = combined.match if anchored else combined.search
+        except re.error:
+            # p. ej. flags globales como (?i) que solo valen al principio
+            separate = [(re.compile(expr), rule) for expr, rule in plain] + separate
+            plain = []
+    rules = [rule for _, rule in plain]
+    tests = [(pattern.match if anchored else pattern.search, rule) for pattern, rule in separate]
+    if not tests:
+        def _one(title):
+            m = find(title)
+            return rules[int(m.lastgroup[2:])] if m else None
+        return _one
+    def _each(title):
+        if find is not None:
+            m = find(title)
+            if m:
+                return rules[int(m.lastgroup[2:])]
+        for test, rule in tests:
+            if test(title):
+                return rule
+        return None
+    return _each
+
+
+class RulesCache:
+    """RuleEngine de las reglas vigentes, compilado una vez por versión.
+
+    `get_rules` devuelve { regla: Profile } (por defecto, el RulesStore de
+    settings_store, que solo relee el fichero cuando cambia); mientras
+    devuelva el mismo objeto no se recompila nada. Los aciertos y fallos se
+    cuentan en STATS (rules_cache_hits, rules_cache_misses).
+    """
+
+    def __init__(self, get_rules=None):
+        if get_rules is None:
+            from settings_store import RULES
+            get_rules = RULES.get
+        self.get_rules = get_rules
+        self._lock = threading.Lock()
+        self._rules = None
+        self._engine = RuleEngine()
+
+    def engine(self):
+        rules = self.get_rules()
+        with self._lock:
+            if rules is self._rules:
+                STATS.incr("rules_cache_hits")
+                return self._engine
+            STATS.incr("rules_cache_misses")
+            if rules != self._rules:
+                self._engine = RuleEngine(as_profiles(rules))
+            self._rules = rules
+            return self._engine
@@ -0,0 +1,53 @@
+class AdaptiveScheduler:
+    """Intervalo de sondeo con retroceso exponencial.
+
+    Cada tick sin cambios multiplica el intervalo por `factor` hasta
+    max_interval; en cuanto un tick ve cambios vuelve a min_interval.
+    Con eventos, full_due() dice cuándo toca una pasada completa aunque
+    no dejen de llegar (un título con contador de FPS, un reloj...).
+    """
+
+    def __init__(self, min_interval, max_interval, factor=2.0):
+        if min_interval <= 0:
+            raise ValueError("min_interval debe ser positivo")
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.factor = factor
+        self.interval = min_interval
+        self.idle_ticks = 0
+        self.last_full = None
+
+    def tick(self, changed):
+        """Registra el resultado de una pasada y devuelve la espera siguiente."""
+        if changed:
+            self.idle_ticks = 0
+            self.interval = self.min_interval
+        else:
+            self.idle_ticks += 1
+            self.interval = min(self.max_interval, self.interval * self.factor)
+        return self.interval
+
+    def full_done(self, now):
+        """Registra una pasada completa en el instante now."""
+        self.last_full = now
+
+    def full_due(self, now):
+        """True si han pasado max_interval segundos desde la última pasada completa."""
+        return self.last_full is None or now - self.last_full >= self.max_interval
+
+    def reset(self):
+        self.idle_ticks = 0
+        self.interval = self.min_interval
+
+
+def intervals_from_config(cfg, default_min, default_max):
+    """Lee sync_min_interval / sync_max_interval de config.json (en segundos)."""
+    def number(key, default):
+        try:
+            value = float(cfg.get(key, default))
+        except (TypeError, ValueError):
+            return default
+        return value if value > 0 else default
+    low = number("sync_min_interval", default_min)
+    high = number("sync_max_interval", default_max)
+    return low, max(low, high)
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import threading
+from stats import STATS
+from constants import CONFIG_PATH, BORDERLESS_PROGRAMS_PATH
+from rules import profiles_from_entries, profiles_to_entries
+
+
+def write_json_atomic(path, data):
+    """Escribe data en path sin dejar nunca un fichero a medias: se escribe
+    en un temporal, se hace fsync y se renombra encima del original."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class JsonStore:
+    """Un fichero JSON de ajustes en memoria.
+
+    get() devuelve el valor en caché y solo relee el fichero si ha cambiado
+    fuera de la aplicación (mtime o tamaño). set() publica el valor nuevo al
+    momento (y avisa a los suscriptores), pero la escritura se retrasa
+    `delay` segundos para agrupar ediciones seguidas en una sola; flush()
+    escribe ya lo pendiente. Los valores devueltos no deben modificarse:
+    se construye uno nuevo y se pasa a set().
+    """
+
+    DELAY = 0.5
+
+    def __init__(self, path, default, decode=None, encode=None, delay=DELAY):
+        self.path = path
+        self.default = default
+        self.decode = decode or (lambda data: data)
+        self.encode = encode or (lambda value: value)
+        self.delay = delay
+        self.on_error = None      # on_error(excepción) si falla una escritura diferida
+        self._lock = threading.RLock()
+        self._value = None
+        self._signature = None
+        self._loaded = False
+        self._dirty = False
+        self._timer = None
+        self._deadline = 0.0
+        self._subscribers = []
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        signature = self._stat()
+        with self._lock:
+            if self._loaded and (self._dirty or signature == self._signature):
+                return self._value
+            STATS.incr("settings_reads")
+            # La firma se toma antes de leer: si el fichero cambia durante la
+            # lectura, la siguiente llamada lo volverá a leer
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    value = self.decode(json.load(f))
+            except Exception:
+                value = self.default
+            changed = self._loaded and value != self._value
+            self._value, self._signature, self._loaded = value, signature, True
+        if changed:
+            self._notify(value)
+        return value
+
+    def set(self, value):
+        self._replace(value)
+        self._notify(value)
+
+    def _replace(self, value):
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self._dirty = True
+            # Cada edición aplaza la escritura; el temporizador en marcha se
+            # reprograma al vencer en lugar de crear uno por edición
+            self._deadline = time.monotonic() + self.delay
+            if self._timer is None:
+                self._arm(self.delay)
+
+    def _arm(self, delay):
+        self._timer = threading.Timer(delay, self._write_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Escribe ya lo pendiente. Lanza OSError si no se puede."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            write_json_atomic(self.path, self.encode(self._value))
+            STATS.incr("settings_writes")
+            self._dirty = False
+            self._signature = self._stat()
+
+    def _write_later(self):
+        with self._lock:
+            if threading.current_thread() is not self._timer:
+                return  # cancelado por flush()
+            remaining = self._deadline - time.monotonic()
+            if remaining > 0:
+                self._arm(remaining)
+                return
+        try:
+            self.flush()
+        except OSError as e:
+            if self.on_error:
+                self.on_error(e)
+
+    def subscribe(self, fn):
+        """fn(valor) tras cada cambio (set() o edición externa del fichero).
+        Devuelve una función que anula la suscripción."""
+        self._subscribers.append(fn)
+        return lambda: self._subscribers.remove(fn)
+
+    def _notify(self, value):
+        for fn in list(self._subscribers):
+            fn(value)
+
+
+class ConfigStore(JsonStore):
+    """config.json como diccionario."""
+
+    def __init__(self, path=CONFIG_PATH, delay=JsonStore.DELAY):
+        super().__init__(path, {}, decode=lambda data: data if isinstance(data, dict) else {},
+                         delay=delay)
+
+    def value(self, key, default=None):
+        return self.get().get(key, default)
+
+    def update(self, **values):
+        """Cambia unas claves conservando el resto."""
+        with self._lock:
+            cfg = dict(self.get())
+            cfg.update(values)
+            self._replace(cfg)
+        self._notify(cfg)
+
+
+class RulesStore(JsonStore):
+    """Fichero de reglas como { regla: Profile }."""
+
+    def __init__(self, path=BORDERLESS_PROGRAMS_PATH, delay=JsonStore.DELAY):
+        super().__init__(path, {}, decode=profiles_from_entries, encode=profiles_to_entries,
+                         delay=delay)
+
+
+# Instancias compartidas por todo el proceso
+CONFIG = ConfigStore()
+RULES = RulesStore()
+
+
+def flush_all():
+    """Escribe lo pendiente de todos los ficheros (al salir)."""
+    for store in (CONFIG, RULES):
+        try:
+            store.flush()
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+import time
+import queue
+import threading
+from collections import namedtuple
+
+import utils
+from constants import SHUTDOWN_WINDOW_DEADLINE, SHUTDOWN_DEADLINE, SHUTDOWN_THREADS
+from stats import STATS
+
+
+class ShutdownReport(namedtuple("ShutdownReport", "reverted missed failed elapsed_ms")):
+    """Resultado del cierre: hwnds revertidos, los que no respondieron a
+    tiempo, { hwnd: excepción } de los que fallaron y duración total."""
+    __slots__ = ()
+
+    def summary(self):
+        return (f"{len(self.reverted)} revertidas, {len(self.missed)} sin respuesta, "
+                f"{len(self.failed)} con error en {self.elapsed_ms:.0f} ms")
+
+
+def revert_with_deadline(hwnds=None, per_window=SHUTDOWN_WINDOW_DEADLINE,
+                         total=SHUTDOWN_DEADLINE, threads=SHUTDOWN_THREADS, journal=None):
+    """Revierte las ventanas en paralelo sin pasar de `total` segundos.
+
+    Varios hilos daemon restauran los estilos; una ventana que tarda más de
+    `per_window` se da por perdida y se lanza otro hilo para que las demás
+    sigan avanzando. Las posiciones de las que terminan se confirman juntas
+    al final (set_pos_batch), también con límite de tiempo. Las ventanas
+    perdidas se marcan en journal para reintentarlas en el siguiente
+    arranque. El tiempo total se registra en STATS como "shutdown".
+    """
+    t0 = time.monotonic()
+    deadline = t0 + total
+    if hwnds is None:
+        hwnds = list(utils.get_original_states())
+    states = utils.take_states(hwnds)
+    hwnds = list(states)
+    tasks = queue.Queue()
+    for hwnd in hwnds:
+        tasks.put(hwnd)
+
+    cond = threading.Condition()
+    started = {}   # hwnd -> instante en que empezó su revert
+    results = {}   # hwnd -> None o la excepción
+    expired = set()
+    moves = []
+
+    def run():
+        while True:
+            try:
+                hwnd = tasks.get_nowait()
+            except queue.Empty:
+                return
+            with cond:
+                started[hwnd] = time.monotonic()
+                cond.notify_all()
+            try:
+                utils.restore_state(hwnd, states[hwnd], moves)
+                error = None
+            except Exception as e:
+                error = e
+            with cond:
+                results[hwnd] = error
+                cond.notify_all()
+                if hwnd in expired:
+                    return  # ya se lanzó un hilo de relevo
+
+    def spawn():
+        threading.Thread(target=run, name="shutdown-revert", daemon=True).start()
+
+    for _ in range(min(threads, len(hwnds))):
+        spawn()
+
+    with cond:
+        while len(results) + len(expired - results.keys()) < len(hwnds):
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake = deadline
+            for hwnd, began in list(started.items()):
+                if hwnd in results or hwnd in expired:
+                    continue
+                if now - began >= per_window:
+                    expired.add(hwnd)
+                    spawn()
+                else:
+                    wake = min(wake, began + per_window)
+            if len(results) + len(expired - results.keys()) < len(hwnds):
+                cond.wait(max(0.0, wake - now))
+        finished = {hwnd: error for hwnd, error in results.items() if hwnd not in expired}
+        done_moves = [move for move in moves if move[0] in finished]
+
+    if done_moves:
+        committer = threading.Thread(target=_commit, args=(done_moves,),
+                                     name="shutdown-commit", daemon=True)
+        committer.start()
+        committer.join(max(0.0, deadline - time.monotonic()))
+
+    reverted = [hwnd for hwnd, error in finished.items() if error is None]
+    failed = {hwnd: error for hwnd, error in finished.items() if error is not None}
+    missed = [hwnd for hwnd in hwnds if hwnd not in finished]
+    if journal:
+        for hwnd in missed:
+            journal.record_retry(hwnd)
+
+    elapsed_ms = (time.monotonic() - t0) * 1000.0
+    STATS.record("shutdown", elapsed_ms)
+    STATS.incr("shutdown_missed", len(missed))
+    STATS.incr("shutdown_failed", len(failed))
+    return ShutdownReport(reverted, missed, failed, elapsed_ms)
+
+
+def _commit(moves):
+    try:
+        utils.get_backend().set_pos_batch(moves)
+    except Exception:
+        pass  # las ventanas ya tienen sus estilos; solo queda la posición
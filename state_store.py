@@ -0,0 +1,129 @@
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+
+class StateStore:
+    """Diccionario compartido entre hilos con un único punto de escritura.
+
+    Las mutaciones se serializan con un lock y publican una copia nueva del
+    diccionario (copy-on-write). Los lectores reciben con snapshot() una vista
+    inmutable sin copiar nada y sin tomar el lock; la vista no cambia aunque
+    otro hilo modifique el estado después.
+    """
+
+    KEY_LOCKS = 64
+
+    def __init__(self, initial=None):
+        self._lock = threading.Lock()
+        self._data = MappingProxyType(dict(initial or {}))
+        self._key_locks = [threading.Lock() for _ in range(self.KEY_LOCKS)]
+
+    def lock_for(self, key):
+        """Lock (repartido por hash) para operaciones largas sobre una misma clave,
+        p. ej. leer el estado de una ventana, registrarlo y modificarla."""
+        return self._key_locks[hash(key) % self.KEY_LOCKS]
+
+    @contextmanager
+    def locks_for(self, keys):
+        """Toma a la vez los locks de varias claves (siempre en el mismo orden,
+        para que dos lotes no se bloqueen entre sí)."""
+        stripes = sorted({hash(key) % self.KEY_LOCKS for key in keys})
+        taken = []
+        try:
+            for i in stripes:
+                self._key_locks[i].acquire()
+                taken.append(self._key_locks[i])
+            yield
+        finally:
+            for lock in reversed(taken):
+                lock.release()
+
+    def snapshot(self):
+        return self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def claim(self, key, value):
+        """Guarda value solo si key no existía. Devuelve True si lo ha guardado."""
+        with self._lock:
+            if key in self._data:
+                return False
+            data = dict(self._data)
+            data[key] = value
+            self._data = MappingProxyType(data)
+            return True
+
+    def claim_many(self, items):
+        """claim() de varios pares (clave, valor) con una sola copia.
+        Devuelve el conjunto de claves guardadas."""
+        with self._lock:
+            new = {}
+            for key, value in items:
+                if key not in self._data and key not in new:
+                    new[key] = value
+            if new:
+                data = dict(self._data)
+                data.update(new)
+                self._data = MappingProxyType(data)
+            return set(new)
+
+    def put(self, key, value):
+        with self._lock:
+            data = dict(self._data)
+            data[key] = value
+            self._data = MappingProxyType(data)
+
+    def update(self, mapping):
+        """put() de varias claves con una sola copia."""
+        if not mapping:
+            return
+        with self._lock:
+            data = dict(self._data)
+            data.update(mapping)
+            self._data = MappingProxyType(data)
+
+    def release(self, key):
+        """Quita key y devuelve su valor (None si no estaba)."""
+        with self._lock:
+            if key not in self._data:
+                return None
+            data = dict(self._data)
+            value = data.pop(key)
+            self._data = MappingProxyType(data)
+            return value
+
+    def release_many(self, keys):
+        """Quita varias claves de una vez y devuelve { clave: valor } de las que estaban."""
+        with self._lock:
+            gone = {key: self._data[key] for key in keys if key in self._data}
+            if gone:
+                data = dict(self._data)
+                for key in gone:
+                    del data[key]
+                self._data = MappingProxyType(data)
+            return gone
+
+    def discard_many(self, keys):
+        with self._lock:
+            gone = [key for key in keys if key in self._data]
+            if not gone:
+                return
+            data = dict(self._data)
+            for key in gone:
+                del data[key]
+            self._data = MappingProxyType(data)
+
+    def replace(self, mapping):
+        with self._lock:
+            self._data = MappingProxyType(dict(mapping))
@@ -0,0 +1,166 @@
+import os
+import csv
+import json
+import time
+import threading
+from collections import Counter, deque
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("stats", "name", "t0")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.name, (time.perf_counter() - self.t0) * 1000.0)
+        return False
+
+
+class Stats:
+    """Contadores y tiempos del proceso en segundo plano.
+
+    Desactivado, cada punto de medida cuesta una comprobación de un bool
+    (timer() devuelve un context manager vacío preconstruido).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.gauges = {}
+        # nombre -> [veces, total_ms, max_ms, último_ms]
+        self.timings = {}
+
+    def incr(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def timer(self, name):
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def record(self, name, ms):
+        """Registra una duración en milisegundos. Las llamadas directas se guardan
+        siempre (p. ej. el tiempo de cierre); timer() solo mide si está activo."""
+        with self._lock:
+            t = self.timings.get(name)
+            if t is None:
+                self.timings[name] = [1, ms, ms, ms]
+            else:
+                t[0] += 1
+                t[1] += ms
+                t[2] = max(t[2], ms)
+                t[3] = ms
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+
+    def snapshot(self):
+        """Diccionario plano con todos los valores (para mostrar o exportar)."""
+        with self._lock:
+            row = {"time": round(time.time(), 3),
+                   "uptime_s": round(time.time() - self.started, 1)}
+            row.update(self.counters)
+            row.update(self.gauges)
+            for name, (count, total, peak, last) in sorted(self.timings.items()):
+                row[f"{name}_count"] = count
+                row[f"{name}_avg_ms"] = round(total / count, 3)
+                row[f"{name}_max_ms"] = round(peak, 3)
+                row[f"{name}_last_ms"] = round(last, 3)
+        return row
+
+    def summary(self):
+        """Texto legible con los valores actuales."""
+        if not self.enabled and not self.timings:
+            return "Estadísticas desactivadas."
+        return "\n".join(f"{k}: {v}" for k, v in self.snapshot().items() if k != "time")
+
+
+# Instancia compartida por todo el proceso
+STATS = Stats()
+
+
+class StatsExporter:
+    """Vuelca STATS periódicamente a un fichero rotativo.
+
+    Guarda las últimas `keep` muestras; el formato depende de la extensión
+    (.csv o .json). El fichero se reescribe de forma atómica; export() se
+    serializa con un candado porque lo llaman el hilo de volcado y el menú
+    (Exportar ahora) y ambos usan el mismo fichero temporal.
+    """
+
+    def __init__(self, path, stats=STATS, interval=60, keep=1440):
+        self.path = path
+        self.stats = stats
+        self.interval = interval
+        self.rows = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                        name="stats-export", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError:
+                pass
+
+    def export(self):
+        with self._lock:
+            self.rows.append(self.stats.snapshot())
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            tmp = self.path + ".tmp"
+            if self.path.lower().endswith(".csv"):
+                fields = {}
+                for row in self.rows:
+                    fields.update(dict.fromkeys(row))
+                with open(tmp, "w", encoding="utf-8", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=list(fields))
+                    writer.writeheader()
+                    writer.writerows(self.rows)
+            else:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(list(self.rows), f, indent=1)
+            os.replace(tmp, self.path)
@@ -0,0 +1,64 @@
+import time
+import threading
+from stats import STATS
+
+
+class TitleCache:
+    """Títulos de ventana por hwnd con caducidad.
+
+    El título se pide con get_text_timeout del backend (sin mensajes para
+    las ventanas de otros procesos; con límite de tiempo para las propias);
+    una ventana que no responde se omite y no se vuelve a preguntar hasta
+    pasados HUNG_RETRY segundos. Los eventos de cambio de
+    nombre o destrucción invalidan la entrada con invalidate().
+
+    Se usa desde varios hilos (worker, hook de eventos, Tk): el diccionario
+    va protegido por un lock, que nunca se mantiene mientras se pregunta
+    el título a la ventana.
+    """
+
+    HUNG_RETRY = 5.0
+
+    def __init__(self, ttl=1.0, timeout_ms=100):
+        self.ttl = ttl
+        self.timeout_ms = timeout_ms
+        self._titles = {}  # hwnd -> (título o None si no responde, caducidad)
+        self._lock = threading.Lock()
+
+    def get(self, backend, hwnd):
+        """Título sin espacios extremos, "" si no tiene o None si no responde."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._titles.get(hwnd)
+        if hit is not None and hit[1] > now:
+            STATS.incr("title_cache_hits")
+            return hit[0]
+        text = backend.get_text_timeout(hwnd, self.timeout_ms)
+        if text is None:
+            STATS.incr("hung_windows")
+            with self._lock:
+                self._titles[hwnd] = (None, now + self.HUNG_RETRY)
+            return None
+        text = text.strip()
+        with self._lock:
+            self._titles[hwnd] = (text, now + self.ttl)
+        return text
+
+    def invalidate(self, hwnd=None):
+        with self._lock:
+            if hwnd is None:
+                self._titles.clear()
+            else:
+                self._titles.pop(hwnd, None)
+
+    def prune(self, alive):
+        """Olvida los hwnds que ya no están en `alive` (una enumeración completa)."""
+        with self._lock:
+            if len(self._titles) <= len(alive):
+                return
+            alive = set(alive)
+            for hwnd in [h for h in list(self._titles) if h not in alive]:
+                self._titles.pop(hwnd, None)
+
+    def __len__(self):
+        return len(self._titles)
@@ -0,0 +1,373 @@
+"""Grabación y reproducción de sesiones del bucle de sincronización.
+
+Una traza es un JSON Lines (comprimido con gzip si el fichero acaba en
+.gz): una cabecera {"trace": 1, "screen": [ancho, alto]} y una línea por
+operación de BorderlessSync, con lo que vio y lo que hizo:
+
+    {"t": ms desde el inicio, "op": "sync" | "apply" | "revert",
+     "full": true | "changed": [hwnd], "destroyed": [hwnd],   (sync)
+     "args": [título, ancho, alto, alineación, monitor],       (apply)
+     "hwnd", "title",                                         (revert)
+     "rules": [...], "defaults": [res, alin, mon],  (solo si han cambiado)
+     "up": [[hwnd, título]], "gone": [hwnd], "ids": [[hwnd, pid, clase, exe]],
+     "dead": [hwnd], "drift": [hwnd],                (el escritorio visto)
+     "applied": [hwnd], "failed": [hwnd], "reapplied": [hwnd],
+     "reverted": [hwnd], "ms": duración}              (lo que hizo)
+
+Las ventanas se guardan como cambios respecto a lo ya grabado, así que
+una pasada sin novedades ocupa una línea corta. Las trazas contienen los
+títulos de las ventanas.
+
+    python traces.py sesion.trace.gz     # reproduce y compara
+
+replay() reconstruye el escritorio en un SimulatedBackend y vuelve a
+ejecutar cada operación, midiendo su duración y comparando lo que hace
+con lo grabado.
+"""
+import sys
+import gzip
+import json
+import time
+import threading
+import utils
+from backends import SimulatedBackend, WS_OVERLAPPEDWINDOW, WS_VISIBLE
+from borderless_sync import BorderlessSync
+from rules import RulesCache, make_profile, profiles_from_entries, profiles_to_entries
+
+TRACE_VERSION = 1
+# Campos con lo que hizo la operación (se comparan al reproducir)
+ACTIONS = ("applied", "failed", "reapplied", "reverted", "dead")
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _profile_args(profile):
+    return [profile.resolution, profile.alignment, profile.monitor]
+
+
+class _RecordingBackend:
+    """Las funciones de utils que usa BorderlessSync, anotando en la
+    operación en curso lo que devuelven (el resto pasa sin tocar)."""
+
+    def __init__(self, recorder, backend):
+        self._recorder = recorder
+        self._backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def list_windows(self, *args, **kwargs):
+        windows = self._backend.list_windows(*args, **kwargs)
+        if not args and not kwargs:
+            self._recorder._seen(windows, full=True)
+        return windows
+
+    def describe_windows(self, hwnds):
+        hwnds = list(hwnds)
+        windows = self._backend.describe_windows(hwnds)
+        self._recorder._seen(windows, asked=hwnds)
+        return windows
+
+    def identify(self, hwnd):
+        identity = self._backend.identify(hwnd)
+        self._recorder._identified(identity)
+        return identity
+
+    def forget_dead(self, hwnds=None):
+        dead = self._backend.forget_dead(hwnds)
+        self._recorder._died(dead)
+        return dead
+
+    def find_drifted(self, hwnds=None):
+        drifted = self._backend.find_drifted(hwnds)
+        self._recorder._add("drift", drifted)
+        return drifted
+
+    def make_borderless_many(self, targets, progress=None):
+        done, failed = self._backend.make_borderless_many(targets, progress)
+        self._recorder._add("applied", done)
+        self._recorder._add("failed", [hwnd for hwnd, _ in failed])
+        return done, failed
+
+    def reapply_many(self, hwnds):
+        done, errors = self._backend.reapply_many(hwnds)
+        self._recorder._add("reapplied", done)
+        return done, errors
+
+    def revert_borderless(self, hwnd, *args):
+        result = self._backend.revert_borderless(hwnd, *args)
+        self._recorder._add("reverted", [hwnd])
+        return result
+
+
+class RecordingSync:
+    """BorderlessSync que graba cada sync/apply_title/revert en la traza;
+    el resto de atributos son los del original."""
+
+    def __init__(self, recorder, sync):
+        self._recorder = recorder
+        self._sync = sync
+
+    def __getattr__(self, name):
+        return getattr(self._sync, name)
+
+    def sync(self, changed=None, destroyed=()):
+        if changed is None:
+            record = {"op": "sync", "full": True}
+        else:
+            changed, destroyed = sorted(changed), sorted(destroyed)
+            record = {"op": "sync", "changed": changed, "destroyed": destroyed}
+        return self._recorder._run(record, self._sync, self._sync.sync, changed, destroyed)
+
+    def apply_title(self, title, width=None, height=None, alignment="C", monitor=None,
+                    progress=None):
+        record = {"op": "apply", "args": [title, width, height, alignment, monitor]}
+        return self._recorder._run(record, self._sync, self._sync.apply_title,
+                                   title, width, height, alignment, monitor, progress)
+
+    def revert(self, hwnd, title):
+        record = {"op": "revert", "hwnd": hwnd, "title": title}
+        return self._recorder._run(record, self._sync, self._sync.revert, hwnd, title)
+
+
+class TraceRecorder:
+    """Graba en `path` las operaciones de un BorderlessSync.
+
+        recorder = TraceRecorder("sesion.trace.gz", get_rules=RULES.get)
+        sync = recorder.attach(BorderlessSync(backend=recorder.backend, ...))
+
+    El BorderlessSync debe usar recorder.backend (utils con las llamadas
+    anotadas). Con path=None las operaciones se guardan en `records` en
+    lugar de escribirse (así se compara la reproducción).
+    """
+
+    def __init__(self, path=None, backend=None, get_rules=None, clock=time.monotonic):
+        if backend is None:
+            backend = utils
+        self.backend = _RecordingBackend(self, backend)
+        self.get_rules = get_rules
+        self.clock = clock
+        self.records = []
+        self._start = clock()
+        self._lock = threading.RLock()
+        self._record = None
+        self._titles = {}     # hwnd -> título grabado
+        self._ids = {}        # hwnd -> (pid, clase, exe) grabado
+        self._rules = None
+        self._defaults = None
+        self.path = path
+        self._file = None
+        self._flush = False
+        if path is not None:
+            self._file = _open(path, "w")
+            self._flush = not path.endswith(".gz")
+            try:
+                screen = list(backend.get_backend().screen_size())
+            except Exception:
+                screen = None
+            self._write({"trace": TRACE_VERSION, "screen": screen})
+
+    def attach(self, sync):
+        return RecordingSync(self, sync)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _run(self, record, sync, fn, *args):
+        with self._lock:
+            record["t"] = round((self.clock() - self._start) * 1000.0, 3)
+            self._changes(record, sync)
+            self._record = record
+            t0 = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                record["ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+                self._record = None
+                self._write(record)
+
+    def _changes(self, record, sync):
+        # Reglas y perfil global, solo cuando cambian
+        if self.get_rules is not None:
+            rules = self.get_rules()
+            if rules is not self._rules:
+                self._rules = rules
+                record["rules"] = profiles_to_entries(rules)
+        defaults = _profile_args(sync.get_defaults())
+        if defaults != self._defaults:
+            self._defaults = defaults
+            record["defaults"] = defaults
+
+    def _write(self, record):
+        if self._file is None:
+            if self.path is None:
+                self.records.append(record)
+            return  # cerrada
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if self._flush:
+            self._file.flush()
+
+    def _add(self, key, hwnds):
+        if self._record is not None and hwnds:
+            self._record.setdefault(key, []).extend(hwnds)
+
+    def _seen(self, windows, full=False, asked=()):
+        if self._record is None:
+            return
+        titles = self._titles
+        up = [[hwnd, title] for hwnd, title in windows if titles.get(hwnd) != title]
+        listed = {hwnd for hwnd, _ in windows}
+        candidates = list(titles) if full else asked
+        gone = [hwnd for hwnd in candidates if hwnd in titles and hwnd not in listed]
+        for hwnd in gone:
+            del titles[hwnd]
+        titles.update(up)
+        self._add("up", up)
+        self._add("gone", gone)
+
+    def _died(self, hwnds):
+        if self._record is None:
+            return
+        # Un hwnd reciclado vuelve a aparecer como ventana nueva
+        for hwnd in hwnds:
+            self._titles.pop(hwnd, None)
+            self._ids.pop(hwnd, None)
+        self._add("dead", hwnds)
+
+    def _identified(self, identity):
+        if self._record is None:
+            return
+        hwnd, pid, cls, exe = identity
+        if self._ids.get(hwnd) != (pid, cls, exe):
+            self._ids[hwnd] = (pid, cls, exe)
+            self._add("ids", [[hwnd, pid, cls, exe]])
+
+
+def load_trace(path):
+    """(cabecera, [operación]) de una traza."""
+    with _open(path, "r") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("trace") != TRACE_VERSION:
+        raise ValueError(f"{path}: no es una traza de Borderless Manager")
+    return lines[0], lines[1:]
+
+
+class ReplayReport:
+    """Resultado de replay(): duración de cada operación reproducida (ms),
+    la grabada, las diferencias [(nº de operación, campo, grabado,
+    reproducido)] y las llamadas Win32 simuladas."""
+
+    def __init__(self):
+        self.latencies = []
+        self.recorded = []
+        self.mismatches = []
+        self.calls = None
+
+    def summary(self):
+        ordered = sorted(self.latencies) or [0.0]
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"ops": len(self.latencies),
+                "total_ms": round(sum(self.latencies), 3),
+                "p50_ms": round(pick(0.5), 3),
+                "p95_ms": round(pick(0.95), 3),
+                "max_ms": round(ordered[-1], 3),
+                "recorded_ms": round(sum(self.recorded), 3),
+                "calls": sum(self.calls.values()) if self.calls else 0,
+                "mismatches": len(self.mismatches)}
+
+
+def _rebuild(backend, record):
+    """Lleva el escritorio simulado al estado que vio la operación grabada."""
+    windows = backend.windows
+    for hwnd in record.get("dead", ()):
+        backend.close_window(hwnd)
+    for hwnd in record.get("gone", ()):
+        if hwnd in windows:
+            windows[hwnd].visible = False
+    ids = {hwnd: (pid, cls, exe) for hwnd, pid, cls, exe in record.get("ids", ())}
+    for hwnd, title in record.get("up", ()):
+        w = windows.get(hwnd)
+        if w is None:
+            pid, cls, exe = ids.pop(hwnd, (1, "SimWindow", "unknown.exe"))
+            backend.add_window(title, cls=cls, pid=pid, exe=exe, hwnd=hwnd)
+        else:
+            w.title = title
+            w.visible = True
+        utils.invalidate_title(hwnd)
+    for hwnd, (pid, cls, exe) in ids.items():
+        # Identidad leída más tarde que la ventana (p. ej. al aplicarla)
+        if hwnd in windows:
+            backend.set_owner(hwnd, pid, exe, cls)
+    for hwnd in record.get("drift", ()):
+        # La ventana había recuperado el marco
+        if hwnd in windows:
+            windows[hwnd].style = WS_OVERLAPPEDWINDOW | WS_VISIBLE
+
+
+def replay(trace, backend=None):
+    """Reproduce una traza (ruta o (cabecera, operaciones)) sobre un
+    escritorio simulado instalado en utils y devuelve un ReplayReport."""
+    header, records = load_trace(trace) if isinstance(trace, str) else trace
+    if backend is None:
+        backend = SimulatedBackend(tuple(header.get("screen") or (1920, 1080)))
+    utils.set_backend(backend)
+    state = {"rules": {}, "defaults": make_profile(alignment="C"), "now": 0.0}
+    cache = RulesCache(lambda: state["rules"])
+    recorder = TraceRecorder(get_rules=lambda: state["rules"], clock=lambda: state["now"])
+    sync = recorder.attach(BorderlessSync(backend=recorder.backend, load_engine=cache.engine,
+                                          get_defaults=lambda: state["defaults"]))
+    sync.drift.clock = lambda: state["now"]
+    report = ReplayReport()
+    for number, record in enumerate(records, 1):
+        state["now"] = record.get("t", 0.0) / 1000.0
+        if "rules" in record:
+            state["rules"] = profiles_from_entries(record["rules"])
+        if "defaults" in record:
+            state["defaults"] = make_profile(*record["defaults"])
+        _rebuild(backend, record)
+        op = record.get("op")
+        t0 = time.perf_counter()
+        if op == "sync":
+            sync.sync(None if record.get("full") else record.get("changed", ()),
+                      record.get("destroyed", ()))
+        elif op == "apply":
+            sync.apply_title(*record["args"])
+        elif op == "revert":
+            sync.revert(record["hwnd"], record["title"])
+        else:
+            continue
+        report.latencies.append((time.perf_counter() - t0) * 1000.0)
+        report.recorded.append(record.get("ms", 0.0))
+        got = recorder.records[-1]
+        for key in ACTIONS:
+            expected, actual = sorted(record.get(key, ())), sorted(got.get(key, ()))
+            if expected != actual:
+                report.mismatches.append((number, key, expected, actual))
+    report.calls = backend.calls
+    return report
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("uso: python traces.py TRAZA [TRAZA...]", file=sys.stderr)
+        return 2
+    failed = False
+    for path in paths:
+        report = replay(path)
+        print(path + "  " + "  ".join(f"{k}={v}" for k, v in report.summary().items()))
+        for number, key, expected, actual in report.mismatches[:20]:
+            print(f"  operación {number}: {key} grabado={expected} reproducido={actual}")
+        failed = failed or bool(report.mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,120 +1,482 @@
-import win32gui
-import win32con
-import win32api
-import ctypes
-from ctypes import wintypes
+from collections import namedtuple
+from state_store import StateStore
+from stats import STATS
+from monitors import MonitorTopology, MONITOR_HOST
+from titles import TitleCache
+from processes import ProcessCache
+from constants import TITLE_TTL, TITLE_TIMEOUT_MS, PROCESS_CACHE_SIZE
+from backends import (Win32Backend, GWL_STYLE, GWL_EXSTYLE, WS_POPUP, WS_VISIBLE,
+                      WS_CAPTION, WS_THICKFRAME, WS_MINIMIZE, WS_EX_DLGMODALFRAME, WS_EX_WINDOWEDGE, WS_EX_CLIENTEDGE,
+                      WS_EX_STATICEDGE, SWP_NOZORDER, SWP_FRAMECHANGED)
+
+# Primitivas de ventana en uso (Win32 real o un escritorio simulado)
+_backend = None
 
 # Guarda estado original de cada ventana:
 # { hwnd: (orig_style, orig_exstyle, (left, top, right, bottom)) }
-_original_states = {}
+# Lo modifican el worker y el tray al salir: todo pasa por el StateStore.
+_original_states = StateStore()
+
+# Proceso dueño de cada ventana en borderless: { hwnd: pid }, para notar
+# si el hwnd se ha reciclado (ver forget_dead)
+_owners = {}
+
+# Posición aplicada a cada ventana: { hwnd: (x, y, ancho, alto) }, para
+# detectar si el juego la ha cambiado (ver find_drifted)
+_placements = {}
+
+# Journal en disco de esos estados (ver set_journal)
+_journal = None
+
+# Títulos por hwnd (se piden con límite de tiempo; ver titles.TitleCache)
+_titles = TitleCache(TITLE_TTL, TITLE_TIMEOUT_MS)
+
+# Ejecutable de cada proceso por pid; ver processes.ProcessCache
+_processes = ProcessCache(PROCESS_CACHE_SIZE)
+
+# Monitores en caché; se releen solo al cambiar la configuración de pantalla
+_topology = MonitorTopology(lambda: get_backend())
+
+class WindowDelta(namedtuple("WindowDelta", "added removed retitled")):
+    """Cambios entre dos enumeraciones.
+
+    added/removed: [(hwnd, título)]; retitled: [(hwnd, título_anterior, título_nuevo)]
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.retitled)
+
+
+class WindowSnapshot:
+    """Foto de una enumeración de ventanas: { hwnd: título }."""
+
+    def __init__(self, windows=()):
+        self.titles = dict(windows)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def diff(self, previous):
+        """Devuelve el WindowDelta que lleva de previous a esta foto."""
+        prev = previous.titles
+        added, retitled = [], []
+        for hwnd, title in self.titles.items():
+            old = prev.get(hwnd)
+            if old is None:
+                added.append((hwnd, title))
+            elif old != title:
+                retitled.append((hwnd, old, title))
+        cur = self.titles
+        removed = [(hwnd, title) for hwnd, title in prev.items() if hwnd not in cur]
+        return WindowDelta(added, removed, retitled)
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = Win32Backend()
+    return _backend
+
+def set_backend(backend):
+    """Cambia las primitivas de ventana (p. ej. a backends.SimulatedBackend).
+    El estado registrado pertenece al backend anterior y se olvida."""
+    global _backend
+    _processes.clear(_backend)
+    _backend = backend
+    _original_states.replace({})
+    _owners.clear()
+    _placements.clear()
+    _topology.invalidate()
+    _titles.invalidate()
+
+def set_journal(journal):
+    """Registra cada apply/revert en journal (un StateJournal) para poder
+    restaurar las ventanas si el proceso muere."""
+    global _journal
+    _journal = journal
+
+def restore_from_journal(journal):
+    """Vuelve a registrar las ventanas que quedaron en borderless tras un
+    cierre inesperado. Solo se adoptan las que siguen vivas con el mismo
+    pid y clase (el hwnd puede haberse reciclado) y con el estilo popup;
+    el resto se borran del journal. Devuelve los hwnds adoptados que el
+    cierre anterior no pudo revertir a tiempo (para reintentarlo)."""
+    backend = get_backend()
+    records = journal.replay()
+    alive = {}
+    for hwnd, rec in records.items():
+        try:
+            if (backend.is_window(hwnd) and
+                    backend.get_pid(hwnd) == rec.get("pid") and
+                    backend.get_class(hwnd) == rec.get("cls") and
+                    backend.get_long(hwnd, GWL_STYLE) & WS_POPUP):
+                alive[hwnd] = (rec["style"], rec["exstyle"], tuple(rec["rect"]))
+        except Exception:
+            pass
+    claimed = _original_states.claim_many(alive.items())
+    retry = []
+    for hwnd, rec in records.items():
+        if hwnd in claimed:
+            _owners[hwnd] = rec["pid"]
+            if rec.get("retry"):
+                retry.append(hwnd)
+        else:
+            journal.record_del(hwnd)
+    return retry
 
 def is_borderless(hwnd):
     return hwnd in _original_states
 
+def forget_dead(hwnds=None):
+    """Deja de seguir las ventanas en borderless que ya no existen o cuyo
+    hwnd pertenece ahora a otro proceso. Sin hwnds se comprueban todas
+    (pasada completa); con hwnds, solo esas (p. ej. las de
+    EVENT_OBJECT_DESTROY). Basta una llamada por ventana: el pid de un hwnd
+    inválido es 0. No se toca la ventana: no hay nada que restaurar.
+    Devuelve los hwnds olvidados."""
+    backend = get_backend()
+    if hwnds is None:
+        hwnds = list(_original_states)
+    dead = []
+    recycled = 0
+    for hwnd in hwnds:
+        owner = _owners.get(hwnd)
+        if owner is None and hwnd not in _original_states:
+            continue
+        try:
+            pid = backend.get_pid(hwnd)
+        except Exception:
+            pid = 0
+        if not pid:
+            dead.append(hwnd)
+        elif owner is not None and pid != owner:
+            dead.append(hwnd)
+            recycled += 1
+    if dead:
+        _original_states.discard_many(dead)
+        for hwnd in dead:
+            _untrack(hwnd)
+            _titles.invalidate(hwnd)
+            if _journal:
+                _journal.record_del(hwnd)
+        STATS.incr("dead_windows_evicted", len(dead) - recycled)
+        STATS.incr("recycled_hwnds_evicted", recycled)
+    STATS.gauge("tracked_windows", len(_original_states))
+    return dead
+
 def get_original_states():
-    return _original_states.copy()
+    """Vista inmutable del estado actual (no se copia)."""
+    return _original_states.snapshot()
+
+def list_windows(exclude_hwnds=None, cls=None, pids=None):
+    """(hwnd, título) de las ventanas visibles con título. Los filtros se
+    aplican durante la enumeración; el título solo se pide a las que pasan."""
+    backend = get_backend()
+    windows = []
+    title_of = _titles.get
+    with STATS.timer("enum_windows"):
+        hwnds = backend.enum_windows(visible=True, exclude=set(exclude_hwnds or ()),
+                                     cls=cls, pids=pids)
+        for h in hwnds:
+            t = title_of(backend, h)
+            if t:
+                windows.append((h, t))
+        _titles.prune(hwnds)
+        if len(_processes):
+            _processes.prune(backend)
+    STATS.incr("windows_seen", len(windows))
+    STATS.gauge("open_windows", len(windows))
+    return windows
+
+def window_title(hwnd):
+    """Título de hwnd ("" si no tiene o no responde)."""
+    return _titles.get(get_backend(), hwnd) or ""
+
+def invalidate_title(hwnd=None):
+    """Olvida el título en caché de hwnd (o todos), p. ej. tras un EVENT_NAMECHANGE."""
+    _titles.invalidate(hwnd)
 
-def list_windows(exclude_hwnds=None):
+def set_title_ttl(ttl):
+    """Segundos que se reutiliza un título; más largo si los eventos de
+    cambio de nombre ya invalidan la caché."""
+    _titles.ttl = ttl
+
+def describe_windows(hwnds):
+    """Devuelve (hwnd, título) de los hwnds indicados que siguen visibles y con título."""
+    backend = get_backend()
     windows = []
-    exclude = set(exclude_hwnds or [])
-    def _enum(h, _):
-        if h in exclude:
-            return
-        if win32gui.IsWindowVisible(h):
-            t = win32gui.GetWindowText(h).strip()
+    for h in hwnds:
+        if backend.is_window(h) and backend.is_visible(h):
+            t = _titles.get(backend, h)
             if t:
                 windows.append((h, t))
-    win32gui.EnumWindows(_enum, None)
     return windows
 
-def make_borderless(hwnd, custom_width=None, custom_height=None, alignment="C"):
+class WindowIdentity(namedtuple("WindowIdentity", "hwnd pid cls exe")):
+    """Identidad estable de una ventana durante su vida: no depende del
+    título, y un hwnd reciclado por otro proceso o clase da otra identidad."""
+    __slots__ = ()
+
+def identify(hwnd):
+    backend = get_backend()
+    try:
+        pid = backend.get_pid(hwnd)
+        cls = backend.get_class(hwnd)
+    except Exception:
+        return WindowIdentity(hwnd, 0, "", "")
+    return WindowIdentity(hwnd, pid, cls, _processes.exe(backend, pid))
+
+def window_exe(hwnd):
+    """Devuelve el nombre del ejecutable dueño de la ventana ("" si no se puede leer)."""
+    backend = get_backend()
+    try:
+        pid = backend.get_pid(hwnd)
+    except Exception:
+        return ""
+    return _processes.exe(backend, pid)
+
+def with_exe(windows):
+    """Añade el ejecutable a cada (hwnd, título): [(hwnd, título, exe)].
+    Cada proceso se abre una sola vez mientras siga vivo."""
+    backend = get_backend()
+    result = []
+    for hwnd, title in windows:
+        try:
+            pid = backend.get_pid(hwnd)
+        except Exception:
+            pid = 0
+        result.append((hwnd, title, _processes.exe(backend, pid)))
+    return result
+
+def get_topology():
+    return _topology
+
+def check_display():
+    """Relee los monitores si ha cambiado la pantalla. Se llama una vez por
+    pasada de sincronización o por lote, no por ventana."""
+    _topology.check()
+
+def make_borderless(hwnd, custom_width=None, custom_height=None, alignment="C",
+                    monitor=MONITOR_HOST):
+    """Quita el marco de hwnd y la coloca en el monitor que la contiene
+    (o en `monitor`: "primary" o un índice)."""
     if hwnd in _original_states:
         return
+    # Lectura del estado, registro y cambio de estilo sin intercalar un revert
+    STATS.incr("make_borderless")
+    backend = get_backend()
+    try:
+        with _original_states.lock_for(hwnd):
+            state = _read_state(backend, hwnd)
+            if _original_states.claim(hwnd, state):
+                _apply_claimed(backend, hwnd, state, custom_width, custom_height,
+                               alignment, monitor)
+    except Exception:
+        STATS.incr("make_borderless_failures")
+        raise
+
+def make_borderless_many(targets, progress=None):
+    """Aplica borderless a varias ventanas en una sola transacción de posicionado.
 
-    # Guardar estado original
-    orig_style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
-    orig_ex    = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
-    rect       = win32gui.GetWindowRect(hwnd)
-    _original_states[hwnd] = (orig_style, orig_ex, rect)
+    targets es [(hwnd, ancho, alto, alineación, monitor)]. Los estilos se
+    cambian ventana a ventana y las posiciones se confirman todas juntas al
+    final (ver Backend.set_pos_batch). Los estados originales se registran
+    todos de una vez (StateStore.claim_many). Devuelve (hwnds aplicados,
+    [(hwnd, excepción)]); progress((hechas, total)) informa del avance.
+    """
+    targets = [t for t in targets if t[0] not in _original_states]
+    backend = get_backend()
+    applied, errors, moves = [], [], []
+    with _original_states.locks_for(t[0] for t in targets):
+        states, failures = {}, {}
+        for hwnd, *_ in targets:
+            try:
+                states[hwnd] = _read_state(backend, hwnd)
+            except Exception as e:
+                failures[hwnd] = e
+        # Las que no se registran las ha aplicado otro hilo mientras esperábamos
+        claimed = _original_states.claim_many(states.items())
+        for i, (hwnd, width, height, alignment, monitor) in enumerate(targets, 1):
+            STATS.incr("make_borderless")
+            error = failures.get(hwnd)
+            if error is None and hwnd in claimed:
+                try:
+                    _apply_claimed(backend, hwnd, states[hwnd], width, height,
+                                   alignment, monitor, moves)
+                    applied.append(hwnd)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                STATS.incr("make_borderless_failures")
+                errors.append((hwnd, error))
+            if progress:
+                progress((i, len(targets)))
+        if moves:
+            backend.set_pos_batch(moves)
+    return applied, errors
+
+def _read_state(backend, hwnd):
+    """(estilo, estilo extendido, rect) originales de hwnd."""
+    return (backend.get_long(hwnd, GWL_STYLE), backend.get_long(hwnd, GWL_EXSTYLE),
+            backend.get_rect(hwnd))
+
+def _apply_claimed(backend, hwnd, state, custom_width, custom_height, alignment, monitor,
+                   moves=None):
+    """Quita el marco de hwnd, cuyo estado ya está registrado. Con moves, la
+    posición se añade a la lista en lugar de aplicarse."""
+    orig_style, orig_ex, rect = state
+    pid = _owners[hwnd] = backend.get_pid(hwnd)
+    if _journal:
+        _journal.record_add(hwnd, pid, backend.get_class(hwnd), orig_style, orig_ex, rect)
 
     # Aplicar estilos borderless
-    popup = win32con.WS_POPUP | win32con.WS_VISIBLE
-    clean_ex = orig_ex & ~(win32con.WS_EX_DLGMODALFRAME |
-                           win32con.WS_EX_WINDOWEDGE    |
-                           win32con.WS_EX_CLIENTEDGE    |
-                           win32con.WS_EX_STATICEDGE)
-    win32gui.SetWindowLong(hwnd, win32con.GWL_STYLE, popup)
-    win32gui.SetWindowLong(hwnd, win32con.GWL_EXSTYLE, clean_ex)
-
-    # Determinar tamaño
-    screen_w = win32api.GetSystemMetrics(0)
-    screen_h = win32api.GetSystemMetrics(1)
-    w = custom_width  or screen_w
-    h = custom_height or screen_h
-
-    # Calcular posición según alignment
-    offs = {
-        "NW": (0, 0),
-        "N":  ((screen_w - w)//2, 0),
-        "NE": (screen_w - w, 0),
-        "W":  (0, (screen_h - h)//2),
-        "C":  ((screen_w - w)//2, (screen_h - h)//2),
-        "E":  (screen_w - w, (screen_h - h)//2),
-        "SW": (0, screen_h - h),
-        "S":  ((screen_w - w)//2, screen_h - h),
-        "SE": (screen_w - w, screen_h - h),
-    }
-    x, y = offs.get(alignment, (0, 0))
-
-    win32gui.SetWindowPos(
-        hwnd, None,
-        x, y, w, h,
-        win32con.SWP_NOZORDER | win32con.SWP_FRAMECHANGED
-    )
+    _set_borderless_styles(backend, hwnd, orig_ex)
+
+    # Determinar monitor, tamaño y posición (tablas precalculadas por monitor)
+    target = _topology.choose(rect, monitor)
+    w = custom_width  or target.width
+    h = custom_height or target.height
+    x, y = _topology.place(target, w, h, alignment)
+    _placements[hwnd] = (x, y, w, h)
+    _position(backend, moves, hwnd, x, y, w, h)
+
+def _set_borderless_styles(backend, hwnd, orig_ex):
+    popup = WS_POPUP | WS_VISIBLE
+    clean_ex = orig_ex & ~(WS_EX_DLGMODALFRAME |
+                           WS_EX_WINDOWEDGE    |
+                           WS_EX_CLIENTEDGE    |
+                           WS_EX_STATICEDGE)
+    backend.set_long(hwnd, GWL_STYLE, popup)
+    backend.set_long(hwnd, GWL_EXSTYLE, clean_ex)
 
     # Quitar marco DWM en Win10+
-    try:
-        DWMWA_EXTENDED_FRAME_BOUNDS = 9
-        val = ctypes.c_int(0)
-        ctypes.windll.dwmapi.DwmSetWindowAttribute(
-            wintypes.HWND(hwnd),
-            ctypes.c_uint(DWMWA_EXTENDED_FRAME_BOUNDS),
-            ctypes.byref(val),
-            ctypes.sizeof(val)
-        )
-    except Exception:
-        pass
+    backend.clear_dwm_frame(hwnd)
 
-def revert_borderless(hwnd):
-    if hwnd not in _original_states:
-        return
+def _untrack(hwnd):
+    _owners.pop(hwnd, None)
+    _placements.pop(hwnd, None)
+
+def find_drifted(hwnds=None):
+    """Ventanas en borderless cuyo estilo o posición ya no son los aplicados
+    (p. ej. un juego que recupera el marco al cambiar de modo). Lee
+    GWL_STYLE y el rectángulo de cada una, sin tomar locks; las minimizadas
+    no cuentan. Sin hwnds se comprueban todas las seguidas."""
+    backend = get_backend()
+    drifted = []
+    for hwnd in list(_original_states) if hwnds is None else hwnds:
+        if hwnd not in _original_states:
+            continue
+        try:
+            style = backend.get_long(hwnd, GWL_STYLE)
+            if style & WS_MINIMIZE:
+                continue
+            placement = _placements.get(hwnd)
+            if not style & WS_POPUP or style & (WS_CAPTION | WS_THICKFRAME):
+                drifted.append(hwnd)
+            elif placement is not None:
+                x, y, w, h = placement
+                if tuple(backend.get_rect(hwnd)) != (x, y, x + w, y + h):
+                    drifted.append(hwnd)
+        except Exception:
+            continue  # ventana cerrada: la olvida forget_dead
+    return drifted
+
+def reapply_many(hwnds):
+    """Vuelve a poner estilos y posición a ventanas que ya estaban en
+    borderless, sin tocar su estado original. Las posiciones se confirman
+    en lote. Devuelve (hwnds reaplicados, [(hwnd, excepción)])."""
+    backend = get_backend()
+    done, errors, moves = [], [], []
+    with _original_states.locks_for(hwnds):
+        for hwnd in hwnds:
+            state = _original_states.get(hwnd)
+            if state is None:
+                continue  # revertida mientras tanto
+            try:
+                _set_borderless_styles(backend, hwnd, state[1])
+                placement = _placements.get(hwnd)
+                if placement is not None:
+                    _position(backend, moves, hwnd, *placement)
+                done.append(hwnd)
+            except Exception as e:
+                errors.append((hwnd, e))
+        if moves:
+            backend.set_pos_batch(moves)
+    return done, errors
+
+def _position(backend, moves, hwnd, x, y, w, h):
+    if moves is None:
+        backend.set_pos(hwnd, x, y, w, h, SWP_NOZORDER | SWP_FRAMECHANGED)
+    else:
+        moves.append((hwnd, x, y, w, h, SWP_NOZORDER | SWP_FRAMECHANGED))
+
+def revert_borderless(hwnd, moves=None):
+    """Revierte hwnd; con moves, la posición se añade a la lista para
+    confirmarla después en lote (set_pos_batch)."""
+    with _original_states.lock_for(hwnd):
+        _revert_borderless(hwnd, moves)
 
-    orig_style, orig_ex, rect = _original_states.pop(hwnd)
+def revert_many(hwnds):
+    """Revierte varias ventanas con un único posicionado en lote.
+    Devuelve [(hwnd, excepción)] de las que han fallado."""
+    hwnds = list(hwnds)
+    errors, moves = [], []
+    backend = get_backend()
+    with _original_states.locks_for(hwnds):
+        for hwnd, state in _original_states.release_many(hwnds).items():
+            _untrack(hwnd)
+            try:
+                _restore(backend, hwnd, state, moves)
+            except Exception as e:
+                errors.append((hwnd, e))
+        if moves:
+            backend.set_pos_batch(moves)
+    return errors
+
+def take_states(hwnds):
+    """Deja de seguir las ventanas y devuelve { hwnd: estado original }.
+
+    Para el cierre: no espera a los locks por ventana, de modo que una
+    ventana colgada a mitad de otra operación no bloquea al resto. El
+    journal conserva las ventanas hasta que restore_state termina.
+    """
+    states = _original_states.release_many(hwnds)
+    for hwnd in states:
+        _untrack(hwnd)
+    return states
+
+def restore_state(hwnd, state, moves=None):
+    """Restaura un estado devuelto por take_states (ver revert_borderless)."""
+    _restore(get_backend(), hwnd, state, moves)
+
+def _revert_borderless(hwnd, moves=None):
+    state = _original_states.release(hwnd)
+    _untrack(hwnd)
+    if state is not None:
+        _restore(get_backend(), hwnd, state, moves)
+
+def _restore(backend, hwnd, state, moves=None):
+    orig_style, orig_ex, rect = state
     left, top, right, bottom = rect
     width, height = right - left, bottom - top
 
-    win32gui.SetWindowLong(hwnd, win32con.GWL_STYLE, orig_style)
-    win32gui.SetWindowLong(hwnd, win32con.GWL_EXSTYLE, orig_ex)
-    win32gui.SetWindowPos(
-        hwnd, None,
-        left, top, width, height,
-        win32con.SWP_NOZORDER | win32con.SWP_FRAMECHANGED
-    )
+    backend.set_long(hwnd, GWL_STYLE, orig_style)
+    backend.set_long(hwnd, GWL_EXSTYLE, orig_ex)
+    _position(backend, moves, hwnd, left, top, width, height)
+
+    # Solo se borra del journal si los estilos se han restaurado: si la
+    # ventana no responde, la siguiente ejecución la volverá a intentar
+    if _journal:
+        _journal.record_del(hwnd)
 
 def revert_all():
-    for hwnd in list(_original_states.keys()):
-        try:
-            revert_borderless(hwnd)
-        except Exception:
-            pass
+    revert_many(get_original_states())
 
 def hwnds_by_title(title):
     """Devuelve todos los hwnds que coinciden exactamente con el título dado."""
+    backend = get_backend()
     result = []
-    def _enum(h, _):
-        if win32gui.IsWindowVisible(h):
-            t = win32gui.GetWindowText(h).strip()
-            if t == title:
-                result.append(h)
-    win32gui.EnumWindows(_enum, None)
+    for h in backend.enum_windows(visible=True):
+        if _titles.get(backend, h) == title:
+            result.append(h)
     return result
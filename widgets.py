@@ -0,0 +1,219 @@
+import tkinter as tk
+import tkinter.font as tkfont
+import utils
+
+
+class TitleIndex:
+    """Índice { clave: texto } que se actualiza aplicando solo los cambios
+    entre dos WindowSnapshot, para filtrar al escribir.
+
+    El texto de cada fila se guarda ya en minúsculas (casefold) al entrar o
+    cambiar, no en cada búsqueda. Una búsqueda casa las filas que contienen
+    todas sus palabras; si la consulta solo alarga la anterior (lo normal
+    al teclear), se filtra el resultado anterior en lugar de todo el índice.
+    """
+
+    def __init__(self):
+        self.snapshot = utils.WindowSnapshot()
+        self.keys = []        # claves en orden de llegada
+        self._folded = {}     # clave -> texto en minúsculas
+        self._last = None     # (consulta normalizada, claves) de la última búsqueda
+        self.scanned = 0      # filas examinadas por la última búsqueda
+
+    @property
+    def texts(self):
+        return self.snapshot.titles
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._folded
+
+    def update(self, snapshot):
+        """Aplica los cambios hasta snapshot. Devuelve False si no había ninguno."""
+        delta = snapshot.diff(self.snapshot)
+        self.snapshot = snapshot
+        if not delta:
+            return False
+        if delta.removed:
+            for key, _ in delta.removed:
+                del self._folded[key]
+            self.keys = [key for key in self.keys if key in self._folded]
+        for key, _, text in delta.retitled:
+            self._folded[key] = text.casefold()
+        for key, text in delta.added:
+            self._folded[key] = text.casefold()
+            self.keys.append(key)
+        self._last = None
+        return True
+
+    def search(self, query):
+        """Claves (en orden) cuyo texto contiene todas las palabras de query."""
+        words = query.casefold().split()
+        if not words:
+            self.scanned = 0
+            return list(self.keys)
+        normalized = " ".join(words)
+        candidates = self.keys
+        if self._last is not None and normalized.startswith(self._last[0]):
+            # Cada palabra de la consulta nueva contiene a la de la anterior:
+            # el resultado solo puede encoger
+            candidates = self._last[1]
+        self.scanned = len(candidates)
+        folded = self._folded
+        if len(words) == 1:
+            word = words[0]
+            found = [key for key in candidates if word in folded[key]]
+        else:
+            found = [key for key in candidates
+                     if all(word in folded[key] for word in words)]
+        self._last = (normalized, found)
+        return found
+
+
+class VirtualList:
+    """Lista virtual sobre un Listbox: el Listbox solo contiene las filas
+    visibles y la barra de desplazamiento se gestiona aquí, así que rellenar,
+    desplazar o filtrar cuesta lo mismo con 10 filas que con 10000.
+
+    Las filas vienen de un TitleIndex ({ clave: texto }, p. ej. hwnd ->
+    título) y la selección se guarda por clave: sobrevive al desplazamiento,
+    al filtro y a las actualizaciones mientras la fila siga existiendo.
+    """
+
+    def __init__(self, listbox, scrollbar=None, rows=20):
+        self.listbox = listbox
+        self.scrollbar = scrollbar
+        self.rows = rows          # filas visibles
+        self.index = TitleIndex()
+        self.query = ""
+        self.items = []           # claves que pasan el filtro, en orden
+        self.top = 0              # primera fila visible (en items)
+        self.selected = None      # clave seleccionada
+        self._shown = None        # (claves, textos) pintados
+        if scrollbar is not None:
+            scrollbar.config(command=self.yview)
+        if hasattr(listbox, "bind"):
+            listbox.bind("<<ListboxSelect>>", self._on_select)
+            listbox.bind("<Configure>", self._on_resize)
+            listbox.bind("<MouseWheel>", lambda e: self._wheel(-1 if e.delta > 0 else 1))
+            listbox.bind("<Button-4>", lambda e: self._wheel(-1))
+            listbox.bind("<Button-5>", lambda e: self._wheel(1))
+            listbox.bind("<Up>", lambda e: self.move(-1))
+            listbox.bind("<Down>", lambda e: self.move(1))
+            listbox.bind("<Prior>", lambda e: self.move(-self.rows))
+            listbox.bind("<Next>", lambda e: self.move(self.rows))
+
+    def update(self, snapshot):
+        """Cambia las filas a las de snapshot. Devuelve False si no cambia nada."""
+        if not self.index.update(snapshot):
+            return False
+        self.items = self.index.search(self.query)
+        if self.selected not in self.index:
+            self.selected = None
+        self._render()
+        return True
+
+    def filter(self, query):
+        """Muestra solo las filas que contienen todas las palabras de query."""
+        if query == self.query:
+            return
+        self.query = query
+        self.items = self.index.search(query)
+        self.top = 0
+        self._render()
+
+    def selection(self):
+        """(clave, texto) de la fila seleccionada, o None."""
+        key = self.selected
+        if key is None or key not in self.index:
+            return None
+        return key, self.index.texts[key]
+
+    def yview(self, *args):
+        # Órdenes de la barra: ("moveto", fracción) o ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            self.top += int(args[1]) * (self.rows if args[2] == "pages" else 1)
+        self._render()
+
+    def move(self, step):
+        """Mueve la selección step filas y la mantiene a la vista."""
+        if not self.items:
+            return "break"
+        try:
+            idx = self.items.index(self.selected) + step
+        except ValueError:
+            idx = self.top
+        idx = max(0, min(idx, len(self.items) - 1))
+        self.selected = self.items[idx]
+        if idx < self.top:
+            self.top = idx
+        elif idx >= self.top + self.rows:
+            self.top = idx - self.rows + 1
+        self._render()
+        return "break"
+
+    def _wheel(self, units):
+        self.yview("scroll", units * 3, "units")
+        return "break"
+
+    def _on_select(self, _event=None):
+        sel = self.listbox.curselection()
+        if sel and self._shown and sel[0] < len(self._shown[0]):
+            self.selected = self._shown[0][sel[0]]
+
+    def _on_resize(self, event):
+        # Filas que caben con la altura actual (la última puede verse a medias)
+        line = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+        rows = max(1, event.height // line)
+        if rows != self.rows:
+            self.rows = rows
+            self._render()
+
+    def _render(self):
+        total = len(self.items)
+        self.top = max(0, min(self.top, total - self.rows))
+        keys = self.items[self.top:self.top + self.rows + 1]
+        texts = self.index.texts
+        shown = (keys, [texts[key] for key in keys])
+        listbox = self.listbox
+        if shown != self._shown:
+            self._shown = shown
+            listbox.delete(0, tk.END)
+            if keys:
+                listbox.insert(tk.END, *shown[1])
+        listbox.selection_clear(0, tk.END)
+        if self.selected is not None and self.selected in keys:
+            listbox.selection_set(keys.index(self.selected))
+        if self.scrollbar is not None:
+            if total:
+                self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+
+def searchable_list(parent, width=50, height=20):
+    """Buscador + VirtualList con barra de desplazamiento, dentro de un Frame
+    (el atributo frame de la lista devuelta) listo para empaquetar."""
+    frame = tk.Frame(parent)
+    search = tk.Frame(frame)
+    search.pack(fill=tk.X, pady=(0, 2))
+    tk.Label(search, text="🔍").pack(side=tk.LEFT)
+    query = tk.StringVar()
+    tk.Entry(search, textvariable=query).pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+    body = tk.Frame(frame)
+    body.pack(fill=tk.BOTH, expand=True)
+    scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    listbox = tk.Listbox(body, width=width, height=height,
+                         exportselection=False, activestyle="none")
+    listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    view = VirtualList(listbox, scrollbar, rows=height)
+    view.frame = frame
+    query.trace_add("write", lambda *_: view.filter(query.get()))
+    return view
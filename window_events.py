@@ -0,0 +1,191 @@
+import sys
+import threading
+from collections import namedtuple
+
+# Tipos de evento que interesan a la sincronización de borderless
+EVENT_CREATE     = "create"
+EVENT_DESTROY    = "destroy"
+EVENT_SHOW       = "show"
+EVENT_HIDE       = "hide"
+EVENT_NAMECHANGE = "namechange"
+
+WindowEvent = namedtuple("WindowEvent", "kind hwnd")
+
+
+class EventCollector:
+    """Acumula los hwnds modificados entre dos pasadas de sincronización."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._destroyed = set()
+        self._full = False
+        self._wakeup = threading.Event()
+
+    def push(self, event):
+        with self._lock:
+            if event.kind == EVENT_DESTROY:
+                self._changed.discard(event.hwnd)
+                self._destroyed.add(event.hwnd)
+            else:
+                # Un hwnd destruido puede reciclarse en una ventana nueva
+                self._destroyed.discard(event.hwnd)
+                self._changed.add(event.hwnd)
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def request_full(self):
+        """Pide una pasada completa (p. ej. porque han cambiado las reglas)."""
+        self._full = True
+        self._wakeup.set()
+
+    def take_full(self):
+        full, self._full = self._full, False
+        return full
+
+    def wait(self, timeout):
+        """Espera un evento (o wake) hasta timeout segundos. Devuelve True si hubo aviso."""
+        fired = self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return fired
+
+    def drain(self):
+        """Devuelve y vacía (changed, destroyed)."""
+        with self._lock:
+            changed, destroyed = self._changed, self._destroyed
+            self._changed, self._destroyed = set(), set()
+        return changed, destroyed
+
+
+class EventSource:
+    """Fuente de eventos de ventana. start() recibe un callback(WindowEvent)."""
+
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class FakeEventSource(EventSource):
+    """Fuente manual para pruebas y benchmarks fuera de Windows."""
+
+    def __init__(self):
+        self._callback = None
+
+    def start(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def emit(self, kind, hwnd):
+        if self._callback:
+            self._callback(WindowEvent(kind, hwnd))
+
+
+class WinEventSource(EventSource):
+    """Eventos reales de Windows mediante SetWinEventHook (fuera de contexto)."""
+
+    EVENT_OBJECT_CREATE     = 0x8000
+    EVENT_OBJECT_DESTROY    = 0x8001
+    EVENT_OBJECT_SHOW       = 0x8002
+    EVENT_OBJECT_HIDE       = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT   = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+    GA_ROOT = 2
+    WM_QUIT = 0x0012
+
+    _KINDS = {
+        EVENT_OBJECT_CREATE:     EVENT_CREATE,
+        EVENT_OBJECT_DESTROY:    EVENT_DESTROY,
+        EVENT_OBJECT_SHOW:       EVENT_SHOW,
+        EVENT_OBJECT_HIDE:       EVENT_HIDE,
+        EVENT_OBJECT_NAMECHANGE: EVENT_NAMECHANGE,
+    }
+
+    def __init__(self):
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self.ok = False
+
+    def start(self, callback):
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+        self._ready.wait(2)
+
+    def _run(self, callback):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.DWORD
+        ]
+        user32.GetAncestor.restype = wintypes.HWND
+        user32.GetAncestor.argtypes = [wintypes.HWND, wintypes.UINT]
+
+        kinds = self._KINDS
+
+        def _proc(hook, event, hwnd, id_object, id_child, thread, time):
+            if id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF or not hwnd:
+                return
+            kind = kinds.get(event)
+            if kind is None:
+                return
+            # Solo ventanas de nivel superior (las destruidas ya no se pueden consultar)
+            if kind != EVENT_DESTROY and user32.GetAncestor(hwnd, self.GA_ROOT) != hwnd:
+                return
+            try:
+                callback(WindowEvent(kind, hwnd))
+            except Exception:
+                pass
+
+        # Mantener referencia al callback mientras viva el hook
+        self._proc = WinEventProc(_proc)
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            user32.SetWinEventHook(self.EVENT_OBJECT_CREATE, self.EVENT_OBJECT_HIDE,
+                                   None, self._proc, 0, 0, flags),
+            user32.SetWinEventHook(self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE,
+                                   None, self._proc, 0, 0, flags),
+        ]
+        self.ok = all(hooks)
+        self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+
+        # Bucle de mensajes: los hooks fuera de contexto se entregan aquí
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for h in hooks:
+            if h:
+                user32.UnhookWinEvent(h)
+
+    def stop(self):
+        if self._thread_id:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+            self._thread_id = None
+
+
+def create_event_source():
+    """Devuelve la fuente de eventos de la plataforma, o None si solo hay sondeo."""
+    if sys.platform == "win32":
+        return WinEventSource()
+    return None
@@ -0,0 +1,144 @@
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from stats import STATS
+
+
+class _Task:
+    __slots__ = ("future", "on_done", "on_error", "on_progress", "deadline", "finished")
+
+    def __init__(self, future, on_done, on_error, on_progress, deadline):
+        self.future = future
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.deadline = deadline
+        self.finished = False
+
+
+class Win32Worker:
+    """Hilo único dueño de las llamadas que manipulan ventanas.
+
+    Las tareas se ejecutan en orden en un hilo daemon (una ventana colgada no
+    bloquea la interfaz ni la salida del intérprete). Los resultados vuelven
+    al hilo de Tk por una cola que se revisa con after() solo mientras hay
+    tareas de submit() pendientes: sin ellas, el worker no despierta a Tk.
+    Un callback que falla se informa y no impide entregar los demás.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self):
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = []
+        self._root = None
+        self._armed = False
+        self._thread = threading.Thread(target=self._run, name="win32-worker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def run(self, fn, *args, **kwargs):
+        """Encola fn en el worker y devuelve un Future."""
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Ejecuta fn en el worker y espera su resultado (para hilos que no son Tk)."""
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.run(fn, *args, **kwargs).result()
+
+    def attach(self, root):
+        """Entrega los resultados de submit() en el hilo de Tk de root."""
+        self._root = root
+        if self._pending:
+            self._arm()
+
+    def _arm(self):
+        if not self._armed and self._root is not None:
+            self._armed = True
+            self._root.after(self.POLL_MS, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, timeout=None):
+        """Encola fn sin bloquear; los callbacks se llaman en el hilo de Tk.
+
+        Si se indica on_progress, fn recibe un argumento progress(valor).
+        Si la tarea no termina en timeout segundos se llama a
+        on_error(TimeoutError) y su resultado posterior se descarta.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        task = _Task(None, on_done, on_error, on_progress, deadline)
+        if on_progress:
+            kwargs = {"progress": lambda value: self._results.put(("progress", task, value))}
+        else:
+            kwargs = {}
+        task.future = self.run(fn, *args, **kwargs)
+        task.future.add_done_callback(lambda f: self._results.put(("done", task, f)))
+        self._pending.append(task)
+        self._arm()
+        return task.future
+
+    def _poll(self):
+        self._armed = False
+        while True:
+            try:
+                kind, task, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task.finished:
+                continue
+            if kind == "progress":
+                self._callback(task.on_progress, value)
+                continue
+            self._finish(task)
+            error = value.exception()
+            if error is not None:
+                if task.on_error:
+                    self._callback(task.on_error, error)
+            elif task.on_done:
+                self._callback(task.on_done, value.result())
+
+        now = time.monotonic()
+        for task in list(self._pending):
+            if task.deadline is not None and now >= task.deadline:
+                self._finish(task)
+                if task.on_error:
+                    self._callback(task.on_error, TimeoutError("La ventana no responde."))
+
+        if self._pending:
+            self._arm()
+
+    def _callback(self, fn, value):
+        try:
+            fn(value)
+        except Exception:
+            # Como Tk con los suyos: se informa y se sigue con el resto
+            STATS.incr("worker_callback_errors")
+            traceback.print_exc()
+
+    def _finish(self, task):
+        task.finished = True
+        try:
+            self._pending.remove(task)
+        except ValueError:
+            pass
+
+    def stop(self):
+        self._root = None
+        self._tasks.put(None)